@@ -0,0 +1,69 @@
+"""
+    Benchmark: cohort statistics over the genotype matrix, at the SNP pairs reference rsids,
+    for generated patients: loading rows, genotype/allele counts at every rsid, and the
+    prevalence of every SNP pair; against a SQLite GROUP BY over the same genotypes as rows
+    (for fewer patients: it is built row by row.)
+
+    Usage: python benchmarks/benchmark_cohort_frequencies.py [patients] [sql patients]
+"""
+import os
+import sqlite3
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from data_layer.cohort_matrix import CohortGenotypeMatrix
+from data_layer.rsid_codes import encode_rsids
+from genotype_matching import encode_allele_pairs, encode_genotypes, reference_allele_masks
+from services.genome_service import read_snp_pairs_file
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+DEFAULT_PATIENTS = 10000
+DEFAULT_SQL_PATIENTS = 1000
+GENOTYPES = ["AA", "AG", "GG", "CC", "CT", "TT", "--"]
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+def generated_genotypes(rsid_codes, patients, rng):
+    return rng.choice(encode_genotypes(GENOTYPES), (patients, len(rsid_codes)), p=[.3, .2, .1, .15, .1, .1, .05])
+
+def load_matrix(rsid_codes, genotypes):
+    matrix = CohortGenotypeMatrix(rsid_codes)
+    for patient, row in enumerate(genotypes):
+        matrix.set_patient(f"patient{patient}", rsid_codes, row)
+    return matrix
+
+def sql_genotype_counts(matrix, patients):
+    # The genotype rows of the first `patients` patients, counted per rsid and genotype.
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE patient_genome_data (patient_id TEXT, rsid INTEGER, genotype TEXT)")
+    names = np.array(["--"] + [""] * 48, dtype=object)
+    names[encode_genotypes(GENOTYPES)] = GENOTYPES
+    for row in range(patients):
+        connection.executemany("INSERT INTO patient_genome_data VALUES (?, ?, ?)",
+                               zip([f"patient{row}"] * len(matrix.rsid_codes), matrix.rsid_codes.tolist(), names[matrix.genotypes[row]].tolist()))
+    started = time.perf_counter()
+    rows = connection.execute("SELECT rsid, genotype, COUNT(*) FROM patient_genome_data GROUP BY rsid, genotype").fetchall()
+    return len(rows), time.perf_counter() - started
+
+if __name__ == "__main__":
+    patients = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PATIENTS
+    sql_patients = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SQL_PATIENTS
+    snp_pairs_df = read_snp_pairs_file(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv'))
+    rsid_codes = np.unique(encode_rsids(snp_pairs_df['rsid']))
+    matrix, elapsed = timed(load_matrix, rsid_codes, generated_genotypes(rsid_codes, patients, np.random.default_rng(0)))
+    print(f"{'load':<12} {patients} patients x {len(rsid_codes)} rsids ({matrix.stats()['bytes'] / 1e6:.1f} MB) {elapsed:>7.3f}s {patients / elapsed:>10,.0f} patients/sec")
+    columns = np.arange(len(rsid_codes))
+    (called, counts, alleles, carriers), elapsed = timed(matrix.allele_statistics, columns)
+    assert (counts.sum(axis=1) == patients).all()
+    print(f"{'frequencies':<12} {len(columns)} rsids {elapsed:>7.3f}s")
+    pair_columns = matrix.columns_of(encode_rsids(snp_pairs_df['rsid']))
+    pair_codes = encode_allele_pairs(snp_pairs_df['allele1'], snp_pairs_df['allele2'])
+    (pair_carriers, pair_called), elapsed = timed(matrix.pair_carriers, pair_columns, pair_codes, reference_allele_masks(snp_pairs_df['rsid'].to_numpy(), pair_codes))
+    print(f"{'prevalence':<12} {len(snp_pairs_df)} SNP pairs {elapsed:>7.3f}s")
+    sql_patients = min(sql_patients, patients)
+    (sql_rows, elapsed), _ = timed(sql_genotype_counts, matrix, sql_patients)
+    print(f"{'sql group by':<12} {sql_patients} patients {elapsed:>7.3f}s ({sql_rows} rsid/genotype counts)")
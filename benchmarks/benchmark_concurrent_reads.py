@@ -0,0 +1,71 @@
+"""
+    Benchmark: read throughput with 1..N reader threads while a genome ingest is running,
+    reads served by the WAL read pool vs. queued behind the single writer (previous behaviour).
+
+    Usage: python benchmarks/benchmark_concurrent_reads.py [genome_rows] [seconds_per_run]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from models import Patient
+from services.genome_service import read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+THREAD_COUNTS = [1, 2, 4, 8]
+
+def genome_frames(rsids, rows, chunk_rows=50000):
+    for first in range(0, rows, chunk_rows):
+        count = min(chunk_rows, rows - first)
+        yield pd.DataFrame({
+            "rsid": [rsids[i % len(rsids)] if i < len(rsids) else f"rs{900000000 + i}" for i in range(first, first + count)],
+            "chromosome": [str(1 + i % 22) for i in range(first, first + count)],
+            "position": list(range(first, first + count)),
+            "genotype": ["AG"] * count,
+        })
+
+def read_throughput(db, thread_count, seconds, ingest):
+    reads = [0] * thread_count
+    stop = threading.Event()
+    def reader(index):
+        while not stop.is_set():
+            db.fetch_full_report(patient_id="patient0", page_size=200)
+            reads[index] += 1
+    ingester = threading.Thread(target=ingest)
+    ingester.start()
+    readers = [threading.Thread(target=reader, args=(index,)) for index in range(thread_count)]
+    for thread in readers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in readers + [ingester]:
+        thread.join()
+    return sum(reads) / seconds
+
+def main(genome_rows, seconds):
+    print(f"CPUs: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as directory:
+        db = GenomeDatabaseManager(os.path.join(directory, 'benchmark.db'))
+        snp_df = read_snp_pairs_file(SNP_PAIRS_FILE)
+        db.save_snp_pairs_to_db(snp_df)
+        rsids = sorted(set(snp_df['rsid']))
+        db.ingest_patient_genome(Patient(patient_id="patient0", patient_name="Reader"), genome_frames(rsids, genome_rows))
+        read_pool = db.sql_worker.read_pool
+        run = 0
+        for label, pool in [("writer queue", None), ("WAL read pool", read_pool)]:
+            for thread_count in THREAD_COUNTS:
+                run += 1
+                db.sql_worker.read_pool = pool
+                patient = Patient(patient_id=f"ingest{run}", patient_name="Ingest")
+                ingest = lambda patient=patient: db.ingest_patient_genome(patient, genome_frames(rsids, genome_rows))
+                throughput = read_throughput(db, thread_count, seconds, ingest)
+                print(f"{label:<14} {thread_count} threads: {throughput:8.1f} report pages/sec during ingest")
+        db.sql_worker.read_pool = read_pool
+        db.close_connection()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000, float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
@@ -0,0 +1,67 @@
+"""
+    Benchmark: loading one patient's genome from SQLite into a DataFrame (previous behaviour) vs.
+    from the memory-mapped columnar cache, whole and at the SNP pairs' rsids (the matching input.)
+
+    Usage: python benchmarks/benchmark_genome_cache.py [genome_rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+
+def measured(function, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(timings), peak
+
+def main(genome_rows):
+    random.seed(0)
+    snp_df = read_snp_pairs_file(SNP_PAIRS_FILE)
+    reference_rsids = list(snp_df['rsid'].unique())
+    rsids = reference_rsids + [f"rs{900000000 + i}" for i in range(max(0, genome_rows - len(reference_rsids)))]
+    genome_df = pd.DataFrame({
+        'rsid': rsids,
+        'chromosome': [str(1 + i % 22) for i in range(len(rsids))],
+        'position': range(len(rsids)),
+        'genotype': [random.choice(["AA", "AG", "CT", "TT", "GG", "--"]) for _ in rsids],
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        db = GenomeDatabaseManager(os.path.join(directory, 'benchmark.db'))
+        db.save_snp_pairs_to_db(snp_df)
+        db.update_patient_and_genome_data(genome_df, "patient1", "Patient 1")
+        cache = db.genome_cache
+        sql = "SELECT rsid, chromosome, position, genotype FROM patient_genome_data WHERE patient_id = ?"
+        runs = [
+            ("whole genome: SQL + DataFrame", lambda: pd.DataFrame(db.sql_worker.execute(sql, ("patient1",)), columns=genome_df.columns)),
+            ("whole genome: mmap columns", lambda: cache.load("patient1")),
+            ("whole genome: mmap + decode", lambda: cache.frame("patient1")),
+            ("reference rsids: SQL", lambda: db.patient_genome_repository.fetch_patient_genome_frame("patient1")),
+            ("reference rsids: mmap", lambda: db.fetch_patient_genome_frame("patient1")),
+        ]
+        columns = cache.load("patient1")
+        print(f"{len(genome_df)} genome rows; cache {sum(column.nbytes for column in columns) / len(genome_df):.1f} bytes/SNP on disk")
+        baseline = {}
+        for label, function in runs:
+            _, seconds, peak = measured(function)
+            scope = label.split(':')[0]
+            baseline.setdefault(scope, seconds)
+            print(f"{label:<32} {seconds * 1000:9.2f} ms ({baseline[scope] / seconds:6.1f}x), peak {peak / 2 ** 20:7.1f} MiB")
+        db.close_connection()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600000)
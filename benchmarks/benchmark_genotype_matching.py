@@ -0,0 +1,63 @@
+"""
+    Benchmark: the full report of one patient, with genotype_match computed in SQL by string
+    concatenation (previous behaviour) vs. the vectorised matching engine (`match_patient`.)
+
+    Usage: python benchmarks/benchmark_genotype_matching.py [genome_rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from genotype_matching import match_patient
+from services.genome_service import GenomeService, read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+SQL_FULL_REPORT = '''
+    SELECT p.patient_id, p.patient_name, pgd.rsid, pgd.chromosome, pgd.position, pgd.genotype,
+           sp.rsid_genotypes, sp.magnitude, sp.risk, sp.notes, sp.allele1, sp.allele2,
+           (pgd.genotype = sp.allele1 || sp.allele2 OR pgd.genotype = sp.allele2 || sp.allele1) AS genotype_match
+    FROM patients p
+    JOIN patient_genome_data pgd ON p.patient_id = pgd.patient_id
+    JOIN snp_pairs sp ON pgd.rsid = sp.rsid
+    WHERE pgd.patient_id = ?
+'''
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+def main(genome_rows):
+    random.seed(0)
+    snp_df = read_snp_pairs_file(SNP_PAIRS_FILE)
+    reference_rsids = list(snp_df['rsid'].unique())
+    rsids = reference_rsids + [f"rs{900000000 + i}" for i in range(max(0, genome_rows - len(reference_rsids)))]
+    genome_df = pd.DataFrame({
+        'rsid': rsids,
+        'chromosome': [str(1 + i % 22) for i in range(len(rsids))],
+        'position': range(len(rsids)),
+        'genotype': [random.choice(["AA", "AG", "GA", "CT", "TT", "GG", "CC", "--"]) for _ in rsids],
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        db = GenomeDatabaseManager(os.path.join(directory, 'benchmark.db'))
+        db.save_snp_pairs_to_db(snp_df)
+        db.update_patient_and_genome_data(genome_df, "patient1", "Patient 1")
+        service = GenomeService.__new__(GenomeService)
+        service.genome_db_manager = db
+        sql_rows, sql_seconds = timed(lambda: db.sql_worker.execute(SQL_FULL_REPORT, ("patient1",)))
+        report, engine_seconds = timed(lambda: service.match_patient_genome("patient1"))
+        frames = (db.fetch_patient_genome_frame("patient1"), db.fetch_snp_pairs_frame())
+        _, matching_seconds = timed(lambda: match_patient(*frames))
+        assert len(sql_rows) == len(report)
+        print(f"{len(genome_df)} genome rows, {len(snp_df)} SNP pairs, {len(report)} report rows")
+        print(f"SQL join + string match:        {sql_seconds * 1000:9.1f} ms")
+        print(f"engine (read rows + match):     {engine_seconds * 1000:9.1f} ms ({sql_seconds / engine_seconds:.1f}x)")
+        print(f"engine (match only):            {matching_seconds * 1000:9.1f} ms ({sql_seconds / matching_seconds:.1f}x)")
+        db.close_connection()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600000)
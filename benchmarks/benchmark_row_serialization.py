@@ -0,0 +1,63 @@
+"""
+    Micro-benchmark: serializing query rows into a JSON response body,
+    via the former `fetch_data_with_conditions` (rows -> DataFrame -> to_json -> json.loads -> JSONResponse)
+    vs. the direct path (rows -> `rows_to_json`, or streamed with `iter_rows_json`.)
+
+    Usage: python benchmarks/benchmark_row_serialization.py [rows ...]
+"""
+import os
+import sys
+import json
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from fastapi.responses import JSONResponse
+from serialization import iter_rows_json, rows_to_json
+
+COLUMNS = ['patient_id', 'patient_name', 'rsid', 'chromosome', 'position', 'genotype',
+           'rsid_genotypes', 'magnitude', 'risk', 'notes', 'allele1', 'allele2']
+DEFAULT_ROW_COUNTS = [25, 1000, 100000]
+
+def report_rows(count):
+    return [
+        ('patient1', 'Patient 1', f'rs{i}', str(1 + i % 22), 10000 + i, 'AG',
+         f'Rs{i}(A;G)', 1.5 if i % 5 else None, 2.0, 'Associated with a "notable" trait.', 'A', 'G')
+        for i in range(count)
+    ]
+
+def fetch_data_with_conditions(rows, columns):
+    # The serialization half of the former utils.fetch_data_with_conditions.
+    results_list = pd.DataFrame(rows, columns=columns)
+    json_str = results_list.to_json(orient='records', date_format='iso')
+    return json.loads(json_str)
+
+def dataframe_path(rows):
+    return JSONResponse(content=fetch_data_with_conditions(rows, COLUMNS)).body
+
+def direct_path(rows):
+    return rows_to_json(COLUMNS, rows)
+
+def streamed_path(rows):
+    return b''.join(iter_rows_json(COLUMNS, rows))
+
+def best_of(function, rows, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(row_counts):
+    for count in row_counts:
+        rows = report_rows(count)
+        assert dataframe_path(rows) == direct_path(rows) == streamed_path(rows)
+        repeats = max(3, min(200, 200000 // count))
+        baseline = best_of(dataframe_path, rows, repeats)
+        print(f"{count:>8} rows: fetch_data_with_conditions {baseline * 1000:9.3f} ms")
+        for name, function in [("rows_to_json", direct_path), ("iter_rows_json", streamed_path)]:
+            elapsed = best_of(function, rows, repeats)
+            print(f"{'':>14}{name:<26} {elapsed * 1000:9.3f} ms ({baseline / elapsed:.1f}x)")
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or DEFAULT_ROW_COUNTS)
@@ -0,0 +1,99 @@
+"""
+    Benchmark: rsids stored as TEXT (previous schema) vs. INTEGER codes; database size, and the
+    patient genome to SNP pairs joins: the reference genotypes (SNP pairs' rsids probing the
+    patient's (patient_id, rsid) index), a full report page, and the whole genome probing SNP pairs.
+
+    Usage: python benchmarks/benchmark_rsid_storage.py [genome_rows]
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.rsid_codes import rsid_name_sql
+from services.genome_service import read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+RSID_TABLES = ['snp_pairs', 'patient_genome_data']
+JOINS = [
+    ("reference genotypes", '''
+        SELECT {rsid}, pgd.genotype FROM (SELECT DISTINCT rsid FROM snp_pairs) reference
+        JOIN patient_genome_data pgd ON pgd.patient_id = ? AND pgd.rsid = reference.rsid'''),
+    ("full report page", '''
+        SELECT {rsid}, pgd.genotype, sp.rsid_genotypes, sp.magnitude FROM patient_genome_data pgd
+        CROSS JOIN snp_pairs sp ON pgd.rsid = sp.rsid WHERE pgd.patient_id = ?
+        ORDER BY pgd.patient_id, pgd.rsid, sp.rsid_genotypes LIMIT 1000'''),
+    ("whole genome x pairs", '''
+        SELECT {rsid}, pgd.genotype, sp.rsid_genotypes, sp.magnitude FROM patient_genome_data pgd
+        JOIN snp_pairs sp ON sp.rsid = pgd.rsid WHERE pgd.patient_id = ?'''),
+]
+
+def text_rsid_copy(integer_path, text_path):
+    # The same tables and indexes, with rsid TEXT and the IDs decoded.
+    source = sqlite3.connect(integer_path)
+    target = sqlite3.connect(text_path)
+    for table in RSID_TABLES + ['patients']:
+        (table_sql,) = source.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        target.execute(re.sub(r'\brsid INTEGER\b', 'rsid TEXT', table_sql, count=1))
+        columns = [row[1] for row in source.execute(f"PRAGMA table_info({table})")]
+        select = ', '.join(f"{rsid_name_sql(column)}" if column == 'rsid' else column for column in columns)
+        target.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", source.execute(f"SELECT {select} FROM {table}"))
+    for (index_sql,) in source.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ('snp_pairs', 'patient_genome_data')"):
+        target.execute(index_sql)
+    target.commit()
+    target.execute("VACUUM")
+    source.close()
+    target.close()
+
+def timed_query(path, sql, repeats=5):
+    connection = sqlite3.connect(path)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = connection.execute(sql, ("patient1",)).fetchall()
+        timings.append(time.perf_counter() - started)
+    connection.close()
+    return len(rows), min(timings)
+
+def main(genome_rows):
+    random.seed(0)
+    snp_df = read_snp_pairs_file(SNP_PAIRS_FILE)
+    reference_rsids = list(snp_df['rsid'].unique())
+    rsids = reference_rsids + [f"rs{900000000 + i}" for i in range(max(0, genome_rows - len(reference_rsids)))]
+    genome_df = pd.DataFrame({
+        'rsid': rsids,
+        'chromosome': [str(1 + i % 22) for i in range(len(rsids))],
+        'position': range(len(rsids)),
+        'genotype': [random.choice(["AA", "AG", "CT", "TT", "GG", "--"]) for _ in rsids],
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        integer_path = os.path.join(directory, 'integer.db')
+        text_path = os.path.join(directory, 'text.db')
+        os.environ['GENOME_CACHE_PATH'] = os.path.join(directory, 'cache')
+        db = GenomeDatabaseManager(integer_path)
+        db.save_snp_pairs_to_db(snp_df)
+        db.update_patient_and_genome_data(genome_df, "patient1", "Patient 1")
+        db.close_connection()
+        with sqlite3.connect(integer_path) as connection:
+            connection.execute("DROP TABLE IF EXISTS patient_report")
+            connection.execute("DELETE FROM patient_report_summary")
+        sqlite3.connect(integer_path).execute("VACUUM")
+        text_rsid_copy(integer_path, text_path)
+        print(f"{len(genome_df)} genome rows, {len(snp_df)} SNP pairs")
+        sizes = {label: os.path.getsize(path) for label, path in [("TEXT", text_path), ("INTEGER", integer_path)]}
+        for label, size in sizes.items():
+            print(f"{label:<8} database {size / 2 ** 20:8.1f} MiB ({size / sizes['TEXT']:.2f}x)")
+        for label, sql in JOINS:
+            text_rows, text_seconds = timed_query(text_path, sql.format(rsid="pgd.rsid"))
+            integer_rows, integer_seconds = timed_query(integer_path, sql.format(rsid=rsid_name_sql("pgd.rsid")))
+            assert text_rows == integer_rows
+            print(f"{label:<22} ({text_rows:>6} rows): TEXT {text_seconds * 1000:8.2f} ms, "
+                  f"INTEGER (decoded in SQL) {integer_seconds * 1000:8.2f} ms ({text_seconds / integer_seconds:.1f}x)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600000)
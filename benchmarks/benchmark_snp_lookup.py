@@ -0,0 +1,45 @@
+"""
+    Benchmark: SNP research lookups of 1, 100 and 10k rsids, served by the in-memory rsid index
+    vs. the SQL query (`rsid IN (SELECT value FROM json_each(?))`.)
+
+    Usage: python benchmarks/benchmark_snp_lookup.py [snp_pairs_csv]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import read_snp_pairs_file
+
+DEFAULT_SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+BATCH_SIZES = [1, 100, 10000]
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(snp_pairs_file):
+    snp_df = read_snp_pairs_file(snp_pairs_file)
+    known_rsids = list(snp_df['rsid'].unique())
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        db = GenomeDatabaseManager(os.path.join(directory, 'benchmark.db'))
+        db.save_snp_pairs_to_db(snp_df)
+        print(f"Index: {db.snp_pair_index_stats()}")
+        for batch_size in BATCH_SIZES:
+            # Mostly known rsids, with ~10% misses, as typed into the UI.
+            rsids = [random.choice(known_rsids) if random.random() < 0.9 else f"rs{random.randrange(10**9)}" for _ in range(batch_size)]
+            repeats = max(5, 20000 // batch_size)
+            from_db = best_of(lambda: db.fetch_snp_pairs_data(rsid=rsids, use_index=False), repeats)
+            from_index = best_of(lambda: db.fetch_snp_pairs_data(rsid=rsids), repeats)
+            print(f"{batch_size:>6} rsids: SQL {from_db * 1000:9.3f} ms, index {from_index * 1000:9.3f} ms ({from_db / from_index:.1f}x)")
+        db.close_connection()
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SNP_PAIRS_FILE)
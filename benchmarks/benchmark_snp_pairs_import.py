@@ -0,0 +1,43 @@
+"""
+    Benchmark: SNP pairs import, per-row upserts (previous behaviour) vs. the bulk import.
+
+    Usage: python benchmarks/benchmark_snp_pairs_import.py [snp_pairs_csv]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from models import SnpPair
+from repositories.genome_research_repository import GenomeResearchRepository
+from services.genome_service import read_snp_pairs_file
+
+DEFAULT_SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+
+def per_row_import(repository, snp_df):
+    for index, row in snp_df.iterrows():
+        row['notes'] = str(row['notes']) if pd.notna(row['notes']) else ''
+        repository.update_or_insert_snp_pair(SnpPair(**row))
+    # The worker is FIFO: a SELECT returns once every queued write has run.
+    repository.sql_worker.execute("SELECT COUNT(*) FROM snp_pairs")
+
+def bulk_import(repository, snp_df):
+    repository.save_snp_pairs_to_db(snp_df)
+
+def run(name, import_function, snp_df):
+    with tempfile.TemporaryDirectory() as directory:
+        repository = GenomeResearchRepository(os.path.join(directory, 'benchmark.db'))
+        started = time.perf_counter()
+        import_function(repository, snp_df)
+        elapsed = time.perf_counter() - started
+        repository.close_connection()
+    print(f"{name:<10} {len(snp_df):>8} rows {elapsed:>8.3f}s {len(snp_df) / elapsed:>12,.0f} rows/sec")
+    return elapsed
+
+if __name__ == "__main__":
+    snp_pairs_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SNP_PAIRS_FILE
+    snp_df = read_snp_pairs_file(snp_pairs_file)
+    per_row = run("per-row", per_row_import, snp_df)
+    bulk = run("bulk", bulk_import, snp_df)
+    print(f"speed-up: {per_row / bulk:.1f}x")
@@ -0,0 +1,49 @@
+"""
+    Benchmark: reloading the SNP pairs reference, in full (every row parsed and upserted, as
+    each start did before the reference was hashed) vs. incrementally (rows hashed and only
+    the changed ones parsed and written), with no change and with 1% and 10% of rows changed.
+
+    Usage: python benchmarks/benchmark_snp_pairs_reload.py [snp_pairs_csv]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+from services.genome_service import GenomeService, read_snp_pairs_file
+
+DEFAULT_SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+
+def changed_copy(source_df, fraction, path):
+    # The reference with the notes of every 1/fraction-th row edited.
+    changed_df = source_df.copy()
+    step = max(1, round(1 / fraction))
+    rows = changed_df['RSID_Genotypes'].str.startswith('Rs').to_numpy().nonzero()[0][::step]
+    changed_df.iloc[rows, changed_df.columns.get_loc('Notes')] = "revised"
+    changed_df.to_csv(path, index=False)
+    return len(rows)
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+if __name__ == "__main__":
+    snp_pairs_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SNP_PAIRS_FILE
+    source_df = pd.read_csv(snp_pairs_file, dtype=str)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['SQLITE_DATABASE_PATH'] = os.path.join(directory, 'benchmark.db')
+        os.environ['SNP_PAIRS_FILE_PATH'] = snp_pairs_file
+        service = GenomeService()
+        _, elapsed = timed(lambda: service.genome_db_manager.save_snp_pairs_to_db(read_snp_pairs_file(snp_pairs_file)))
+        print(f"{'full':<12} {len(source_df):>8} rows {elapsed:>8.3f}s")
+        for fraction in (0, 0.01, 0.1):
+            path = os.path.join(directory, f"snp_data_{fraction}.csv")
+            changed = changed_copy(source_df, fraction, path) if fraction else source_df.to_csv(path, index=False) or 0
+            diff, elapsed = timed(service.reload_snp_pairs, path)
+            assert len(diff.updated) == changed
+            print(f"{'incremental':<12} {changed:>8} changed {elapsed:>8.3f}s")
+            source_df.to_csv(path, index=False)
+            service.reload_snp_pairs(path)
+        service.close()
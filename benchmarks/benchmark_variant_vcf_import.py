@@ -0,0 +1,50 @@
+"""
+    Benchmark: importing a ClinVar-like VCF (generated, BGZF-compressed, with ClinVar's INFO
+    keys) into the GRCh38 annotation table, parsed in this process vs. by a pool of worker
+    processes, chunk by chunk; and parsing alone, without the database writes.
+
+    Usage: python benchmarks/benchmark_variant_vcf_import.py [rows] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.variant_vcf_import import default_chunk_bytes, default_workers, import_variant_vcf, parsed_frames, write_bgzf
+
+DEFAULT_ROWS = 1000000
+SIGNIFICANCES = ['Benign', 'Likely_benign', 'Uncertain_significance', 'Pathogenic', 'Likely_pathogenic', 'Conflicting_classifications_of_pathogenicity']
+HEADER = '##fileformat=VCFv4.1\n##source=ClinVar\n##reference=GRCh38\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+
+def generated_vcf(rows, rng):
+    positions = np.sort(rng.integers(1, 250000000, rows))
+    significances = rng.choice(SIGNIFICANCES, rows)
+    lines = (f"{1 + index * 22 // rows}\t{position}\t{index + 1}\tA\tG\t.\t.\tALLELEID={index + 7};CLNDN=Hereditary_cancer-predisposing_syndrome%2C_familial;"
+             f"CLNHGVS=NC_000001.11:g.{position}A>G;CLNREVSTAT=criteria_provided,_single_submitter;CLNSIG={significance};CLNVC=single_nucleotide_variant;"
+             f"GENEINFO=GENE{index % 5000}:{index % 5000 + 1};MC=SO:0001583|missense_variant;ORIGIN=1" + (f";RS={index + 100}" if index % 3 else '')
+             for index, (position, significance) in enumerate(zip(positions, significances)))
+    return (HEADER + '\n'.join(lines) + '\n').encode()
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else default_workers()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clinvar.vcf.bgz")
+        write_bgzf(generated_vcf(rows, np.random.default_rng(7)), path)
+        print(f"{rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MiB compressed, {default_chunk_bytes() // 2 ** 20} MiB chunks")
+        for pool_size in sorted({1, workers}):
+            stats = {'chunks': 0, 'skipped_rows': 0}
+            _, elapsed = timed(lambda: sum(len(frame) for frame in parsed_frames(path, 'clinvar', pool_size, default_chunk_bytes(), stats)))
+            print(f"parse   {pool_size:>3} workers {elapsed:>8.2f}s {rows / elapsed:>10.0f} rows/sec")
+            genome_db_manager = GenomeDatabaseManager(os.path.join(directory, f"benchmark{pool_size}.db"))
+            summary, elapsed = timed(import_variant_vcf, genome_db_manager, path, workers=pool_size)
+            assert summary.imported_rows == rows
+            print(f"import  {pool_size:>3} workers {elapsed:>8.2f}s {rows / elapsed:>10.0f} rows/sec ({summary.chunks} chunks)")
+            genome_db_manager.close_connection()
@@ -1,40 +1,184 @@
+import asyncio
+import io
 from typing import Any, Optional
-from fastapi import Query
+from fastapi import HTTPException, Query, Request
 from fastapi.responses import JSONResponse
-import threading
+from starlette.requests import ClientDisconnect
+from data_layer.external_http_client import ExternalSourceError
+from serialization import rows_response
 from services.genome_service import GenomeService
+from services.genome_ingest_pipeline import GenomeTooLarge
+from services.ingest_scheduler import IngestQueueFull, IngestScheduler, IngestSchedulerClosed
+from services.upload_stream import UploadStalled, UploadStream, default_upload_max_bytes, default_upload_max_rows
+from utils import DEFAULT_PAGE_SIZE
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Seconds a client rejected by a full ingest queue is asked to wait (Retry-After.)
+INGEST_RETRY_AFTER_SECONDS = 30
+
+def page_response(fetch_page, **kwargs):
+    """
+        Fetch one page of a keyset-paginated listing. The body keeps the plain list of records;
+        the cursor for the following page (if any) is returned in the `X-Next-Cursor` header.
+    """
+    try:
+        page = fetch_page(**kwargs)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    return rows_response(page, headers=headers)
+
+async def external_source(fetch):
+    """
+        Await `fetch`, an external-source call; the source failing (past its retries, with
+        nothing cached) is a 502 Bad Gateway.
+    """
+    try:
+        return await fetch
+    except ExternalSourceError as error:
+        raise HTTPException(status_code=502, detail=str(error))
+
+def get_genome_controller(request: Request) -> "GenomeController":
+    """
+        Dependency returning the process-wide controller created by the app lifespan (see `main.py`).
+    """
+    return request.app.state.genome_controller
 
 class GenomeController:
-    def __init__(self):
-        self.genome_service = GenomeService()
+    def __init__(self, genome_service: Optional[GenomeService] = None, ingest_scheduler: Optional[IngestScheduler] = None):
+        self.genome_service = genome_service or GenomeService()
+        self.ingest_scheduler = ingest_scheduler or IngestScheduler(self.genome_service.load_genome_job)
+
+    def close(self):
+        self.ingest_scheduler.shutdown()
 
     def load_genome(self, genome_file_name_with_path: Optional[str] = Query(None)): 
-        threading.Thread(target=self.genome_router.load_genome_background, args=(genome_file_name_with_path,)).start()
-        return JSONResponse(content={"message": "Genome loading commenced", "genome_file_name_with_path": genome_file_name_with_path})
+        try:
+            job = self.ingest_scheduler.submit(genome_file_name_with_path)
+        except IngestQueueFull as error:
+            raise HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)})
+        except IngestSchedulerClosed as error:
+            raise HTTPException(status_code=503, detail=str(error))
+        content = {"message": "Genome loading queued", **job.as_dict()}
+        return JSONResponse(status_code=202, content=content, headers={"Location": f"/patient_genome/load_patient_genome/{job.job_id}"})
+
+    async def upload_genome(self, request: Request, file_name: Optional[str] = None):
+        """
+            Load the genome file in the request body (possibly gzip compressed) as it is
+            received: the body is fed, a chunk at a time, to the ingest running on a thread.
+        """
+        max_bytes = default_upload_max_bytes()
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"The genome file is larger than {max_bytes} bytes.")
+        file_name = file_name or "upload"
+        try:
+            job = self.ingest_scheduler.admit(file_name)
+        except IngestQueueFull as error:
+            raise HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)})
+        except IngestSchedulerClosed as error:
+            raise HTTPException(status_code=503, detail=str(error))
+        stream = UploadStream(max_bytes)
+        def ingest(job):
+            try:
+                return self.genome_service.load_genome_upload(io.BufferedReader(stream), file_name, job, max_rows=default_upload_max_rows())
+            finally:
+                stream.close()
+        loading = asyncio.ensure_future(asyncio.to_thread(self.ingest_scheduler.run_admitted, job, ingest))
+        try:
+            async for chunk in request.stream():
+                if chunk and not await asyncio.to_thread(stream.feed, chunk):
+                    break
+            await asyncio.to_thread(stream.finish)
+        except ClientDisconnect as error:
+            await asyncio.to_thread(stream.abort, error)
+        try:
+            await loading
+        except GenomeTooLarge as error:
+            raise HTTPException(status_code=413, detail=str(error))
+        except UploadStalled as error:
+            raise HTTPException(status_code=408, detail=str(error))
+        except (ValueError, TypeError) as error:
+            raise HTTPException(status_code=400, detail=str(error))
+        content = {"message": "Genome uploaded", **job.as_dict()}
+        return JSONResponse(status_code=201, content=content, headers={"Location": f"/patient_genome/load_patient_genome/{job.job_id}"})
+
+    def get_ingest_job(self, job_id: str):
+        job = self.ingest_scheduler.job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"No genome load {job_id}.")
+        return JSONResponse(content=job.as_dict())
 
     def get_snp_research(self, rsid: Optional[list[Any]] = None):
-        return JSONResponse(content=self.genome_service.fetch_all_snp_pairs(rsid=rsid))
+        return rows_response(self.genome_service.fetch_all_snp_pairs(rsid=rsid))
     
-    def get_snp_pairs_data_by_genotype(self, rsid: Optional[str] = None, allele1: Optional[str] = None, allele2: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_snp_pairs_data_by_genotype(rsid=rsid, allele1=allele1, allele2=allele2))
+    def get_snp_pair_index_stats(self):
+        return JSONResponse(content=self.genome_service.fetch_snp_pair_index_stats())
+
+    def reload_snp_pairs(self, dry_run: bool = False):
+        try:
+            diff = self.genome_service.reload_snp_pairs(dry_run=dry_run)
+        except (OSError, TypeError) as error:
+            raise HTTPException(status_code=503, detail=f"The SNP pairs reference could not be read: {error}")
+        return JSONResponse(content=diff.dict())
+
+    def get_variant_annotations(self, build: str = 'GRCh38', rsid: Optional[str] = None, source: Optional[str] = None, chromosome: Optional[str] = None, start: Optional[int] = None, end: Optional[int] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_variant_annotations, build=build, rsid=rsid, source=source, chromosome=chromosome, start=start, end=end, cursor=cursor, page_size=page_size)
+
+    def get_variant_annotation_counts(self):
+        return JSONResponse(content=self.genome_service.fetch_variant_annotation_counts())
+
+    def get_snp_pairs_data_by_genotype(self, rsid: Optional[str] = None, allele1: Optional[str] = None, allele2: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_snp_pairs_data_by_genotype, rsid=rsid, allele1=allele1, allele2=allele2, cursor=cursor, page_size=page_size)
+
+    async def get_list_of_chromosomes_from_ensembl_api(self): 
+        return JSONResponse(content=await external_source(self.genome_service.fetch_chromosomes_from_ensembl()))
+
+    async def get_list_of_chromosomes_from_gprofiler_api(self): 
+        return JSONResponse(content=await external_source(self.genome_service.fetch_chromosomes_from_gprofiler()))
+
+    async def get_from_gprofiler_api_gene_data_matching_variant_rsid(self, rsid: Optional[str] = None):
+        return JSONResponse(content=await external_source(self.genome_service.fetch_gene_data_by_variant(rsid=rsid)))
+
+    async def get_genes_by_variants(self, rsids: list[str]):
+        try:
+            genes = await external_source(self.genome_service.fetch_genes_by_variants(rsids))
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+        return JSONResponse(content=genes)
+
+    def get_cohort_allele_frequencies(self, rsid: list):
+        try:
+            return JSONResponse(content=self.genome_service.fetch_cohort_allele_frequencies(rsid))
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+
+    def get_cohort_snp_pair_prevalence(self, rsid: Optional[list] = None, limit: Optional[int] = None):
+        return rows_response(self.genome_service.fetch_cohort_snp_pair_prevalence(rsid, limit))
+
+    def get_cohort_matrix_stats(self):
+        return JSONResponse(content=self.genome_service.fetch_cohort_matrix_stats())
+
+    def get_response_cache_stats(self):
+        return JSONResponse(content=self.genome_service.fetch_response_cache_stats())
 
-    def get_list_of_chromosomes_from_ensembl_api(self): 
-        return JSONResponse(content=self.genome_service.fetch_chromosomes_from_ensembl())
+    def get_patient_profile(self, patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_patient_profile, patient_id=patient_id, cursor=cursor, page_size=page_size)
 
-    def get_list_of_chromosomes_from_gprofiler_api(self): 
-        return JSONResponse(content=self.genome_service.fetch_chromosomes_from_gprofiler())
+    def get_patient_genome_data(self, patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE, order_by: str = 'rsid'):
+        return page_response(self.genome_service.fetch_patient_genome_data, patient_id=patient_id, rsid=rsid, cursor=cursor, page_size=page_size, order_by=order_by)
 
-    def get_from_gprofiler_api_gene_data_matching_variant_rsid(self, rsid: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_gene_data_by_variant(rsid=rsid))
+    def get_patient_genome_data_expanded(self, patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE, order_by: str = 'rsid'):
+        return page_response(self.genome_service.fetch_patient_data_expanded, patient_id=patient_id, rsid=rsid, cursor=cursor, page_size=page_size, order_by=order_by)
 
-    def get_patient_profile(self, patient_id: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_patient_profile(patient_id=patient_id)) 
+    def get_genome_region(self, chromosome: str, start: int, end: int, patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_genome_region, chromosome=chromosome, start=start, end=end, patient_id=patient_id, cursor=cursor, page_size=page_size)
 
-    def get_patient_genome_data(self, patient_id: Optional[str] = None, rsid: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_patient_genome_data(patient_id=patient_id, rsid=rsid))
+    def get_patient_variant_annotations(self, build: str = 'GRCh38', patient_id: Optional[str] = None, rsid: Optional[str] = None, source: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_patient_variant_annotations, build=build, patient_id=patient_id, rsid=rsid, source=source, cursor=cursor, page_size=page_size)
 
-    def get_patient_genome_data_expanded(self, patient_id: Optional[str] = None, rsid: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_patient_data_expanded(patient_id=patient_id, rsid=rsid))
+    def get_full_report(self, patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE, order_by: str = 'rsid'):
+        return page_response(self.genome_service.fetch_full_report, patient_id=patient_id, rsid=rsid, cursor=cursor, page_size=page_size, order_by=order_by)
 
-    def get_full_report(self, patient_id: Optional[str] = None, rsid: Optional[str] = None):
-        return JSONResponse(content=self.genome_service.fetch_full_report(patient_id=patient_id, rsid=rsid))
+    def get_risk_scores(self, patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        return page_response(self.genome_service.fetch_patient_report_summary, patient_id=patient_id, cursor=cursor, page_size=page_size)
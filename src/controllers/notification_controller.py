@@ -1,13 +1,20 @@
+from typing import Optional
 from fastapi import WebSocket
 from services.notification_service import NotificationService
 
+def get_notification_controller(websocket: WebSocket) -> "NotificationController":
+    """
+        Dependency returning the process-wide controller created by the app lifespan (see `main.py`).
+    """
+    return websocket.app.state.notification_controller
+
 class NotificationController:
-    def __init__(self):
-        self.notification_service = NotificationService()
+    def __init__(self, notification_service: Optional[NotificationService] = None):
+        self.notification_service = notification_service or NotificationService()
 
     async def notify_patient_file_load_complete(self, websocket: WebSocket): 
         """
-            WebSocket endpoint for real-time communication.
+            Stream genome load events to the client until it disconnects.
 
             - **Websocket**: The WebSocket connection instance.
         """
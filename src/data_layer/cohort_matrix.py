@@ -0,0 +1,134 @@
+import threading
+import numpy as np
+from data_layer.genome_cache import GENOTYPES
+from genotype_matching import ALLELE_CODES, ALLELE_MASKS, COMPLEMENT_CODES, NO_CALL, PALINDROMIC_MASKS, encode_genotypes
+
+GENOTYPE_CODE_COUNT = 7 * 7
+ALLELES = sorted(ALLELE_CODES, key=ALLELE_CODES.get)
+# Genotype code (see genotype_matching.py) -> the alleles it holds: DOSES[code, allele code] is the
+# number of copies, CARRIES[code, allele code] 1 if there is at least one.
+DOSES = np.zeros((GENOTYPE_CODE_COUNT, 7), dtype=np.int64)
+for _low in range(1, 7):
+    for _high in range(_low, 7):
+        DOSES[_low * 7 + _high, _low] += 1
+        DOSES[_low * 7 + _high, _high] += 1
+CARRIES = (DOSES > 0).astype(np.int64)
+GENOTYPE_NAMES = {low * 7 + high: ALLELES[low - 1] + ALLELES[high - 1] for low in range(1, 7) for high in range(low, 7)}
+# The columnar cache keeps the allele order (see genome_cache.py): its codes, as genotype codes.
+CACHED_GENOTYPE_CODES = encode_genotypes(GENOTYPES)
+
+class CohortGenotypeMatrix:
+    """
+        The genotypes of every patient at a fixed set of rsids (those of the SNP pairs reference),
+        as a dense patients x rsids int8 matrix of genotype codes (see genotype_matching.py; 0
+        where the patient has no call, or no row.) About 7.7k bytes per patient for the
+        reference, so 10k patients take ~77 MB.
+
+        Patients are added (or replaced) one row at a time as genomes are ingested; the rows grow
+        by doubling. The genotype counts of each rsid (rsids x 49) are kept up to date with the
+        rows, so cohort statistics never rescan the matrix: allele counts, carriers and SNP pair
+        prevalence follow from the counts by a matrix product or a lookup.
+    """
+
+    def __init__(self, rsid_codes, capacity=64):
+        self.rsid_codes = np.unique(np.asarray(rsid_codes, dtype=np.int64))
+        self.genotypes = np.zeros((capacity, len(self.rsid_codes)), dtype=np.int8)
+        self.counts = np.zeros((len(self.rsid_codes), GENOTYPE_CODE_COUNT), dtype=np.int64)
+        self.patient_rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.patient_rows)
+
+    def set_patient(self, patient_id, rsid_codes, genotype_codes):
+        """
+            Store a patient's genotypes (parallel arrays of rsid codes and genotype codes); rsids
+            outside the matrix are ignored.
+        """
+        rsid_codes = np.asarray(rsid_codes, dtype=np.int64)
+        columns = np.searchsorted(self.rsid_codes, rsid_codes)
+        known = columns < len(self.rsid_codes)
+        known[known] = self.rsid_codes[columns[known]] == rsid_codes[known]
+        row = np.zeros(len(self.rsid_codes), dtype=np.int8)
+        row[columns[known]] = np.asarray(genotype_codes, dtype=np.int8)[known]
+        with self._lock:
+            index = self.patient_rows.get(patient_id)
+            if index is None:
+                index = len(self.patient_rows)
+                if index == len(self.genotypes):
+                    grown = np.zeros((max(1, 2 * len(self.genotypes)), len(self.rsid_codes)), dtype=np.int8)
+                    grown[:index] = self.genotypes
+                    self.genotypes = grown
+                self.patient_rows[patient_id] = index
+                # Counted as a row of no-calls, replaced below.
+                self.counts[:, NO_CALL] += 1
+            # Each column once per index array, so the fancy-indexed updates do not collide.
+            all_columns = np.arange(len(self.rsid_codes))
+            self.counts[all_columns, self.genotypes[index]] -= 1
+            self.counts[all_columns, row] += 1
+            self.genotypes[index] = row
+
+    def set_patient_columns(self, patient_id, columns):
+        """
+            Store a patient's genotypes from their cached GenomeColumns (sorted by rsid code.)
+        """
+        rows = np.searchsorted(columns.rsid, self.rsid_codes)
+        found = rows < len(columns.rsid)
+        found[found] = np.asarray(columns.rsid[rows[found]]) == self.rsid_codes[found]
+        genotypes = CACHED_GENOTYPE_CODES[np.asarray(columns.genotype[rows[found]])]
+        self.set_patient(patient_id, self.rsid_codes[found], genotypes)
+
+    def columns_of(self, rsid_codes):
+        """
+            The matrix column of each of `rsid_codes`, -1 for rsids outside the matrix.
+        """
+        rsid_codes = np.asarray(rsid_codes, dtype=np.int64)
+        columns = np.searchsorted(self.rsid_codes, rsid_codes)
+        inside = columns < len(self.rsid_codes)
+        inside[inside] = self.rsid_codes[columns[inside]] == rsid_codes[inside]
+        return np.where(inside, columns, -1)
+
+    def genotype_counts(self, columns=None):
+        """
+            (columns x 49) counts of each genotype code in each column (all columns by default);
+            column 0 counts the patients without a call.
+        """
+        with self._lock:
+            return self.counts.copy() if columns is None else self.counts[np.asarray(columns, dtype=np.int64)]
+
+    def allele_statistics(self, columns):
+        """
+            For each column: (patients called, genotype counts (columns x 49), allele counts and
+            carriers (columns x 7, by allele code.)) A single-allele call counts twice, as in
+            genotype matching.
+        """
+        counts = self.genotype_counts(columns)
+        called = counts[:, 1:].sum(axis=1)
+        return called, counts, counts @ DOSES, counts @ CARRIES
+
+    def pair_carriers(self, columns, pair_codes, reference_masks=None):
+        """
+            For parallel columns and SNP pair genotype codes: (patients whose genotype is the
+            pair's, in either order and, as in reports (see `match_codes`), on either strand,
+            patients called.) `reference_masks`: the alleles of each pair's rsid, by default the
+            pair's own.
+        """
+        pair_codes = np.asarray(pair_codes, dtype=np.int64)
+        reference_masks = ALLELE_MASKS[pair_codes] if reference_masks is None else np.asarray(reference_masks, dtype=np.int64)
+        counts = self.genotype_counts(columns)
+        rows = np.arange(len(pair_codes))
+        complements = COMPLEMENT_CODES[pair_codes].astype(np.int64)
+        # The complement genotype counts only if its alleles are outside the rsid's, on a non-palindromic rsid.
+        flipped = (complements != pair_codes) & (ALLELE_MASKS[complements] & ~reference_masks != 0) & ~PALINDROMIC_MASKS[reference_masks]
+        carriers = counts[rows, pair_codes] + np.where(flipped, counts[rows, complements], 0)
+        carriers[pair_codes == NO_CALL] = 0
+        return carriers, counts[:, 1:].sum(axis=1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "patients": len(self.patient_rows),
+                "rsids": len(self.rsid_codes),
+                "bytes": int(self.genotypes[:len(self.patient_rows)].nbytes + self.counts.nbytes),
+                "capacity": len(self.genotypes),
+            }
@@ -0,0 +1,129 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+import httpx
+
+# Responses worth retrying: throttled, or the upstream (or a proxy in front of it) failing.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+USER_AGENT = "GenomeSearch/1.0.0"
+
+def env_number(name, default, kind=float):
+    return kind(os.getenv(name) or default)
+
+class ExternalSourceError(Exception):
+    """
+        An external source failed to answer, after the retries; `status_code` is the last HTTP
+        status received (None when the request itself failed, e.g. timed out.)
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ExternalHttpClient:
+    """
+        The one HTTP client of the external genome data sources (Ensembl, g:Profiler), shared
+        by every request of the process so connections are pooled and kept alive.
+
+        Requests to one host run at most `max_per_host` at a time (the others wait their turn
+        instead of tripping the source's rate limits); failed requests (transport errors,
+        timeouts, 429 and 5xx responses) are retried up to `retries` times, after an
+        exponentially growing, randomly jittered delay, or the delay the source asks for in
+        Retry-After.
+    """
+
+    def __init__(self, timeout=None, connect_timeout=None, retries=None, max_connections=None, max_per_host=None, backoff=None, max_backoff=None, transport=None):
+        self.retries = retries if retries is not None else env_number('HTTP_RETRIES', 3, int)
+        self.max_per_host = max_per_host or env_number('HTTP_MAX_PER_HOST', 8, int)
+        self.backoff = backoff if backoff is not None else env_number('HTTP_RETRY_BACKOFF_SECONDS', 0.5)
+        self.max_backoff = max_backoff if max_backoff is not None else env_number('HTTP_MAX_RETRY_BACKOFF_SECONDS', 10)
+        max_connections = max_connections or env_number('HTTP_MAX_CONNECTIONS', 32, int)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout or env_number('HTTP_TIMEOUT_SECONDS', 30), connect=connect_timeout or env_number('HTTP_CONNECT_TIMEOUT_SECONDS', 5)),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"User-Agent": USER_AGENT},
+            transport=transport,
+        )
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self._host_limits = {}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _host_limit(self, url):
+        host = httpx.URL(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return limit
+
+    async def get_json(self, url, **kwargs):
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url, body, **kwargs):
+        return await self.request_json("POST", url, json=body, **kwargs)
+
+    async def request_json(self, method, url, **kwargs):
+        """
+            The decoded JSON body of `method` `url`; ExternalSourceError once the retries are
+            spent, or at once for a response not worth retrying (e.g. 400, 404.)
+        """
+        limit = self._host_limit(url)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            async with limit:
+                self.requests += 1
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError as error:
+                    failure = ExternalSourceError(f"{method} {url} failed: {type(error).__name__} {error}")
+                else:
+                    if response.is_success:
+                        return response.json()
+                    failure = ExternalSourceError(f"{method} {url} failed: {response.status_code} {error_message(response)}", response.status_code)
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        self.failures += 1
+                        raise failure
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            if attempt == self.retries:
+                break
+            self.retried += 1
+            delay = min(self.max_backoff, retry_after if retry_after is not None else random.uniform(0, self.backoff * 2 ** attempt))
+            logging.warning(f"{failure}; retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        self.failures += 1
+        raise failure
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "max_per_host": self.max_per_host,
+        }
+
+def error_message(response):
+    # The source's own message when it sends one (as g:Profiler does), else the reason phrase.
+    try:
+        return response.json()["message"]
+    except Exception:
+        return response.reason_phrase
+
+def retry_after_seconds(value):
+    """
+        Seconds to wait from a Retry-After header (delta seconds or an HTTP date), or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
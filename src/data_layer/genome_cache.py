@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import uuid
+from collections import namedtuple
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+from data_layer.rsid_codes import encode_rsids
+
+# A patient genome, column-wise: rsid (int64, see rsid_codes.py), chromosome (uint8), position
+# (uint32) and genotype (uint8, see GENOTYPES.)
+GenomeColumns = namedtuple('GenomeColumns', ['rsid', 'chromosome', 'position', 'genotype'])
+COLUMN_DTYPES = GenomeColumns(rsid=np.int64, chromosome=np.uint8, position=np.uint32, genotype=np.uint8)
+GENOME_FRAME_COLUMNS = ['rsid', 'chromosome', 'position', 'genotype']
+
+# Chromosomes 1-22 are their own code; 0 is unknown.
+CHROMOSOMES = [None] + [str(number) for number in range(1, 23)] + ['X', 'Y', 'XY', 'MT']
+CHROMOSOME_CODES = {chromosome: code for code, chromosome in enumerate(CHROMOSOMES) if chromosome}
+CHROMOSOME_CODES.update({'23': CHROMOSOME_CODES['X'], '24': CHROMOSOME_CODES['Y'], '25': CHROMOSOME_CODES['XY'],
+                         '26': CHROMOSOME_CODES['MT'], 'M': CHROMOSOME_CODES['MT']})
+
+# Genotypes keep their allele order: first * 7 + second, each allele 1-6 and the second 0 for a
+# single-allele call. 0 is a no-call.
+ALLELES = [None, 'A', 'C', 'G', 'T', 'D', 'I']
+GENOTYPES = ['--'] + [''] * 48
+for _first in range(1, 7):
+    for _second in range(7):
+        GENOTYPES[_first * 7 + _second] = ALLELES[_first] + (ALLELES[_second] or '')
+GENOTYPE_CODES = {genotype: code for code, genotype in enumerate(GENOTYPES) if code}
+GENOTYPE_TABLE = np.array(GENOTYPES, dtype=object)
+CHROMOSOME_TABLE = np.array([chromosome or '' for chromosome in CHROMOSOMES], dtype=object)
+
+STRING_FIELDS = ['rsid', 'chromosome', 'genotype']
+
+def _encode_with(mapping, values, dtype):
+    # Each distinct string is looked up once; factorize marks missing values -1, the 0 appended last.
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    table = np.array([mapping.get(str(value).strip().upper(), 0) for value in uniques] + [0], dtype=dtype)
+    return table[codes]
+
+def decode_columns(columns, rows):
+    """
+        The rows `rows` of GenomeColumns as arrays of strings (rsids, chromosomes, genotypes) and positions.
+    """
+    rsid = np.asarray(columns.rsid[rows])
+    return (
+        np.where(rsid > 0, 'rs', 'i').astype(object) + np.abs(rsid).astype(str).astype(object),
+        CHROMOSOME_TABLE[np.asarray(columns.chromosome[rows])],
+        np.asarray(columns.position[rows]).astype(np.int64),
+        GENOTYPE_TABLE[np.asarray(columns.genotype[rows])],
+    )
+
+def encode_genome_frame(genome_df):
+    """
+        The columns of a genome DataFrame (rsid, chromosome, position, genotype), encoded; and
+        the values that do not decode back as they were (e.g. an rsid like 'VG01S1234', a '00'
+        no-call, or a position outside uint32), {column: {row: value}}, so the cache stays lossless.
+    """
+    position = pd.to_numeric(genome_df['position']).to_numpy(dtype=np.int64)
+    columns = GenomeColumns(
+        rsid=encode_rsids(genome_df['rsid'].to_numpy()),
+        chromosome=_encode_with(CHROMOSOME_CODES, genome_df['chromosome'].to_numpy(), np.uint8),
+        position=position.astype(np.uint32),
+        genotype=_encode_with(GENOTYPE_CODES, genome_df['genotype'].to_numpy(), np.uint8),
+    )
+    rows = np.arange(len(genome_df))
+    exceptions = {}
+    differs = np.flatnonzero(columns.position.astype(np.int64) != position)
+    if len(differs):
+        exceptions['position'] = dict(zip(differs.tolist(), position[differs].tolist()))
+    rsid, chromosome, _, genotype = decode_columns(columns, rows)
+    for field, decoded in zip(STRING_FIELDS, (rsid, chromosome, genotype)):
+        original = genome_df[field].to_numpy(dtype=object)
+        differs = np.flatnonzero(decoded != original)
+        if len(differs):
+            exceptions[field] = dict(zip(differs.tolist(), original[differs].tolist()))
+    return columns, exceptions
+
+def concatenate_columns(chunks):
+    return GenomeColumns(*(np.concatenate([getattr(chunk, field) for chunk in chunks]).astype(dtype, copy=False)
+                           if chunks else np.empty(0, dtype=dtype)
+                           for field, dtype in zip(GenomeColumns._fields, COLUMN_DTYPES)))
+
+def cache_directory(db_path):
+    """
+        Where the cache of a database lives: GENOME_CACHE_PATH, or a directory beside the database
+        file. None (no cache) for an in-memory database.
+    """
+    if os.getenv('GENOME_CACHE_PATH'):
+        return os.getenv('GENOME_CACHE_PATH')
+    if not db_path or db_path == ':memory:' or db_path.startswith('file:'):
+        return None
+    return f"{db_path}.cache"
+
+class GenomeColumnarCache:
+    """
+        Patient genomes persisted column-wise, one .npy file per column (a few bytes per SNP),
+        and memory-mapped on load: the arrays are pages of the files, read on demand and shared
+        between loads, so loading a whole genome costs milliseconds and no copy.
+
+        The cache is derived from patient_genome_data: `write` replaces a patient's entry (the
+        new one is written aside, then the old one renamed away and the new one into place, so
+        a load sees a whole entry, or none), and `invalidate` drops it while the patient's
+        genome is being reloaded.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, patient_id):
+        return os.path.join(self.directory, quote(patient_id, safe=''))
+
+    def write(self, patient_id, columns, exceptions=None):
+        """
+            Rows are stored sorted by rsid code, so the rows of given rsids are found by binary search.
+        """
+        order = np.argsort(columns.rsid, kind='stable')
+        new_rows = np.empty_like(order)
+        new_rows[order] = np.arange(len(order))
+        staging = os.path.join(self.directory, f".{uuid.uuid4().hex}")
+        retired = os.path.join(self.directory, f".{uuid.uuid4().hex}")
+        try:
+            os.makedirs(staging)
+            for field, dtype in zip(GenomeColumns._fields, COLUMN_DTYPES):
+                np.save(os.path.join(staging, f"{field}.npy"), np.asarray(getattr(columns, field), dtype=dtype)[order])
+            with open(os.path.join(staging, "exceptions.json"), "w") as file:
+                json.dump({field: {str(new_rows[row]): value for row, value in values.items()} for field, values in (exceptions or {}).items()}, file)
+            try:
+                os.rename(self.path(patient_id), retired)
+            except FileNotFoundError:
+                pass
+            # Fails (OSError) if a concurrent write of the patient got there first: its entry stays.
+            os.rename(staging, self.path(patient_id))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.rmtree(retired, ignore_errors=True)
+
+    def invalidate(self, patient_id):
+        shutil.rmtree(self.path(patient_id), ignore_errors=True)
+
+    def load(self, patient_id):
+        """
+            The patient's GenomeColumns, memory-mapped read-only; None if not cached.
+        """
+        path = self.path(patient_id)
+        try:
+            return GenomeColumns(*(np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r') for field in GenomeColumns._fields))
+        except FileNotFoundError:
+            return None
+
+    def exceptions(self, patient_id):
+        with open(os.path.join(self.path(patient_id), "exceptions.json")) as file:
+            return {field: {int(row): value for row, value in values.items()} for field, values in json.load(file).items()}
+
+    def frame(self, patient_id, rsids=None):
+        """
+            The patient's genome (or only its rows at `rsids`) as a DataFrame of strings, like
+            patient_genome_data; None if not cached. Only the selected rows are decoded.
+        """
+        columns = self.load(patient_id)
+        if columns is None:
+            return None
+        exceptions = self.exceptions(patient_id)
+        if rsids is None:
+            rows = np.arange(len(columns.rsid))
+        else:
+            rows = self._rows_of(columns.rsid, encode_rsids(list(rsids)))
+            wanted_strings = set(rsids)
+            rsid_exceptions = exceptions.get('rsid', {})
+            if rsid_exceptions:
+                selected = set(rows.tolist())
+                for row, rsid in rsid_exceptions.items():
+                    (selected.add if rsid in wanted_strings else selected.discard)(row)
+                rows = np.array(sorted(selected), dtype=np.int64)
+        decoded = dict(zip(GENOME_FRAME_COLUMNS, decode_columns(columns, rows)))
+        for field, values in exceptions.items():
+            positions = np.searchsorted(rows, list(values))
+            for position, (row, value) in zip(positions.tolist(), values.items()):
+                if position < len(rows) and rows[position] == row:
+                    decoded[field][position] = value
+        return pd.DataFrame(decoded, columns=GENOME_FRAME_COLUMNS)
+
+    @staticmethod
+    def _rows_of(rsid_column, codes):
+        # Every row of each code: a binary search for the (sorted) column's run of equal codes.
+        codes = np.unique(codes[codes != 0])
+        first = np.searchsorted(rsid_column, codes, side='left')
+        counts = np.searchsorted(rsid_column, codes, side='right') - first
+        starts = np.repeat(first - np.cumsum(counts) + counts, counts)
+        return starts + np.arange(counts.sum())
+
+    def stats(self, patient_id):
+        columns = self.load(patient_id)
+        if columns is None:
+            return None
+        return {"rows": len(columns.rsid), "bytes": sum(column.nbytes for column in columns)}
@@ -1,20 +1,69 @@
+import logging
+import threading
+import numpy as np
+from genotype_matching import encode_allele_pairs, encode_genotypes, match_patient, reference_allele_masks
+from data_layer.cohort_matrix import ALLELES, GENOTYPE_NAMES, CohortGenotypeMatrix
+from data_layer.genome_cache import GenomeColumnarCache, cache_directory
+from data_layer.migrations import apply_migrations
+from data_layer.rsid_codes import rsid_filter_codes
+from data_layer.sqlite_worker import GenomeSqlWorker
 from repositories.patient_genome_repository import PatientGenomeRepository
 from repositories.genome_research_repository import GenomeResearchRepository
+from repositories.variant_annotation_repository import VariantAnnotationRepository
 
 class GenomeDatabaseManager:
     def __init__(self, db_path):
-        self.genome_research_repository = GenomeResearchRepository(db_path)
-        self.patient_genome_repository = PatientGenomeRepository(db_path)
+        # One worker (one connection, one writer thread) shared by every repository.
+        self.sql_worker = GenomeSqlWorker(db_path)
+        self.genome_research_repository = GenomeResearchRepository(db_path, sql_worker=self.sql_worker)
+        self.patient_genome_repository = PatientGenomeRepository(db_path, sql_worker=self.sql_worker)
+        self.variant_annotation_repository = VariantAnnotationRepository(db_path, sql_worker=self.sql_worker)
+        # The repositories' in-memory state (SNP pair index, ready reports) was read from the
+        # schema as it was: migrations can rewrite the rows it came from (e.g. TEXT to INTEGER rsids.)
+        if apply_migrations(self.sql_worker):
+            self.genome_research_repository.load_snp_pair_index()
+            self.patient_genome_repository.load_ready_reports()
+        # Column metadata for every registered query, resolved once against the migrated schema.
+        self.genome_research_repository.queries.prepare(self.sql_worker)
+        self.patient_genome_repository.queries.prepare(self.sql_worker)
+        self.variant_annotation_repository.queries.prepare(self.sql_worker)
+        directory = cache_directory(db_path)
+        self.genome_cache = GenomeColumnarCache(directory) if directory else None
+        # Built on first use (see `fetch_cohort_matrix`), then kept up to date as genomes are ingested.
+        self.cohort_matrix = None
+        self._cohort_lock = threading.Lock()
 
     def close_connection(self):
-        self.genome_research_repository.close_connection()
-        self.patient_genome_repository.close_connection()
+        self.sql_worker.close()
 
     def update_or_insert_snp_pair(self, snp_pair):
         self.genome_research_repository.update_or_insert_snp_pair(snp_pair)
+        self.refresh_patient_reports([snp_pair.rsid])
+        self._reset_cohort_matrix()
 
     def save_snp_pairs_to_db(self, snp_df):
-        self.genome_research_repository.save_snp_pairs_to_db(snp_df)
+        import_summary = self.genome_research_repository.save_snp_pairs_to_db(snp_df)
+        self.refresh_patient_reports(snp_df['rsid'].dropna().unique().tolist())
+        self._reset_cohort_matrix()
+        return import_summary
+
+    def delete_snp_pairs(self, rsid_genotypes):
+        rsids = self.genome_research_repository.delete_snp_pairs(rsid_genotypes)
+        self.refresh_patient_reports(rsids)
+        self._reset_cohort_matrix()
+        return len(rsid_genotypes)
+
+    def fetch_snp_pair_hashes(self):
+        return self.genome_research_repository.fetch_snp_pair_hashes()
+
+    def fetch_reference_hash(self, source):
+        return self.genome_research_repository.fetch_reference_hash(source)
+
+    def save_reference_hash(self, source, content_hash):
+        self.genome_research_repository.save_reference_hash(source, content_hash)
+
+    def count_snp_pairs(self):
+        return self.genome_research_repository.count_snp_pairs()
 
     def update_or_insert_patient(self, patient):
         self.patient_genome_repository.update_or_insert_patient(patient)
@@ -23,13 +72,166 @@ class GenomeDatabaseManager:
         self.patient_genome_repository.update_or_insert_patient_genome_data(patient_genome_data)
 
     def update_patient_and_genome_data(self, patient_df, patient_id, patient_name):
-        self.patient_genome_repository.update_patient_and_genome_data(patient_df, patient_id, patient_name)
+        self._invalidate_patient_genome(patient_id)
+        import_summary = self.patient_genome_repository.update_patient_and_genome_data(patient_df, patient_id, patient_name)
+        self.cache_patient_genome(patient_id)
+        self._update_cohort_patient(patient_id)
+        return import_summary
+
+    def ingest_patient_genome(self, patient, genome_dfs, validate=True):
+        self._invalidate_patient_genome(patient.patient_id)
+        import_summary = self.patient_genome_repository.ingest_patient_genome(patient, genome_dfs, validate=validate)
+        self.cache_patient_genome(patient.patient_id)
+        self._update_cohort_patient(patient.patient_id)
+        return import_summary
+
+    def _invalidate_patient_genome(self, patient_id):
+        self.patient_genome_repository.mark_patient_report_pending(patient_id)
+        if self.genome_cache is not None:
+            self.genome_cache.invalidate(patient_id)
+
+    def cache_patient_genome(self, patient_id):
+        """
+            Write the patient's genome to the columnar cache. The cache is an optimisation: a
+            failure is logged, and reads fall back to the database.
+        """
+        if self.genome_cache is None:
+            return
+        try:
+            self.genome_cache.write(patient_id, *self.patient_genome_repository.fetch_patient_genome_columns(patient_id))
+        except OSError as error:
+            logging.warning(f"Genome of patient {patient_id} not cached: {error}")
+
+    def load_patient_genome_columns(self, patient_id):
+        """
+            The patient's genome as memory-mapped GenomeColumns (see genome_cache.py); None if not cached.
+        """
+        return self.genome_cache.load(patient_id) if self.genome_cache is not None else None
+
+    def fetch_cohort_matrix(self):
+        """
+            The cohort genotype matrix (see cohort_matrix.py) at the SNP pairs reference rsids,
+            built from every patient's genome the first time it is needed, or after the
+            reference changed.
+        """
+        with self._cohort_lock:
+            if self.cohort_matrix is None:
+                cohort_matrix = CohortGenotypeMatrix(self.genome_research_repository.fetch_snp_pair_rsid_codes())
+                for patient_id in self.patient_genome_repository.fetch_patient_ids():
+                    self._load_cohort_patient(cohort_matrix, patient_id)
+                self.cohort_matrix = cohort_matrix
+            return self.cohort_matrix
+
+    def _load_cohort_patient(self, cohort_matrix, patient_id):
+        # From the columnar cache when the patient is cached (its rsid codes are those of rs and
+        # i IDs, which SNP pairs use), else from the database.
+        columns = self.load_patient_genome_columns(patient_id)
+        if columns is not None:
+            cohort_matrix.set_patient_columns(patient_id, columns)
+            return
+        rsid_codes, genotypes = self.patient_genome_repository.fetch_patient_reference_genotypes(patient_id)
+        cohort_matrix.set_patient(patient_id, rsid_codes, encode_genotypes(genotypes))
+
+    def _update_cohort_patient(self, patient_id):
+        with self._cohort_lock:
+            if self.cohort_matrix is not None:
+                self._load_cohort_patient(self.cohort_matrix, patient_id)
+
+    def _reset_cohort_matrix(self):
+        # The matrix columns are the reference rsids: rebuilt when next needed.
+        with self._cohort_lock:
+            self.cohort_matrix = None
+
+    def fetch_cohort_allele_frequencies(self, rsids):
+        """
+            For each of `rsids` (with SNP pairs): the patients called, and the count and
+            frequency of each allele, of its carriers, and of each genotype seen, as a list of dicts.
+        """
+        cohort_matrix = self.fetch_cohort_matrix()
+        columns = cohort_matrix.columns_of(rsid_filter_codes(self.sql_worker, list(rsids)))
+        known = columns >= 0
+        called, genotype_counts, allele_counts, carriers = cohort_matrix.allele_statistics(columns[known])
+        frequencies = []
+        for row, rsid in enumerate(np.asarray(rsids, dtype=object)[known].tolist()):
+            total_alleles = 2 * int(called[row])
+            frequencies.append({
+                'rsid': rsid,
+                'patients': len(cohort_matrix),
+                'called': int(called[row]),
+                'alleles': {ALLELES[code - 1]: {
+                    'count': int(allele_counts[row, code]),
+                    'frequency': allele_counts[row, code] / total_alleles,
+                    'carriers': int(carriers[row, code]),
+                } for code in np.flatnonzero(allele_counts[row]).tolist()},
+                'genotypes': {GENOTYPE_NAMES[code]: {
+                    'count': int(genotype_counts[row, code]),
+                    'frequency': genotype_counts[row, code] / int(called[row]),
+                } for code in (np.flatnonzero(genotype_counts[row, 1:]) + 1).tolist()},
+            })
+        return frequencies
+
+    def fetch_cohort_snp_pair_prevalence(self, rsids=None):
+        """
+            The SNP pairs (of `rsids`, or the whole reference) with the number of patients
+            called at their rsid, of those with their genotype (as reports match it: either
+            order, and the other strand on non-palindromic rsids), and its prevalence, most prevalent first, as a DataFrame.
+        """
+        cohort_matrix = self.fetch_cohort_matrix()
+        snp_pairs_df = self.genome_research_repository.fetch_snp_pairs_frame(rsids)
+        columns = cohort_matrix.columns_of(rsid_filter_codes(self.sql_worker, snp_pairs_df['rsid'].tolist()))
+        pair_codes = encode_allele_pairs(snp_pairs_df['allele1'], snp_pairs_df['allele2'])
+        reference_masks = reference_allele_masks(snp_pairs_df['rsid'].to_numpy(), pair_codes)
+        inside = columns >= 0
+        snp_pairs_df = snp_pairs_df[inside]
+        carriers, called = cohort_matrix.pair_carriers(columns[inside], pair_codes[inside], reference_masks[inside])
+        prevalence_df = snp_pairs_df[['rsid', 'rsid_genotypes', 'allele1', 'allele2', 'magnitude', 'risk']].assign(
+            called=called, carriers=carriers, prevalence=np.divide(carriers, called, out=np.zeros(len(called)), where=called > 0))
+        return prevalence_df.sort_values(['prevalence', 'carriers', 'rsid_genotypes'], ascending=[False, False, True], kind='stable').reset_index(drop=True)
+
+    def cohort_matrix_stats(self):
+        return self.fetch_cohort_matrix().stats()
+
+    def materialize_patient_report(self, patient_id):
+        """
+            Build a patient's full report with the matching engine and store it, with its risk
+            scores, in patient_report. Returns the number of report rows.
+        """
+        self.patient_genome_repository.mark_patient_report_pending(patient_id)
+        report_df = match_patient(self.fetch_patient_genome_frame(patient_id), self.fetch_snp_pairs_frame())
+        return self.patient_genome_repository.save_patient_report(patient_id, report_df)
+
+    def refresh_patient_reports(self, rsids):
+        """
+            Re-match the report rows of `rsids`, whose SNP pairs changed, in every ready report.
+            Returns the number of patients refreshed.
+        """
+        if not rsids:
+            return 0
+        genome_df = self.patient_genome_repository.fetch_ready_patient_genome_frame(rsids)
+        report_df = match_patient(genome_df, self.genome_research_repository.fetch_snp_pairs_frame(rsids))
+        return self.patient_genome_repository.refresh_patient_reports(rsids, report_df)
 
     def fetch_snp_pairs_data(self, offset=0, **kwargs):
         return self.genome_research_repository.fetch_snp_pairs_data(offset=offset, **kwargs)
 
-    def fetch_genes_in_genome(self, offset=0, **kwargs):
-        return self.genome_research_repository.fetch_genes_in_genome(offset=offset, **kwargs)
+    def fetch_snp_pairs_frame(self):
+        return self.genome_research_repository.fetch_snp_pairs_frame()
+
+    def fetch_patient_genome_frame(self, patient_id):
+        """
+            The patient's genome rows at rsids with SNP pairs (for `match_patient`), from the
+            columnar cache when the patient is cached.
+        """
+        genome_df = self.genome_cache.frame(patient_id, self.genome_research_repository.snp_pair_index.rsids()) if self.genome_cache is not None else None
+        if genome_df is None:
+            return self.patient_genome_repository.fetch_patient_genome_frame(patient_id)
+        patients = self.patient_genome_repository.fetch_patients(patient_id=patient_id)
+        genome_df.insert(0, 'patient_id', patient_id)
+        genome_df.insert(1, 'patient_name', patients.rows[0][1] if patients.rows else None)
+        return genome_df
+
+    def snp_pair_index_stats(self):
+        return self.genome_research_repository.snp_pair_index_stats()
 
     def fetch_patients(self, offset=0, **kwargs):
         return self.patient_genome_repository.fetch_patients(offset=offset, **kwargs)
@@ -38,10 +240,28 @@ class GenomeDatabaseManager:
         return self.patient_genome_repository.fetch_patient_genome_data(offset=offset, **kwargs)
     
     def fetch_snp_pairs_data_by_genotype(self, offset=0, **kwargs):  
-        return self.patient_genome_repository.fetch_snp_pairs_data_by_genotype(self, offset=offset, **kwargs)
+        return self.patient_genome_repository.fetch_snp_pairs_data_by_genotype(offset=offset, **kwargs)
 
     def fetch_patient_data_expanded(self, offset=0, **kwargs):
         return self.patient_genome_repository.fetch_patient_data_expanded(offset=offset, **kwargs)
 
+    def fetch_genome_region(self, offset=0, **kwargs):
+        return self.patient_genome_repository.fetch_genome_region(offset=offset, **kwargs)
+
     def fetch_full_report(self, offset=0, **kwargs):
-        return self.patient_genome_repository.fetch_full_report(offset=offset, **kwargs)
\ No newline at end of file
+        return self.patient_genome_repository.fetch_full_report(offset=offset, **kwargs)
+
+    def fetch_patient_report_summary(self, offset=0, **kwargs):
+        return self.patient_genome_repository.fetch_patient_report_summary(offset=offset, **kwargs)
+
+    def replace_variant_annotations(self, source, build, annotation_dfs):
+        return self.variant_annotation_repository.replace_variant_annotations(source, build, annotation_dfs)
+
+    def fetch_variant_annotations(self, build, offset=0, **kwargs):
+        return self.variant_annotation_repository.fetch_variant_annotations(build, offset=offset, **kwargs)
+
+    def fetch_patient_variant_annotations(self, build, offset=0, **kwargs):
+        return self.variant_annotation_repository.fetch_patient_variant_annotations(build, offset=offset, **kwargs)
+
+    def count_variant_annotations(self, build):
+        return self.variant_annotation_repository.count_variant_annotations(build)
@@ -0,0 +1,109 @@
+import re
+from data_layer.rsid_codes import assign_rsid_codes
+from repositories.variant_annotation_repository import BUILD_TABLES, VARIANT_ANNOTATION_COLUMNS, VariantAnnotationRepository
+
+RSID_TABLES = ['snp_pairs', 'patient_genome_data', 'patient_report']
+
+def integer_rsids(connection):
+    """
+        Rebuild the tables created with TEXT rsids with INTEGER codes (see rsid_codes.py), and
+        their indexes. Tables created since are left as they are.
+    """
+    for table in RSID_TABLES:
+        column_types = {row[1]: row[2].upper() for row in connection.execute(f"PRAGMA table_info({table})")}
+        if column_types.get('rsid') != 'TEXT':
+            continue
+        table_sql = connection.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        index_sqls = [row[0] for row in connection.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+        rsids = [row[0] for row in connection.execute(f"SELECT DISTINCT rsid FROM {table}")]
+        connection.execute("CREATE TEMP TABLE rsid_codes (name TEXT PRIMARY KEY, code INTEGER NOT NULL)")
+        connection.executemany("INSERT INTO rsid_codes (name, code) VALUES (?, ?)", zip(rsids, assign_rsid_codes(connection, rsids).tolist()))
+        staging_sql = re.sub(r'\brsid TEXT\b', 'rsid INTEGER', table_sql, count=1)
+        staging_sql = re.sub(rf'^CREATE TABLE (IF NOT EXISTS )?"?{table}"?', f'CREATE TABLE {table}_integer_rsids', staging_sql)
+        connection.execute(staging_sql)
+        columns = ', '.join(column_types)
+        values = ', '.join('(SELECT code FROM temp.rsid_codes WHERE name = t.rsid)' if column == 'rsid' else f't.{column}' for column in column_types)
+        connection.execute(f"INSERT INTO {table}_integer_rsids ({columns}) SELECT {values} FROM {table} t")
+        connection.execute(f"DROP TABLE {table}")
+        connection.execute(f"ALTER TABLE {table}_integer_rsids RENAME TO {table}")
+        for index_sql in index_sqls:
+            connection.execute(index_sql)
+        connection.execute("DROP TABLE temp.rsid_codes")
+
+def snp_pair_row_hashes(connection):
+    """
+        Add snp_pairs.row_hash to tables created before it (NULL: each pair is rewritten once, by
+        the next reload of the reference.)
+    """
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(snp_pairs)")}
+    if 'row_hash' not in columns:
+        connection.execute("ALTER TABLE snp_pairs ADD COLUMN row_hash TEXT")
+
+def nullable_annotation_rsids(connection):
+    """
+        Rebuild the variant annotation tables created with `rsid INTEGER NOT NULL` (0 for no rsid,
+        which decoded as 'i0' and matched unknown rsids) with NULL for no rsid.
+    """
+    for table in BUILD_TABLES.values():
+        if not any(row[1] == 'rsid' and row[3] for row in connection.execute(f"PRAGMA table_info({table})")):
+            continue
+        columns = ', '.join(VARIANT_ANNOTATION_COLUMNS)
+        values = ', '.join('NULLIF(rsid, 0)' if column == 'rsid' else column for column in VARIANT_ANNOTATION_COLUMNS)
+        connection.execute(VariantAnnotationRepository.table_sql(f'{table}_nullable_rsids'))
+        connection.execute(f"INSERT INTO {table}_nullable_rsids ({columns}) SELECT {values} FROM {table}")
+        connection.execute(f"DROP TABLE {table}")
+        connection.execute(f"ALTER TABLE {table}_nullable_rsids RENAME TO {table}")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_rsid ON {table} (rsid)")
+
+# Schema migrations, applied in order; the last applied version is kept in PRAGMA user_version.
+# Tables are created by the repositories (CREATE TABLE IF NOT EXISTS); migrations evolve them,
+# with SQL statements, or functions of the connection.
+MIGRATIONS = [
+    (1, "Secondary indexes on the join and filter columns", [
+        "CREATE INDEX IF NOT EXISTS idx_snp_pairs_rsid ON snp_pairs (rsid)",
+        "CREATE INDEX IF NOT EXISTS idx_patient_genome_data_rsid ON patient_genome_data (rsid)",
+        "CREATE INDEX IF NOT EXISTS idx_patient_genome_data_chromosome_position ON patient_genome_data (chromosome, position)",
+    ]),
+    (2, "Order SNP pairs within an rsid by rsid_genotypes, for keyset-paginated report joins", [
+        "DROP INDEX IF EXISTS idx_snp_pairs_rsid",
+        "CREATE INDEX idx_snp_pairs_rsid ON snp_pairs (rsid, rsid_genotypes)",
+    ]),
+    (3, "Page a patient's materialized report by position, and find reports by rsid on refresh", [
+        "CREATE INDEX IF NOT EXISTS idx_patient_report_position ON patient_report (patient_id, chromosome, position, rsid, rsid_genotypes)",
+        "CREATE INDEX IF NOT EXISTS idx_patient_report_rsid ON patient_report (rsid)",
+    ]),
+    (4, "Genomic region queries: a patient's variants by chromosome and position", [
+        "CREATE INDEX IF NOT EXISTS idx_patient_genome_data_patient_position ON patient_genome_data (patient_id, chromosome, position, rsid)",
+    ]),
+    (5, "Store rsids as INTEGER codes", [integer_rsids]),
+    (6, "A content hash of each SNP pair's source row, for incremental reference reloads", [snp_pair_row_hashes]),
+    (7, "Variant annotations (ClinVar, CIViC) by rsid, for joins with patient genomes", [
+        "CREATE INDEX IF NOT EXISTS idx_variant_annotations_grch37_rsid ON variant_annotations_grch37 (rsid)",
+        "CREATE INDEX IF NOT EXISTS idx_variant_annotations_grch38_rsid ON variant_annotations_grch38 (rsid)",
+    ]),
+    (8, "NULL, not 0, for variant annotations without an rsid", [nullable_annotation_rsids]),
+]
+
+def schema_version(sql_worker):
+    return sql_worker.execute("SELECT user_version FROM pragma_user_version")[0][0]
+
+def apply_migrations(sql_worker, migrations=MIGRATIONS):
+    """
+        Apply the migrations newer than the database's schema version, in one transaction.
+        Returns the descriptions of the migrations applied.
+    """
+    current_version = schema_version(sql_worker)
+    pending = [migration for migration in migrations if migration[0] > current_version]
+    if not pending:
+        return []
+    def migrate(connection):
+        for version, description, statements in pending:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {int(version)}")
+        connection.execute("ANALYZE")
+    sql_worker.run_in_transaction(migrate)
+    return [description for _, description, _ in pending]
@@ -0,0 +1,114 @@
+import json
+from collections import namedtuple
+from serialization import RowSet
+from utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, decode_cursor, encode_cursor
+
+# A parameterized SELECT: the select list, the FROM clause (with any joins), the filters it
+# accepts ({argument: column}, or {argument: (column, comparison)} for a range bound such as
+# ('position', '>=')), and, for paginated queries, its orders ({order_by: key columns}, the first
+# being the default.) Key columns must be unique per row and match an index.
+QueryTemplate = namedtuple('QueryTemplate', ['name', 'select', 'source', 'filters', 'orders'], defaults=[None])
+
+def filter_condition(column, is_list):
+    if isinstance(column, tuple):
+        column, comparison = column
+        return f"{column} {comparison} ?"
+    return f"{column} IN (SELECT value FROM json_each(?))" if is_list else f"{column} = ?"
+
+class QueryRegistry:
+    """
+        The SELECTs a repository runs, compiled once per shape (the filters given, the order,
+        and whether there is a cursor) into SQL text with bound parameters only. Values never
+        change the text - a list binds as one JSON array, `IN (SELECT value FROM json_each(?))` -
+        so each shape reuses its prepared statement from SQLite's per-connection cache.
+
+        Result columns are resolved once per template, by `prepare` (at startup) or on first use.
+    """
+
+    def __init__(self, templates):
+        self.templates = {template.name: template for template in templates}
+        self.columns = {}
+        self._compiled = {}
+
+    def prepare(self, sql_worker):
+        """
+            Resolve the result columns of every template. Fails fast on a template that does not
+            match the schema.
+        """
+        def describe(connection):
+            return {
+                name: [column[0] for column in connection.execute(f"SELECT {template.select} {template.source} LIMIT 0").description]
+                for name, template in self.templates.items()
+            }
+        self.columns.update(sql_worker.run_in_transaction(describe))
+
+    def column_names(self, sql_worker, name):
+        if name not in self.columns:
+            self.prepare(sql_worker)
+        return self.columns[name]
+
+    def compile(self, name, filter_shape=(), order_by=None, with_cursor=False):
+        """
+            SQL text for one shape of a template; `filter_shape` is a tuple of (argument, is_list).
+        """
+        shape = (name, filter_shape, order_by, with_cursor)
+        query = self._compiled.get(shape)
+        if query is None:
+            template = self.templates[name]
+            conditions = [filter_condition(template.filters[argument], is_list) for argument, is_list in filter_shape]
+            select = template.select
+            if order_by is not None:
+                key_columns = template.orders[order_by]
+                keys = ', '.join(key_columns)
+                select += ', ' + keys
+                if with_cursor:
+                    conditions.append(f"({keys}) > ({', '.join(['?'] * len(key_columns))})")
+            query = f"SELECT {select} {template.source}"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            if order_by is not None:
+                # One extra row tells us whether there is a next page.
+                query += f" ORDER BY {keys} LIMIT ?"
+            self._compiled[shape] = query
+        return query
+
+    def _bind_filters(self, template, filters):
+        filter_shape, params = [], []
+        for argument in template.filters:
+            value = filters.get(argument)
+            if value is None:
+                continue
+            is_list = isinstance(value, (list, tuple))
+            filter_shape.append((argument, is_list))
+            params.append(json.dumps(list(value)) if is_list else value)
+        return tuple(filter_shape), params
+
+    def fetch_rows(self, sql_worker, name, **filters) -> RowSet:
+        template = self.templates[name]
+        filter_shape, params = self._bind_filters(template, filters)
+        results_list = sql_worker.execute(self.compile(name, filter_shape), tuple(params))
+        return RowSet(self.column_names(sql_worker, name), results_list)
+
+    def fetch_page(self, sql_worker, name, order_by=None, cursor=None, page_size=DEFAULT_PAGE_SIZE, **filters) -> Page:
+        """
+            Keyset pagination: rows are ordered by the key columns of `order_by`, and a page starts
+            after the key of the last row of the previous page, so every page costs the same as
+            the first. Raises ValueError for an unknown order or an invalid cursor.
+        """
+        template = self.templates[name]
+        order_by = order_by or next(iter(template.orders))
+        if order_by not in template.orders:
+            raise ValueError(f"Invalid order_by: {order_by}.")
+        key_count = len(template.orders[order_by])
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        filter_shape, params = self._bind_filters(template, filters)
+        if cursor:
+            params.extend(decode_cursor(cursor, order_by, key_count))
+        params.append(page_size + 1)
+        query = self.compile(name, filter_shape, order_by, with_cursor=bool(cursor))
+        results_list = sql_worker.execute(query, tuple(params))
+        next_cursor = None
+        if len(results_list) > page_size:
+            results_list = results_list[:page_size]
+            next_cursor = encode_cursor(order_by, results_list[-1][-key_count:])
+        return Page(self.column_names(sql_worker, name), [row[:-key_count] for row in results_list], next_cursor)
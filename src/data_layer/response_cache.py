@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+# Decoded values also kept in memory, most recently used first; large responses (e.g. every
+# g:Convert gene) are then parsed once per process, not once per request.
+DEFAULT_MEMORY_ENTRIES = 64
+
+def response_cache_path(db_path):
+    """
+        Where the response cache of a database lives: RESPONSE_CACHE_PATH, or a file beside the
+        database file. None (memory only) for an in-memory database.
+    """
+    if os.getenv('RESPONSE_CACHE_PATH'):
+        return os.getenv('RESPONSE_CACHE_PATH')
+    if not db_path or db_path == ':memory:' or db_path.startswith('file:'):
+        return None
+    return f"{db_path}.responses"
+
+class ResponseCache:
+    """
+        Cache of external-source responses (JSON values), by key, persisted to an SQLite file so
+        it stays warm across restarts.
+
+        `get_or_fetch` serves a value younger than its TTL, and otherwise fetches it again; when
+        the fetch fails and a stale value is held, the stale value is served instead. Past
+        `max_entries`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.errors = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        # Access times not yet written; flushed with the next write, so hits do not write.
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_access_times()
+            self._connection.commit()
+            self._connection.close()
+
+    def _flush_access_times(self):
+        if self._accessed:
+            self._connection.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._accessed.items()])
+            self._accessed = {}
+
+    def _lookup(self, key):
+        # (value, stored_at), or None; touches the entry.
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self._connection.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = (json.loads(row[0]), row[1])
+            self._remember(key, entry)
+        else:
+            self._memory.move_to_end(key)
+        self._accessed[key] = time.time()
+        return entry
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, values):
+        now = time.time()
+        with self._lock:
+            self._flush_access_times()
+            self._connection.executemany('''
+                INSERT INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at, accessed_at = excluded.accessed_at
+            ''', [(key, json.dumps(value), now, now) for key, value in values.items()])
+            for key, value in values.items():
+                self._remember(key, (value, now))
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count <= self.max_entries:
+            return
+        evicted = [key for (key,) in self._connection.execute("SELECT key FROM responses ORDER BY accessed_at LIMIT ?", (count - self.max_entries,))]
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            self._memory.pop(key, None)
+        self.evictions += len(evicted)
+
+    def get_or_fetch(self, key, fetch, ttl):
+        """
+            The value of `key`: cached if younger than `ttl` seconds, else `fetch()` (and cached.)
+            If `fetch` raises, a stale cached value is returned if there is one; else the error
+            is raised.
+        """
+        return self.get_or_fetch_many([key], lambda keys: {key: fetch()}, ttl)[key]
+
+    def get_or_fetch_many(self, keys, fetch, ttl):
+        """
+            `get_or_fetch` for several keys, {key: value}: the keys without a value younger than
+            `ttl` seconds are fetched together, by `fetch(missing_keys)` (returning {key: value}.)
+            If `fetch` raises, stale values are returned if every missing key has one.
+        """
+        entries, values, missing = self._fresh(keys, ttl)
+        if not missing:
+            return values
+        try:
+            fetched = fetch(missing)
+        except Exception as error:
+            return self._stale(entries, values, missing, error)
+        self.put_many(fetched)
+        values.update(fetched)
+        return values
+
+    async def get_or_fetch_async(self, key, fetch, ttl):
+        """
+            `get_or_fetch` with a coroutine function `fetch`.
+        """
+        async def fetch_many(keys):
+            return {key: await fetch()}
+        return (await self.get_or_fetch_many_async([key], fetch_many, ttl))[key]
+
+    async def get_or_fetch_many_async(self, keys, fetch, ttl):
+        """
+            `get_or_fetch_many` with a coroutine function `fetch`. The cache itself is local (and
+            answers in microseconds), so it is read and written on the event loop.
+        """
+        entries, values, missing = self._fresh(keys, ttl)
+        if not missing:
+            return values
+        try:
+            fetched = await fetch(missing)
+        except Exception as error:
+            return self._stale(entries, values, missing, error)
+        self.put_many(fetched)
+        values.update(fetched)
+        return values
+
+    def _fresh(self, keys, ttl):
+        # (entries, values younger than `ttl`, keys to fetch.)
+        with self._lock:
+            entries = {key: self._lookup(key) for key in keys}
+        now = time.time()
+        values = {key: entry[0] for key, entry in entries.items() if entry is not None and now - entry[1] < ttl}
+        missing = [key for key in entries if key not in values]
+        self.hits += len(values)
+        self.misses += len(missing)
+        return entries, values, missing
+
+    def _stale(self, entries, values, missing, error):
+        # `values` completed with the stale entries of `missing`, or `error` raised.
+        self.errors += 1
+        stale = {key: entries[key] for key in missing if entries[key] is not None}
+        if len(stale) < len(missing):
+            raise error
+        self.stale_hits += len(stale)
+        oldest = min(stored_at for _, stored_at in stale.values())
+        logging.warning(f"Serving {len(stale)} stale responses ({missing[0]}...; up to {time.time() - oldest:.0f}s old): {error}")
+        values.update((key, value) for key, (value, _) in stale.items())
+        return values
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {
+            "entries": entries,
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "persistent": self.path is not None,
+        }
@@ -0,0 +1,86 @@
+import json
+import re
+import numpy as np
+import pandas as pd
+
+# Variant IDs are stored as INTEGER keys: rsNNN as NNN, and internal IDs (23andMe iNNN, SNPedia INNN)
+# as -NNN. Any other ID is numbered in rsid_names, with a code below -OTHER_ID_BASE. 0 is no ID.
+OTHER_ID_BASE = 10 ** 12
+RSID_PATTERN = re.compile(r'^(rs|i)([1-9]\d{0,11})$', re.IGNORECASE)
+
+RSID_NAMES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS rsid_names (
+        code INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+'''
+
+def encode_rsid(rsid):
+    """
+        The code of an rs or i ID (in any case); 0 for any other ID, which needs rsid_names.
+    """
+    match = RSID_PATTERN.match(rsid.strip()) if isinstance(rsid, str) else None
+    if match is None:
+        return 0
+    number = int(match.group(2))
+    return number if match.group(1).lower() == 'rs' else -number
+
+def encode_rsids(rsids):
+    """
+        Vectorised `encode_rsid`: each distinct ID is parsed once.
+    """
+    codes, uniques = pd.factorize(pd.Series(rsids, dtype=object), use_na_sentinel=True)
+    # factorize marks missing values -1, which indexes the 0 appended last.
+    table = np.array([encode_rsid(rsid) for rsid in uniques] + [0], dtype=np.int64)
+    return table[codes]
+
+def rsid_name_sql(column):
+    """
+        SQL expression decoding the code in `column` back to its ID, e.g. 4477212 to 'rs4477212'.
+    """
+    return (f"CASE WHEN {column} > 0 THEN 'rs' || {column} WHEN {column} > -{OTHER_ID_BASE} THEN 'i' || -{column} "
+            f"ELSE (SELECT name FROM rsid_names WHERE code = {column}) END")
+
+def assign_rsid_codes(connection, rsids):
+    """
+        The codes of `rsids`, numbering IDs that are neither rs nor i IDs in rsid_names. Runs on
+        the writer's connection (see `GenomeSqlWorker.run_in_transaction`.)
+    """
+    codes = encode_rsids(rsids)
+    others = pd.unique(pd.Series(rsids, dtype=object)[codes == 0].dropna())
+    if len(others):
+        for name in others:
+            connection.execute(f'''
+                INSERT OR IGNORE INTO rsid_names (code, name)
+                SELECT MIN(COALESCE(MIN(code), -{OTHER_ID_BASE}), -{OTHER_ID_BASE}) - 1, ? FROM rsid_names
+            ''', (name,))
+        named = dict(connection.execute("SELECT name, code FROM rsid_names WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(others.tolist()),)))
+        other_rows = np.flatnonzero(codes == 0)
+        codes[other_rows] = [named.get(rsid, 0) for rsid in pd.Series(rsids, dtype=object).iloc[other_rows]]
+    return codes
+
+def rsid_filter_codes(sql_worker, rsids):
+    """
+        The codes to filter on for an rsid (or a list of them) from the API. IDs that were never
+        stored have no code, and match nothing as 0.
+    """
+    if rsids is None:
+        return None
+    as_list = isinstance(rsids, (list, tuple))
+    names = list(rsids) if as_list else [rsids]
+    codes = encode_rsids(names)
+    others = [name for name, code in zip(names, codes) if code == 0 and isinstance(name, str)]
+    if others:
+        named = dict(sql_worker.execute("SELECT name, code FROM rsid_names WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(others),)))
+        codes = [named.get(name, 0) if code == 0 else code for name, code in zip(names, codes.tolist())]
+    codes = [int(code) for code in codes]
+    return codes if as_list else codes[0]
+
+def canonical_rsids(rsids):
+    """
+        `rsids` as they read back from the database: rs and i IDs in lower case ('RS123' is 'rs123'),
+        other IDs unchanged.
+    """
+    codes = encode_rsids(rsids)
+    names = np.where(codes > 0, 'rs', 'i').astype(object) + np.abs(codes).astype(str).astype(object)
+    return np.where(codes == 0, pd.Series(rsids, dtype=object).to_numpy(), names).tolist()
@@ -0,0 +1,145 @@
+import math
+import sys
+import threading
+from array import array
+
+class SnpPairIndex:
+    """
+        In-memory copy of the SNP pairs reference, looked up by rsid so batch lookups do not
+        touch the database. Records are held column-wise - strings in lists, magnitude and risk
+        in float arrays (NaN for null) - with a dict from rsid to its record numbers.
+
+        The repository keeps it in step with the snp_pairs table: records are upserted by
+        rsid_genotypes, as the table's upsert does.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _clear(self):
+        self._rsid_genotypes = []
+        self._magnitude = array('d')
+        self._risk = array('d')
+        self._notes = []
+        self._rsid = []
+        self._allele1 = []
+        self._allele2 = []
+        self._record_by_key = {}
+        self._records_by_rsid = {}
+
+    def __len__(self):
+        return len(self._record_by_key)
+
+    def load(self, rows):
+        """
+            Replace the whole index with `rows` (e.g. every row of the table.)
+        """
+        with self._lock:
+            self._clear()
+            self._upsert(rows)
+
+    def upsert(self, rows):
+        """
+            Add or replace records; `rows` are (rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2).
+        """
+        with self._lock:
+            self._upsert(rows)
+
+    def remove(self, rsid_genotypes):
+        """
+            Remove the records of `rsid_genotypes`. Records are numbered by position, so the
+            index is rebuilt from the rest: deletions are rare (reference reloads.)
+        """
+        removed = set(rsid_genotypes)
+        with self._lock:
+            if not removed & self._record_by_key.keys():
+                return
+            rows = [self._row(record) for key, record in self._record_by_key.items() if key not in removed]
+            self._clear()
+            self._upsert(rows)
+
+    def _upsert(self, rows):
+        for rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2 in rows:
+            magnitude = math.nan if magnitude is None else magnitude
+            risk = math.nan if risk is None else risk
+            record = self._record_by_key.get(rsid_genotypes)
+            if record is None:
+                record = len(self._rsid_genotypes)
+                self._rsid_genotypes.append(rsid_genotypes)
+                self._magnitude.append(magnitude)
+                self._risk.append(risk)
+                self._notes.append(notes)
+                self._rsid.append(rsid)
+                self._allele1.append(allele1)
+                self._allele2.append(allele2)
+                self._record_by_key[rsid_genotypes] = record
+            else:
+                self._magnitude[record] = magnitude
+                self._risk[record] = risk
+                self._notes[record] = notes
+                self._allele1[record] = allele1
+                self._allele2[record] = allele2
+                previous_rsid = self._rsid[record]
+                if previous_rsid == rsid:
+                    continue
+                self._rsid[record] = rsid
+                self._records_by_rsid[previous_rsid].remove(record)
+                if not self._records_by_rsid[previous_rsid]:
+                    del self._records_by_rsid[previous_rsid]
+            records = self._records_by_rsid.setdefault(rsid, [])
+            records.append(record)
+            records.sort(key=self._rsid_genotypes.__getitem__)
+
+    def _row(self, record):
+        magnitude, risk = self._magnitude[record], self._risk[record]
+        return (self._rsid_genotypes[record], None if magnitude != magnitude else magnitude, None if risk != risk else risk,
+                self._notes[record], self._rsid[record], self._allele1[record], self._allele2[record])
+
+    def lookup(self, rsids):
+        """
+            The records of every (distinct) rsid, in the order asked for, as table rows.
+        """
+        rows = []
+        with self._lock:
+            for rsid in dict.fromkeys(rsids):
+                records = self._records_by_rsid.get(rsid)
+                if records is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                rows.extend(self._row(record) for record in records)
+            self.lookups += 1
+        return rows
+
+    def rsids(self):
+        with self._lock:
+            return list(self._records_by_rsid)
+
+    def rows(self):
+        """
+            Every record, as table rows.
+        """
+        with self._lock:
+            return [self._row(record) for record in self._record_by_key.values()]
+
+    def stats(self):
+        with self._lock:
+            strings = sum(sys.getsizeof(column) + sum(map(sys.getsizeof, set(column)))
+                          for column in [self._rsid_genotypes, self._notes, self._rsid, self._allele1, self._allele2])
+            approximate_bytes = (strings + sys.getsizeof(self._magnitude) + sys.getsizeof(self._risk)
+                                 + sys.getsizeof(self._record_by_key) + sys.getsizeof(self._records_by_rsid)
+                                 + sum(map(sys.getsizeof, self._records_by_rsid.values())))
+            requested = self.hits + self.misses
+            return {
+                "records": len(self._record_by_key),
+                "rsids": len(self._records_by_rsid),
+                "approximate_bytes": approximate_bytes,
+                "lookups": self.lookups,
+                "rsid_hits": self.hits,
+                "rsid_misses": self.misses,
+                "hit_rate": round(self.hits / requested, 4) if requested else None,
+            }
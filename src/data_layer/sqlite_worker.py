@@ -0,0 +1,208 @@
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import uuid
+from sqlite3worker import Sqlite3Worker
+
+# Marker queued in place of SQL text; the values slot then carries the callable.
+_TRANSACTION = "-- transaction"
+
+class _TransactionFailed:
+    def __init__(self, error):
+        self.error = error
+
+# Prepared statements kept per read connection (sqlite3's default is 128), enough for every
+# compiled query shape in the repositories' query registries.
+READ_STATEMENT_CACHE_SIZE = 256
+
+def is_select(query):
+    # The same test Sqlite3Worker uses to decide whether a statement returns rows.
+    return query.lower().strip().startswith("select")
+
+def default_read_pool_size():
+    return int(os.getenv('SQLITE_READ_POOL_SIZE') or os.cpu_count() or 1)
+
+def chunked(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class ReadConnectionPool:
+    """
+        Read-only connections to a WAL-mode database, opened on demand (up to `size`) and
+        shared by the threads running SELECTs. WAL readers see the last committed state
+        and neither block, nor are blocked by, the writer.
+    """
+
+    def __init__(self, db_path, size):
+        self.uri = pathlib.Path(db_path).absolute().as_uri() + "?mode=ro"
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return sqlite3.connect(self.uri, uri=True, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=READ_STATEMENT_CACHE_SIZE)
+        return self._idle.get()
+
+    def execute(self, query, values=None):
+        """
+            Run a SELECT and return its rows; errors are returned (and logged) as a message,
+            as Sqlite3Worker does.
+        """
+        connection = self._acquire()
+        try:
+            return connection.execute(query, values or []).fetchall()
+        except sqlite3.Error as err:
+            logging.error("Query returned error: %s: %s: %s", query, values, err)
+            return "Query returned error: %s: %s: %s" % (query, values, err)
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        with self._lock:
+            while self._opened:
+                self._idle.get().close()
+                self._opened -= 1
+
+class GenomeSqlWorker(Sqlite3Worker):
+    """
+        Sqlite3Worker which can also run a unit of work against its connection,
+        on the worker thread, inside one explicit transaction.
+
+        Queued statements keep their FIFO ordering relative to transactions, so
+        a transaction sees every write queued before it.
+
+        File databases are switched to WAL mode, and SELECTs are served by a pool of
+        read-only connections, concurrently with each other and with the writer. A thread
+        with writes still queued (or not yet committed) reads through the writer queue
+        instead, so it always sees its own writes.
+    """
+
+    def __init__(self, file_name, max_queue_size=100, read_pool_size=None):
+        self._write_lock = threading.Lock()
+        self._queued_writes = 0
+        self._applied_writes = 0
+        self._committed_writes = 0
+        self._thread_writes = threading.local()
+        super().__init__(file_name, max_queue_size=max_queue_size)
+        self.read_pool = None
+        if file_name and file_name != ":memory:":
+            self._sqlite3_conn.execute("PRAGMA journal_mode = WAL")
+            self._sqlite3_conn.execute("PRAGMA synchronous = NORMAL")
+            self.read_pool = ReadConnectionPool(file_name, read_pool_size or default_read_pool_size())
+
+    def execute(self, query, values=None):
+        if is_select(query):
+            if self.read_pool is not None and self._committed_writes >= getattr(self._thread_writes, "last", 0):
+                return self.read_pool.execute(query, values)
+            return super().execute(query, values)
+        with self._write_lock:
+            result = super().execute(query, values)
+            if not self._exit_event.is_set():
+                self._queued_writes += 1
+                self._thread_writes.last = self._queued_writes
+            return result
+
+    def close(self):
+        super().close()
+        if self.read_pool is not None:
+            self.read_pool.close()
+
+    def run(self):
+        # Sqlite3Worker.run, also recording how many of the queued writes are committed.
+        execute_count = 0
+        for token, query, values in iter(self._sql_queue.get, None):
+            if query:
+                if query is _TRANSACTION or not is_select(query):
+                    self._applied_writes += 1
+                self._run_query(token, query, values)
+                execute_count += 1
+                if self._sql_queue.empty() or execute_count == self._max_queue_size:
+                    self._sqlite3_conn.commit()
+                    self._committed_writes = self._applied_writes
+                    execute_count = 0
+                if query is not _TRANSACTION and is_select(query):
+                    self._select_events.setdefault(token, threading.Event())
+                    self._select_events[token].set()
+            if self._exit_event.is_set() and self._sql_queue.empty():
+                self._sqlite3_conn.commit()
+                self._sqlite3_conn.close()
+                return
+
+    def run_in_transaction(self, work, pragmas=None):
+        """
+            Run `work(connection)` in a single transaction and return its result.
+
+            The transaction is rolled back, and the exception re-raised in the
+            calling thread, if `work` fails. `pragmas` ({name: value}) apply for
+            the duration of the transaction only; previous values are restored.
+        """
+        if self._exit_event.is_set():
+            raise RuntimeError("The SQL worker has been closed.")
+        token = str(uuid.uuid4())
+        with self._write_lock:
+            self._sql_queue.put((token, _TRANSACTION, (work, pragmas or {})), timeout=5)
+            self._queued_writes += 1
+            self._thread_writes.last = self._queued_writes
+        outcome = self._query_results(token)
+        if isinstance(outcome, _TransactionFailed):
+            raise outcome.error
+        return outcome
+
+    def execute_many(self, query, rows, chunk_size=5000):
+        """
+            Execute `query` for every row, in chunks of `chunk_size`, with each
+            chunk committed in its own transaction. Returns the number of rows.
+        """
+        written = 0
+        for chunk in chunked(rows, chunk_size):
+            self.run_in_transaction(lambda conn, chunk=chunk: conn.executemany(query, chunk))
+            written += len(chunk)
+        return written
+
+    def _run_query(self, token, query, values):
+        if query is _TRANSACTION:
+            self._run_transaction(token, values)
+        else:
+            super()._run_query(token, query, values)
+
+    def _run_transaction(self, token, task):
+        work, pragmas = task
+        connection = self._sqlite3_conn
+        previous_pragmas = {}
+        try:
+            # Flush statements queued ahead of us, so they are not tied to this transaction.
+            connection.commit()
+            # Most pragmas (e.g. synchronous) cannot be changed inside a transaction.
+            for name, value in pragmas.items():
+                previous_pragmas[name] = connection.execute(f"PRAGMA {name}").fetchone()[0]
+                connection.execute(f"PRAGMA {name} = {value}")
+            connection.execute("BEGIN")
+            result = work(connection)
+            connection.commit()
+            self._committed_writes = self._applied_writes
+        except Exception as error:
+            connection.rollback()
+            result = _TransactionFailed(error)
+        finally:
+            for name, value in previous_pragmas.items():
+                connection.execute(f"PRAGMA {name} = {value}")
+        self._results[token] = result
+        self._select_events.setdefault(token, threading.Event())
+        self._select_events[token].set()
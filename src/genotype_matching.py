@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+FULL_REPORT_COLUMNS = ['patient_id', 'patient_name', 'rsid', 'chromosome', 'position', 'genotype',
+                       'rsid_genotypes', 'magnitude', 'risk', 'notes', 'allele1', 'allele2', 'genotype_match']
+
+# Genotypes are encoded as small integers: each allele as 1-6 (0 is unknown), and an unordered pair
+# as low * 7 + high. 0 is a no-call ('--', '00', blank, or anything else unrecognised.)
+ALLELE_CODES = {'A': 1, 'C': 2, 'G': 3, 'T': 4, 'D': 5, 'I': 6}
+COMPLEMENTS = {1: 4, 2: 3, 3: 2, 4: 1, 5: 5, 6: 6}
+NO_CALL = 0
+# Result of a match involving a no-call: neither a match nor a mismatch.
+UNKNOWN_MATCH = -1
+
+def _pair_code(first, second):
+    low, high = sorted((first, second))
+    return low * 7 + high
+
+def genotype_code(genotype):
+    """
+        Code of one genotype string; a single allele (a hemizygous call, e.g. on chrX, Y or MT) counts twice.
+    """
+    if not isinstance(genotype, str):
+        return NO_CALL
+    alleles = [ALLELE_CODES.get(allele, 0) for allele in genotype.strip().upper()]
+    if len(alleles) == 1:
+        alleles *= 2
+    if len(alleles) != 2 or 0 in alleles:
+        return NO_CALL
+    return _pair_code(*alleles)
+
+# The code of the opposite-strand genotype, indexed by code.
+COMPLEMENT_CODES = np.zeros(7 * 7, dtype=np.int8)
+for _first in range(1, 7):
+    for _second in range(_first, 7):
+        COMPLEMENT_CODES[_pair_code(_first, _second)] = _pair_code(COMPLEMENTS[_first], COMPLEMENTS[_second])
+
+# The alleles of each code, as a bit mask (bit n for allele code n), and whether a set of alleles is
+# its own complement (A/T, C/G): on such SNPs the strand of a genotype cannot be told from its alleles.
+ALLELE_MASKS = np.zeros(7 * 7, dtype=np.int64)
+for _first in range(1, 7):
+    for _second in range(_first, 7):
+        ALLELE_MASKS[_pair_code(_first, _second)] = (1 << _first) | (1 << _second)
+PALINDROMIC_MASKS = np.array([mask == sum(1 << COMPLEMENTS[allele] for allele in range(1, 7) if mask >> allele & 1) for mask in range(1 << 7)])
+
+def encode_genotypes(genotypes):
+    """
+        Vectorised `genotype_code`: each distinct string is decoded once.
+    """
+    codes, uniques = pd.factorize(pd.Series(genotypes, dtype=object), use_na_sentinel=True)
+    # factorize marks missing values -1, which indexes the NO_CALL appended last.
+    table = np.array([genotype_code(genotype) for genotype in uniques] + [NO_CALL], dtype=np.int8)
+    return table[codes]
+
+def encode_allele_pairs(allele1, allele2):
+    return encode_genotypes(pd.Series(allele1, dtype=object).fillna('') + pd.Series(allele2, dtype=object).fillna(''))
+
+def reference_allele_masks(rsids, pair_codes):
+    """
+        For parallel rsids and SNP pair codes: the alleles (ALLELE_MASKS) of every pair of the
+        row's rsid, the reference the strand of a genotype is judged against.
+    """
+    groups, _ = pd.factorize(pd.Series(rsids, dtype=object))
+    masks = np.zeros(groups.max() + 1 if len(groups) else 0, dtype=np.int64)
+    np.bitwise_or.at(masks, groups, ALLELE_MASKS[np.asarray(pair_codes, dtype=np.int64)])
+    return masks[groups]
+
+def allele_set_masks(allele_strings):
+    """
+        The ALLELE_MASKS bits of the alleles in each string (e.g. 'AGGG' for the pairs of an rsid.)
+    """
+    codes, uniques = pd.factorize(pd.Series(allele_strings, dtype=object), use_na_sentinel=True)
+    table = np.array([sum({1 << ALLELE_CODES[allele] for allele in alleles.upper() if allele in ALLELE_CODES}) for alleles in uniques] + [0], dtype=np.int64)
+    return table[codes]
+
+def match_codes(genotype_codes, pair_codes, reference_masks=None):
+    """
+        1 where the genotype is the pair's, in either order, on either strand; 0 where it is not,
+        or where the pair cannot be encoded (e.g. multi-base alleles); UNKNOWN_MATCH for no-calls.
+        The opposite strand is only tried for a genotype with alleles outside its rsid's
+        (`reference_masks`, by default the pair's own), and never for palindromic (A/T, C/G) rsids.
+    """
+    genotype_codes, pair_codes = np.asarray(genotype_codes, dtype=np.int64), np.asarray(pair_codes, dtype=np.int64)
+    if reference_masks is None:
+        reference_masks = ALLELE_MASKS[pair_codes]
+    flipped = (ALLELE_MASKS[genotype_codes] & ~reference_masks != 0) & ~PALINDROMIC_MASKS[reference_masks]
+    matches = ((genotype_codes == pair_codes) | (flipped & (genotype_codes == COMPLEMENT_CODES[pair_codes]))) & (pair_codes != NO_CALL)
+    return np.where(genotype_codes == NO_CALL, UNKNOWN_MATCH, matches).astype(np.int8)
+
+def match_genotypes(genotypes, allele1, allele2, rsids=None, reference_masks=None):
+    """
+        `genotype_match` values for parallel sequences of genotypes and SNP pair alleles: 1 or 0,
+        and None for a no-call. With `rsids`, the pairs of each rsid among the rows are its
+        reference alleles; `reference_masks` gives them directly (see `reference_allele_masks`.)
+    """
+    if len(genotypes) == 0:
+        return []
+    pair_codes = encode_allele_pairs(allele1, allele2)
+    if reference_masks is None and rsids is not None:
+        reference_masks = reference_allele_masks(rsids, pair_codes)
+    matches = match_codes(encode_genotypes(genotypes), pair_codes, None if reference_masks is None else np.asarray(reference_masks, dtype=np.int64))
+    return [None if match == UNKNOWN_MATCH else match for match in matches.tolist()]
+
+def match_patient(genome_df, snp_pairs_df):
+    """
+        The full report of one patient: every genome row (patient_id, patient_name, rsid, chromosome,
+        position, genotype) joined with the SNP pairs of its rsid, and matched in one vectorised pass.
+        Returns a DataFrame with FULL_REPORT_COLUMNS, ordered by rsid and rsid_genotypes.
+    """
+    pair_codes = encode_allele_pairs(snp_pairs_df['allele1'].to_numpy(), snp_pairs_df['allele2'].to_numpy())
+    snp_pairs_df = snp_pairs_df.assign(pair_code=pair_codes, reference_mask=reference_allele_masks(snp_pairs_df['rsid'].to_numpy(), pair_codes))
+    report = genome_df.merge(snp_pairs_df, on='rsid', how='inner', sort=False)
+    matches = match_codes(encode_genotypes(report['genotype'].to_numpy()), report['pair_code'].to_numpy(), report['reference_mask'].to_numpy())
+    report['genotype_match'] = pd.arrays.IntegerArray(np.maximum(matches, 0), matches == UNKNOWN_MATCH)
+    return report.sort_values(['rsid', 'rsid_genotypes'], ignore_index=True)[FULL_REPORT_COLUMNS]
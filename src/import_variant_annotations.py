@@ -0,0 +1,35 @@
+"""
+    Import a ClinVar or CIViC VCF release (plain, gzip or bgzip) into the database at
+    SQLITE_DATABASE_PATH, replacing the source's previous import for its genome build.
+
+    Usage: python src/import_variant_annotations.py clinvar.vcf.gz [--source clinvar] [--build GRCh38] [--workers 8] [--chunk-mb 32]
+"""
+import argparse
+import logging
+import os
+from dotenv import load_dotenv
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from repositories.variant_annotation_repository import BUILD_TABLES
+from services.variant_vcf_import import DEFAULT_CHUNK_MB, VARIANT_SOURCES, default_workers, import_variant_vcf
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import a ClinVar or CIViC VCF release.")
+    parser.add_argument('path', help="the VCF file (.vcf, .vcf.gz or .vcf.bgz)")
+    parser.add_argument('--source', choices=list(VARIANT_SOURCES), help="by default, read from the ##source header")
+    parser.add_argument('--build', choices=list(BUILD_TABLES), help="by default, read from the ##reference header")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="parsing processes (default: VCF_IMPORT_WORKERS, or one per CPU)")
+    parser.add_argument('--chunk-mb', type=float, default=float(os.getenv('VCF_IMPORT_CHUNK_MB') or DEFAULT_CHUNK_MB), help="the size of a parsed chunk, on disk")
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    genome_db_manager = GenomeDatabaseManager(db_path=os.getenv('SQLITE_DATABASE_PATH'))
+    try:
+        summary = import_variant_vcf(genome_db_manager, arguments.path, source=arguments.source, build=arguments.build,
+                                     workers=arguments.workers, chunk_bytes=int(arguments.chunk_mb * 1024 * 1024))
+    finally:
+        genome_db_manager.close_connection()
+    print(summary.json())
+    return summary
+
+if __name__ == "__main__":
+    main()
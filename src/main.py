@@ -1,10 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+from controllers.genome_controller import GenomeController
+from controllers.notification_controller import NotificationController
 from routers.root_router import root_router
+from services.genome_service import GenomeService
+from services.ingest_scheduler import IngestScheduler
+from services.notification_service import NotificationService
+
+# Lifespan: one GenomeService (one database manager, one SNP reference load) per process, and
+# one NotificationService broadcasting the ingest jobs' events
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    genome_service = GenomeService()
+    notification_service = NotificationService()
+    ingest_scheduler = IngestScheduler(genome_service.load_genome_job, notify=notification_service.publish_genome_load)
+    app.state.notification_controller = NotificationController(notification_service)
+    app.state.genome_controller = GenomeController(genome_service, ingest_scheduler)
+    yield
+    app.state.genome_controller.close()
+    await genome_service.aclose()
+    genome_service.close()
 
 # Routing
 app = FastAPI(
+    lifespan=lifespan,
     title="GenomeSearch API",
     description="The GenomeSearch API is a **FastAPI**-based (Python) server application (with **Uvicorn**), and which provides endpoints for managing and querying genome (gene variant) data (patient data is combined with SNP pairs data to show health risks.) SNP data is sourced from several sources, i.e. SNPedia, Ensembl, and GProfiler.",
     version="1.0.0"
@@ -23,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location", "Retry-After"],
 )
 
 # Enable Swagger UI
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel
 
 class SnpPair(BaseModel):
@@ -19,3 +20,33 @@ class PatientGenomeData(BaseModel):
     chromosome: str
     position: int
     genotype: str
+
+class RejectedRow(BaseModel):
+    row: int
+    key: str
+    reason: str
+
+class ImportSummary(BaseModel):
+    total_rows: int
+    imported_rows: int
+    rejected_rows: int
+    rejections: List[RejectedRow] = []
+
+class SnpPairsDiff(BaseModel):
+    total_rows: int
+    inserted: List[str] = []
+    updated: List[str] = []
+    deleted: List[str] = []
+    unchanged_rows: int
+    rejected_rows: int = 0
+    rejections: List[RejectedRow] = []
+    dry_run: bool = False
+
+class VariantImportSummary(BaseModel):
+    source: str
+    build: str
+    imported_rows: int
+    skipped_rows: int = 0
+    chunks: int
+    workers: int
+    seconds: float
@@ -1,17 +1,52 @@
 from email.mime import base
-import itertools
 import json
+import logging
 import pandas as pd
-from pydantic import ValidationError
-from sqlite3worker import Sqlite3Worker
-from utils import fetch_data_with_conditions
-from models import SnpPair 
+from data_layer.rsid_codes import RSID_NAMES_TABLE, assign_rsid_codes, canonical_rsids, rsid_filter_codes, rsid_name_sql
+from data_layer.sqlite_worker import GenomeSqlWorker
+from data_layer.query_registry import QueryRegistry, QueryTemplate
+from data_layer.snp_pair_index import SnpPairIndex
+from serialization import RowSet
+from models import ImportSummary, RejectedRow, SnpPair
+
+SNP_PAIR_COLUMNS = ['rsid_genotypes', 'magnitude', 'risk', 'notes', 'rsid', 'allele1', 'allele2']
+SNP_PAIRS_CHUNK_SIZE = 5000
+
+def validate_snp_pairs_df(snp_df):
+    """
+        Vectorised equivalent of validating every row against `SnpPair`.
+        Returns the rows ready to write (in `SNP_PAIR_COLUMNS` order), and the rejected rows.
+    """
+    snp_df = snp_df.reset_index(drop=True)
+    reasons = pd.Series('', index=snp_df.index)
+    for column in SNP_PAIR_COLUMNS:
+        if column not in snp_df.columns:
+            snp_df[column] = None
+    for column in ['rsid_genotypes', 'rsid', 'allele1', 'allele2']:
+        missing = snp_df[column].isna() | (snp_df[column].astype(str).str.strip() == '')
+        reasons = reasons.mask(missing & (reasons == ''), f'missing {column}')
+    for column in ['magnitude', 'risk']:
+        numeric = pd.to_numeric(snp_df[column], errors='coerce')
+        invalid = numeric.isna() & snp_df[column].notna()
+        reasons = reasons.mask(invalid & (reasons == ''), f'{column} is not a number')
+        snp_df[column] = numeric.astype(object).where(numeric.notna(), None)
+    snp_df['notes'] = snp_df['notes'].where(snp_df['notes'].notna(), '').astype(str)
+    rejected = reasons != ''
+    rejections = [
+        RejectedRow(row=int(row), key=str(key), reason=reason)
+        for row, key, reason in zip(snp_df.index[rejected], snp_df.loc[rejected, 'rsid_genotypes'], reasons[rejected])
+    ]
+    return snp_df.loc[~rejected, SNP_PAIR_COLUMNS], rejections
 
 class GenomeResearchRepository:
-    def __init__(self, db_path):
+    def __init__(self, db_path, sql_worker=None):
         self.__db_path = db_path
-        self.sql_worker = Sqlite3Worker(self.__db_path) 
+        self.sql_worker = sql_worker or GenomeSqlWorker(self.__db_path)
+        self.queries = QueryRegistry(self.QUERY_TEMPLATES)
         self.create_tables()
+        # The reference is small and almost static: rsid lookups are served from memory.
+        self.snp_pair_index = SnpPairIndex()
+        self.load_snp_pair_index()
 
     def create_tables(self):
         self.sql_worker.execute('''
@@ -20,78 +55,132 @@ class GenomeResearchRepository:
                 magnitude REAL,
                 risk REAL,
                 notes TEXT,
-                rsid TEXT NOT NULL,
+                rsid INTEGER NOT NULL,
                 allele1 TEXT NOT NULL,
                 allele2 TEXT NOT NULL,
+                row_hash TEXT,
                 PRIMARY KEY (rsid_genotypes)
                 UNIQUE (rsid_genotypes)
             )
         ''') 
+        self.sql_worker.execute(RSID_NAMES_TABLE)
+        self.sql_worker.execute('''
+            CREATE TABLE IF NOT EXISTS reference_sources (
+                source TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                loaded_at TEXT NOT NULL
+            )
+        ''')
 
     def close_connection(self):
         self.sql_worker.close()
 
     # WRITE (Create/Update/Insert)
 
+    # row_hash is the content hash of the source row (see `read_snp_pairs_source`); NULL for a
+    # pair written otherwise, which the next reload of the reference replaces.
+    UPSERT_SNP_PAIR_QUERY = '''
+        INSERT INTO snp_pairs (rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2, row_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(rsid_genotypes) DO UPDATE SET magnitude=excluded.magnitude, risk=excluded.risk, notes=excluded.notes, rsid=excluded.rsid, allele1=excluded.allele1, allele2=excluded.allele2, row_hash=excluded.row_hash
+    '''
+
     def update_or_insert_snp_pair(self, snp_pair: SnpPair):
+        rsid = canonical_rsids([snp_pair.rsid])[0]
+        row = (snp_pair.rsid_genotypes, snp_pair.magnitude, snp_pair.risk, snp_pair.notes, rsid, snp_pair.allele1, snp_pair.allele2)
+        def upsert(connection):
+            code = int(assign_rsid_codes(connection, [rsid])[0])
+            connection.execute(self.UPSERT_SNP_PAIR_QUERY, row[:4] + (code,) + row[5:] + (None,))
+        self.sql_worker.run_in_transaction(upsert)
+        self.snp_pair_index.upsert([row])
+
+    def save_snp_pairs_to_db(self, snp_df, chunk_size=SNP_PAIRS_CHUNK_SIZE) -> ImportSummary:
+        valid_df, rejections = validate_snp_pairs_df(snp_df)
+        if rejections:
+            first = rejections[0]
+            logging.warning("Rejected %d of %d SNP pair rows, the first row %d (%s): %s", len(rejections), len(snp_df), first.row, first.key, first.reason)
+        valid_df = valid_df.assign(rsid=canonical_rsids(valid_df['rsid']))
+        rows = list(valid_df.itertuples(index=False, name=None))
+        row_hashes = snp_df['row_hash'].iloc[valid_df.index].tolist() if 'row_hash' in snp_df.columns else [None] * len(rows)
+        codes = self.sql_worker.run_in_transaction(lambda connection: assign_rsid_codes(connection, valid_df['rsid']).tolist())
+        stored_rows = [row[:4] + (code,) + row[5:] + (row_hash,) for row, code, row_hash in zip(rows, codes, row_hashes)]
+        try:
+            imported = self.sql_worker.execute_many(self.UPSERT_SNP_PAIR_QUERY, stored_rows, chunk_size=chunk_size)
+        except Exception:
+            # Chunks committed before the failure are in the table: re-read it.
+            self.load_snp_pair_index()
+            raise
+        self.snp_pair_index.upsert(rows)
+        return ImportSummary(total_rows=len(snp_df), imported_rows=imported, rejected_rows=len(rejections), rejections=rejections)
+
+    def delete_snp_pairs(self, rsid_genotypes):
+        """
+            Delete the SNP pairs of `rsid_genotypes`. Returns the rsids they were of.
+        """
+        keys_json = json.dumps(list(rsid_genotypes))
+        def delete(connection):
+            rsids = [row[0] for row in connection.execute(f'''
+                SELECT DISTINCT {rsid_name_sql("rsid")} FROM snp_pairs WHERE rsid_genotypes IN (SELECT value FROM json_each(?))
+            ''', (keys_json,))]
+            connection.execute("DELETE FROM snp_pairs WHERE rsid_genotypes IN (SELECT value FROM json_each(?))", (keys_json,))
+            return rsids
+        rsids = self.sql_worker.run_in_transaction(delete)
+        self.snp_pair_index.remove(rsid_genotypes)
+        return rsids
+
+    def fetch_snp_pair_hashes(self):
+        """
+            {rsid_genotypes: row_hash} of every SNP pair (None for a pair not loaded from the reference file.)
+        """
+        return dict(self.sql_worker.execute('''SELECT rsid_genotypes, row_hash FROM snp_pairs'''))
+
+    def save_reference_hash(self, source, content_hash):
         query = '''
-            INSERT INTO snp_pairs (rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(rsid_genotypes) DO UPDATE SET magnitude=excluded.magnitude, risk=excluded.risk, notes=excluded.notes, rsid=excluded.rsid, allele1=excluded.allele1, allele2=excluded.allele2
+            INSERT INTO reference_sources (source, content_hash, loaded_at)
+            VALUES (?, ?, datetime('now'))
+            ON CONFLICT(source) DO UPDATE SET content_hash=excluded.content_hash, loaded_at=excluded.loaded_at
         '''
-        self.sql_worker.execute(query, (snp_pair.rsid_genotypes, snp_pair.magnitude, snp_pair.risk, snp_pair.notes, snp_pair.rsid, snp_pair.allele1, snp_pair.allele2))
-
-    def save_snp_pairs_to_db(self, snp_df):
-        for index, row in snp_df.iterrows():
-            try:
-                # Ensure 'notes' is a string
-                row['notes'] = str(row['notes']) if pd.notna(row['notes']) else ''
-                snp_pair = SnpPair(**row)
-                # Save snp_pair to the database
-                self.update_or_insert_snp_pair(snp_pair) 
-            except ValidationError as e:
-                print(f"Validation error: {e}") 
+        self.sql_worker.execute(query, (source, content_hash))
 
     # READ (Fetch/Select) 
 
-    def fetch_snp_pairs_data(self, offset=0, **kwargs): 
-        # Get column names dynamically
-        columns_query = '''SELECT name FROM pragma_table_info('snp_pairs')'''
-        columns = self.sql_worker.execute(columns_query)
-        print('columns', columns)   
-        columns = list(itertools.chain.from_iterable(columns))
+    def fetch_reference_hash(self, source):
+        results_list = self.sql_worker.execute('''SELECT content_hash FROM reference_sources WHERE source = ?''', (source,))
+        return results_list[0][0] if results_list else None
 
-        # Retrieve the rsids from kwargs
+    def count_snp_pairs(self):
+        return self.sql_worker.execute('''SELECT COUNT(*) FROM snp_pairs''')[0][0]
+
+    def fetch_snp_pair_rsid_codes(self):
+        return [row[0] for row in self.sql_worker.execute('''SELECT DISTINCT rsid FROM snp_pairs''')]
+
+    # rsid is stored as an integer code (see rsid_codes.py), and decoded in SQL.
+    QUERY_TEMPLATES = [
+        QueryTemplate(
+            'snp_pairs',
+            f'rsid_genotypes, magnitude, risk, notes, {rsid_name_sql("rsid")} AS rsid, allele1, allele2',
+            'FROM snp_pairs',
+            {'rsid': 'snp_pairs.rsid'},
+        ),
+    ]
+
+    def fetch_snp_pairs_data(self, offset=0, use_index=True, **kwargs):
         rsids = kwargs.get('rsid')
         if not rsids or not isinstance(rsids, list):
             raise ValueError("rsid must be a list of strings")
+        if use_index:
+            return RowSet(self.queries.column_names(self.sql_worker, 'snp_pairs'), self.snp_pair_index.lookup(canonical_rsids(rsids)))
+        return self.queries.fetch_rows(self.sql_worker, 'snp_pairs', rsid=rsid_filter_codes(self.sql_worker, rsids))
 
-        print('rsids', rsids)
+    def load_snp_pair_index(self):
+        self.snp_pair_index.load(self.queries.fetch_rows(self.sql_worker, 'snp_pairs').rows)
 
-        # Construct the query dynamically with parameter placeholders
-        placeholders = ', '.join(['?'] * len(rsids))  # Generate ?, ?, ? based on the number of rsids
-        query = f"""
-            SELECT rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2
-            FROM snp_pairs
-            WHERE rsid IN ({placeholders})
+    def fetch_snp_pairs_frame(self, rsids=None):
+        """
+            The whole reference (or the SNP pairs of `rsids`) as a DataFrame, from the in-memory index.
         """
+        rows = self.snp_pair_index.rows() if rsids is None else self.snp_pair_index.lookup(canonical_rsids(rsids))
+        return pd.DataFrame(rows, columns=self.queries.column_names(self.sql_worker, 'snp_pairs'))
 
-        # Execute the query with parameter substitution
-        results_list = self.sql_worker.execute(query, rsids)
-        print('results_list', results_list)
-
-        # Convert the results to a DataFrame and then to JSON
-        results_list = pd.DataFrame(results_list, columns=columns)
-        json_str = results_list.to_json(orient='records', date_format='iso')
-        return json.loads(json_str)
-    
-    def fetch_genes_in_genome(self, offset=0, **kwargs): 
-        columns_query = '''SELECT name FROM pragma_table_info('snp_pairs')'''
-        columns = self.sql_worker.execute(columns_query)
-        columns = list(itertools.chain.from_iterable(columns))
-        base_query = '''
-            SELECT genes 
-            FROM snp_pairs
-        ''' 
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
\ No newline at end of file
+    def snp_pair_index_stats(self):
+        return self.snp_pair_index.stats()
@@ -1,19 +1,98 @@
 from email.mime import base
 import itertools
 import json
+import uuid
 import pandas as pd
-from pydantic import ValidationError
-from sqlite3worker import Sqlite3Worker
-from utils import fetch_data_with_conditions
-from models import Patient, PatientGenomeData
+from data_layer.genome_cache import GENOME_FRAME_COLUMNS, concatenate_columns, encode_genome_frame
+from data_layer.rsid_codes import RSID_NAMES_TABLE, assign_rsid_codes, rsid_filter_codes, rsid_name_sql
+from data_layer.query_registry import QueryRegistry, QueryTemplate
+from data_layer.sqlite_worker import GenomeSqlWorker, chunked
+from genotype_matching import allele_set_masks, match_genotypes
+from models import ImportSummary, Patient, PatientGenomeData, RejectedRow
+
+PATIENT_GENOME_BATCH_SIZE = 10000
+# Applied only while rows are staged for a bulk load (see `ingest_patient_genome`): staged rows
+# are not published until the swap, which runs with the connection's own syncing, so relaxed
+# syncing cannot lose or half-write a loaded patient. (Not temp_store: changing it drops the
+# writer's TEMP tables, the staging tables among them.)
+BULK_LOAD_PRAGMAS = {'synchronous': 'OFF', 'cache_size': -64000}
+# An import reports the first rejected rows only, and the count of all of them.
+MAX_REPORTED_REJECTIONS = 1000
+
+# Keyset pagination: the unique key each ordering of patient genome rows is paged by.
+GENOME_DATA_ORDER_KEYS = {
+    'rsid': ['patient_id', 'rsid'],
+    'position': ['chromosome', 'position', 'patient_id', 'rsid'],
+}
+
+PATIENT_REPORT_COLUMNS = ['patient_id', 'rsid', 'rsid_genotypes', 'chromosome', 'position', 'genotype',
+                          'magnitude', 'risk', 'notes', 'allele1', 'allele2', 'genotype_match']
+
+def genome_data_keys(order_by, table_alias=None):
+    if order_by not in GENOME_DATA_ORDER_KEYS:
+        raise ValueError(f"Invalid order_by: {order_by}.")
+    prefix = f'{table_alias}.' if table_alias else ''
+    return [prefix + column for column in GENOME_DATA_ORDER_KEYS[order_by]]
+
+def genome_data_orders(table_alias=None, extra_keys=()):
+    return {order_by: genome_data_keys(order_by, table_alias) + list(extra_keys) for order_by in GENOME_DATA_ORDER_KEYS}
+
+def validate_patient_genome_df(genome_df, first_row=0):
+    """
+        Vectorised equivalent of validating every row against `PatientGenomeData`.
+        Returns the valid rows (rsid, chromosome, position, genotype), and the rejected rows.
+    """
+    genome_df = genome_df.reset_index(drop=True)
+    genome_df.index += first_row
+    reasons = pd.Series('', index=genome_df.index)
+    for column in ['rsid', 'chromosome', 'genotype']:
+        if column not in genome_df.columns:
+            genome_df[column] = None
+        missing = genome_df[column].isna() | (genome_df[column].astype(str).str.strip() == '')
+        reasons = reasons.mask(missing & (reasons == ''), f'missing {column}')
+    position = pd.to_numeric(genome_df.get('position'), errors='coerce')
+    invalid = position.isna() | (position % 1 != 0)
+    reasons = reasons.mask(invalid & (reasons == ''), 'position is not an integer')
+    rejected = reasons != ''
+    rejections = [
+        RejectedRow(row=int(row), key=str(key), reason=reason)
+        for row, key, reason in zip(genome_df.index[rejected], genome_df.loc[rejected, 'rsid'], reasons[rejected])
+    ]
+    valid_df = pd.DataFrame({
+        'rsid': genome_df['rsid'].astype(str),
+        'chromosome': genome_df['chromosome'].astype(str),
+        'position': position.fillna(0).astype('int64'),
+        'genotype': genome_df['genotype'].astype(str),
+    })[~rejected]
+    return valid_df, rejections
+
+def patient_genome_rows(valid_df, patient_id, rsid_codes):
+    return zip(rsid_codes.tolist(), itertools.repeat(patient_id), valid_df['chromosome'], valid_df['position'].tolist(), valid_df['genotype'])
+
+def patient_report_rows(report_df, rsid_codes):
+    """
+        patient_report rows from a `match_patient` report, with NULL for missing values.
+    """
+    report_df = report_df[PATIENT_REPORT_COLUMNS].astype(object)
+    report_df['rsid'] = rsid_codes.tolist()
+    return list(report_df.where(report_df.notna(), None).itertuples(index=False, name=None))
+
+PGD_RSID = f"{rsid_name_sql('pgd.rsid')} AS rsid"
 
 class PatientGenomeRepository:
-    def __init__(self, db_path):
+    def __init__(self, db_path, sql_worker=None):
         self.__db_path = db_path
-        self.sql_worker = Sqlite3Worker(self.__db_path) 
+        self.sql_worker = sql_worker or GenomeSqlWorker(self.__db_path)
+        self.queries = QueryRegistry(self.QUERY_TEMPLATES)
         self.create_tables()
+        self.load_ready_reports()
+
+    def load_ready_reports(self):
+        # Patients whose materialized report can be read, so a report read needs no status query.
+        self.ready_reports = {row[0] for row in self.sql_worker.execute("SELECT patient_id FROM patient_report_summary WHERE status = 'ready'")}
 
     def create_tables(self): 
+        self.sql_worker.execute(RSID_NAMES_TABLE)
         self.sql_worker.execute('''
             CREATE TABLE IF NOT EXISTS patients (
                 patient_id TEXT PRIMARY KEY,
@@ -22,7 +101,7 @@ class PatientGenomeRepository:
         ''')
         self.sql_worker.execute('''
             CREATE TABLE IF NOT EXISTS patient_genome_data (
-                rsid TEXT NOT NULL,
+                rsid INTEGER NOT NULL,
                 patient_id TEXT NOT NULL,
                 chromosome TEXT NOT NULL,
                 position INTEGER NOT NULL,
@@ -31,89 +110,378 @@ class PatientGenomeRepository:
                 UNIQUE (patient_id, rsid)
             )
         ''')
+        # The full report, materialized per patient (see `save_patient_report`.) Clustered on the
+        # report's rsid-order key, so a patient's pages are contiguous.
+        self.sql_worker.execute('''
+            CREATE TABLE IF NOT EXISTS patient_report (
+                patient_id TEXT NOT NULL,
+                rsid INTEGER NOT NULL,
+                rsid_genotypes TEXT NOT NULL,
+                chromosome TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                genotype TEXT NOT NULL,
+                magnitude REAL,
+                risk REAL,
+                notes TEXT,
+                allele1 TEXT,
+                allele2 TEXT,
+                genotype_match INTEGER,
+                PRIMARY KEY (patient_id, rsid, rsid_genotypes)
+            ) WITHOUT ROWID
+        ''')
+        # One row per patient: whether their report is 'ready' to read, or 'pending' (being
+        # built, or stale after a genome load), and its aggregate risk scores.
+        self.sql_worker.execute('''
+            CREATE TABLE IF NOT EXISTS patient_report_summary (
+                patient_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                matched_pairs INTEGER NOT NULL DEFAULT 0,
+                no_calls INTEGER NOT NULL DEFAULT 0,
+                total_magnitude REAL NOT NULL DEFAULT 0,
+                max_magnitude REAL,
+                mean_risk REAL,
+                updated_at TEXT
+            )
+        ''')
 
     def close_connection(self):
         self.sql_worker.close()
 
     # WRITE (Create/Update/Insert)
  
+    UPSERT_PATIENT_QUERY = '''
+        INSERT INTO patients (patient_id, patient_name)
+        VALUES (?, ?)
+        ON CONFLICT(patient_id) DO UPDATE SET patient_name=excluded.patient_name
+    '''
+
+    UPSERT_PATIENT_GENOME_DATA_QUERY = '''
+        INSERT INTO patient_genome_data (rsid, patient_id, chromosome, position, genotype)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(patient_id, rsid) DO UPDATE SET rsid=excluded.rsid, patient_id=excluded.patient_id, chromosome=excluded.chromosome, position=excluded.position, genotype=excluded.genotype
+    '''
+ 
+    # An upload's rows, staged until they are swapped in (see `ingest_patient_genome`): a later
+    # row for the same rsid replaces an earlier one, as it would in patient_genome_data. A TEMP
+    # table, on the writer's connection: it goes with the connection if the process dies.
+    STAGING_TABLE_QUERY = '''
+        CREATE TABLE {staging} (
+            rsid INTEGER NOT NULL PRIMARY KEY,
+            patient_id TEXT NOT NULL,
+            chromosome TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            genotype TEXT NOT NULL
+        )
+    '''
+
+    STAGE_PATIENT_GENOME_DATA_QUERY = '''
+        INSERT OR REPLACE INTO {staging} (rsid, patient_id, chromosome, position, genotype)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+
+    SWAP_PATIENT_GENOME_DATA_QUERY = '''
+        INSERT INTO patient_genome_data (rsid, patient_id, chromosome, position, genotype)
+        SELECT rsid, patient_id, chromosome, position, genotype FROM {staging} WHERE true
+        ON CONFLICT(patient_id, rsid) DO UPDATE SET chromosome=excluded.chromosome, position=excluded.position, genotype=excluded.genotype
+    '''
+
+    MARK_REPORT_PENDING_QUERY = '''
+        INSERT INTO patient_report_summary (patient_id, status, updated_at)
+        VALUES (?, 'pending', datetime('now'))
+        ON CONFLICT(patient_id) DO UPDATE SET status='pending', updated_at=excluded.updated_at
+    '''
+
+    INSERT_PATIENT_REPORT_QUERY = '''
+        INSERT OR REPLACE INTO patient_report (patient_id, rsid, rsid_genotypes, chromosome, position, genotype, magnitude, risk, notes, allele1, allele2, genotype_match)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    # Aggregate risk scores over the SNP pairs a patient's genotypes match.
+    SUMMARIZE_PATIENT_REPORT_QUERY = '''
+        INSERT INTO patient_report_summary (patient_id, status, matched_pairs, no_calls, total_magnitude, max_magnitude, mean_risk, updated_at)
+        SELECT :patient_id, 'ready',
+               COUNT(CASE WHEN genotype_match = 1 THEN 1 END),
+               COUNT(CASE WHEN genotype_match IS NULL THEN 1 END),
+               COALESCE(SUM(CASE WHEN genotype_match = 1 THEN magnitude END), 0),
+               MAX(CASE WHEN genotype_match = 1 THEN magnitude END),
+               AVG(CASE WHEN genotype_match = 1 THEN risk END),
+               datetime('now')
+        FROM patient_report WHERE patient_id = :patient_id
+        ON CONFLICT(patient_id) DO UPDATE SET status=excluded.status, matched_pairs=excluded.matched_pairs, no_calls=excluded.no_calls,
+            total_magnitude=excluded.total_magnitude, max_magnitude=excluded.max_magnitude, mean_risk=excluded.mean_risk, updated_at=excluded.updated_at
+    '''
+
     def update_or_insert_patient(self, patient: Patient):
-        query = '''
-            INSERT INTO patients (patient_id, patient_name)
-            VALUES (?, ?)
-            ON CONFLICT(patient_id) DO UPDATE SET patient_name=excluded.patient_name
-        '''
-        self.sql_worker.execute(query, (patient.patient_id, patient.patient_name))
+        self.sql_worker.execute(self.UPSERT_PATIENT_QUERY, (patient.patient_id, patient.patient_name))
 
     def update_or_insert_patient_genome_data(self, patient_genome_data: PatientGenomeData):
-        query = '''
-            INSERT INTO patient_genome_data (rsid, patient_id, chromosome, position, genotype)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(patient_id, rsid) DO UPDATE SET rsid=excluded.rsid, patient_id=excluded.patient_id, chromosome=excluded.chromosome, position=excluded.position, genotype=excluded.genotype
-        '''
-        self.sql_worker.execute(query, (patient_genome_data.rsid, patient_genome_data.patient_id, patient_genome_data.chromosome, patient_genome_data.position, patient_genome_data.genotype))
-
-    def update_patient_and_genome_data(self, patient_df, patient_id, patient_name):
+        def upsert(connection):
+            code = int(assign_rsid_codes(connection, [patient_genome_data.rsid])[0])
+            connection.execute(self.UPSERT_PATIENT_GENOME_DATA_QUERY, (code, patient_genome_data.patient_id, patient_genome_data.chromosome, patient_genome_data.position, patient_genome_data.genotype))
+        self.sql_worker.run_in_transaction(upsert)
+
+    def update_patient_and_genome_data(self, patient_df, patient_id, patient_name, batch_size=PATIENT_GENOME_BATCH_SIZE) -> ImportSummary:
         patient = Patient(patient_id=patient_id, patient_name=patient_name)
-        self.update_or_insert_patient(patient)
-        for index, row in patient_df.iterrows():
-            patient_genome_data = PatientGenomeData(**row, patient_id=patient_id)
-            self.update_or_insert_patient_genome_data(patient_genome_data)
+        return self.ingest_patient_genome(patient, [patient_df], batch_size=batch_size)
+
+    def ingest_patient_genome(self, patient: Patient, genome_dfs, batch_size=PATIENT_GENOME_BATCH_SIZE, validate=True) -> ImportSummary:
+        """
+            Bulk load a patient, and their genome (an iterable of DataFrames): each frame is staged
+            in its own short transaction, so the writer is free while the next frame is produced
+            (e.g. parsed from an upload as it arrives), then the patient and all their staged rows
+            are swapped in, in one transaction: either they all are written, or nothing is.
+            Pass `validate=False` for frames already returned by `validate_patient_genome_df`.
+        """
+        staging = f"temp.patient_genome_staging_{uuid.uuid4().hex}"
+        summary = ImportSummary(total_rows=0, imported_rows=0, rejected_rows=0)
+        self.sql_worker.run_in_transaction(lambda connection: connection.execute(self.STAGING_TABLE_QUERY.format(staging=staging)))
+        try:
+            for genome_df in genome_dfs:
+                valid_df, rejections = validate_patient_genome_df(genome_df, first_row=summary.total_rows) if validate else (genome_df, [])
+                def stage(connection, valid_df=valid_df):
+                    rsid_codes = assign_rsid_codes(connection, valid_df['rsid'])
+                    for batch in chunked(patient_genome_rows(valid_df, patient.patient_id, rsid_codes), batch_size):
+                        connection.executemany(self.STAGE_PATIENT_GENOME_DATA_QUERY.format(staging=staging), batch)
+                self.sql_worker.run_in_transaction(stage, pragmas=BULK_LOAD_PRAGMAS)
+                summary.total_rows += len(genome_df)
+                summary.imported_rows += len(valid_df)
+                summary.rejected_rows += len(rejections)
+                summary.rejections.extend(rejections[:MAX_REPORTED_REJECTIONS - len(summary.rejections)])
+            def swap(connection):
+                connection.execute(self.UPSERT_PATIENT_QUERY, (patient.patient_id, patient.patient_name))
+                connection.execute(self.SWAP_PATIENT_GENOME_DATA_QUERY.format(staging=staging))
+            self.sql_worker.run_in_transaction(swap)
+            return summary
+        finally:
+            self.sql_worker.run_in_transaction(lambda connection: connection.execute(f"DROP TABLE IF EXISTS {staging}"))
+
+    def mark_patient_report_pending(self, patient_id):
+        """
+            Reads of the patient's full report fall back to the live join until `save_patient_report`.
+        """
+        self.ready_reports.discard(patient_id)
+        self.sql_worker.execute(self.MARK_REPORT_PENDING_QUERY, (patient_id,))
+
+    def save_patient_report(self, patient_id, report_df):
+        """
+            Replace a patient's materialized report with `report_df` (from `match_patient`), and
+            mark it ready, in one transaction.
+        """
+        def save(connection):
+            rows = patient_report_rows(report_df, assign_rsid_codes(connection, report_df['rsid']))
+            connection.execute("DELETE FROM patient_report WHERE patient_id = ?", (patient_id,))
+            for batch in chunked(rows, PATIENT_GENOME_BATCH_SIZE):
+                connection.executemany(self.INSERT_PATIENT_REPORT_QUERY, batch)
+            connection.execute(self.SUMMARIZE_PATIENT_REPORT_QUERY, {'patient_id': patient_id})
+            return len(rows)
+        saved_rows = self.sql_worker.run_in_transaction(save)
+        self.ready_reports.add(patient_id)
+        return saved_rows
+
+    def refresh_patient_reports(self, rsids, report_df):
+        """
+            Replace the report rows of `rsids` (whose SNP pairs changed) in every ready report with
+            `report_df`, and re-aggregate those patients' scores, in one transaction.
+        """
+        def refresh(connection):
+            rows = patient_report_rows(report_df, assign_rsid_codes(connection, report_df['rsid']))
+            rsids_json = json.dumps(assign_rsid_codes(connection, list(rsids)).tolist())
+            patient_ids = [row[0] for row in connection.execute(self.READY_PATIENTS_WITH_RSIDS_QUERY, (rsids_json,))]
+            connection.execute('''
+                DELETE FROM patient_report
+                WHERE rsid IN (SELECT value FROM json_each(?))
+                  AND patient_id IN (SELECT patient_id FROM patient_report_summary WHERE status = 'ready')
+            ''', (rsids_json,))
+            for batch in chunked(rows, PATIENT_GENOME_BATCH_SIZE):
+                connection.executemany(self.INSERT_PATIENT_REPORT_QUERY, batch)
+            for patient_id in patient_ids:
+                connection.execute(self.SUMMARIZE_PATIENT_REPORT_QUERY, {'patient_id': patient_id})
+            return len(patient_ids)
+        return self.sql_worker.run_in_transaction(refresh)
 
     # READ (Fetch/Select)
 
+    READY_PATIENTS_WITH_RSIDS_QUERY = '''
+        SELECT s.patient_id FROM patient_report_summary s
+        WHERE s.status = 'ready' AND EXISTS (
+            SELECT 1 FROM patient_genome_data pgd
+            WHERE pgd.patient_id = s.patient_id AND pgd.rsid IN (SELECT value FROM json_each(?)))
+    '''
+
+    # rsid is stored as an integer code (see rsid_codes.py): filters and keys compare codes, and
+    # the select lists decode it.
+    # CROSS JOIN keeps patient_genome_data as the outer loop, so joined rows come out in key (index)
+    # order and a page reads only its own rows. A patient's rsid can match several SNP pairs (one
+    # per genotype), so the full report key also needs rsid_genotypes. The report's genotype_match
+    # column is computed by the matching engine (see genotype_matching.py), not in SQL.
+    QUERY_TEMPLATES = [
+        QueryTemplate(
+            'patients',
+            'patient_id, patient_name',
+            'FROM patients',
+            {'patient_id': 'patient_id'},
+            {'patient_id': ['patient_id']},
+        ),
+        QueryTemplate(
+            'patient_genome_data',
+            f'{rsid_name_sql("pgd.rsid")} AS rsid, pgd.chromosome, pgd.position, pgd.genotype',
+            'FROM patient_genome_data pgd',
+            {'patient_id': 'pgd.patient_id', 'rsid': 'pgd.rsid'},
+            genome_data_orders('pgd'),
+        ),
+        QueryTemplate(
+            'snp_pairs_by_genotype',
+            f'rsid_genotypes, magnitude, risk, notes, {rsid_name_sql("snp_pairs.rsid")} AS rsid, allele1, allele2',
+            'FROM snp_pairs',
+            {'rsid': 'snp_pairs.rsid', 'allele1': 'allele1', 'allele2': 'allele2'},
+            {'rsid_genotypes': ['rsid_genotypes']},
+        ),
+        QueryTemplate(
+            'patient_data_expanded',
+            f'p.patient_id, p.patient_name, {PGD_RSID}, pgd.chromosome, pgd.position, pgd.genotype',
+            'FROM patient_genome_data pgd CROSS JOIN patients p ON p.patient_id = pgd.patient_id',
+            {'patient_id': 'pgd.patient_id', 'rsid': 'pgd.rsid'},
+            genome_data_orders('pgd'),
+        ),
+        # A region is a range of the (chromosome, position) index, or, for one patient, of
+        # (patient_id, chromosome, position): a page reads only the rows it returns.
+        QueryTemplate(
+            'genome_region',
+            f'p.patient_id, p.patient_name, {PGD_RSID}, pgd.chromosome, pgd.position, pgd.genotype',
+            'FROM patient_genome_data pgd CROSS JOIN patients p ON p.patient_id = pgd.patient_id',
+            {'chromosome': 'pgd.chromosome', 'start': ('pgd.position', '>='), 'end': ('pgd.position', '<='), 'patient_id': 'pgd.patient_id'},
+            {'position': genome_data_keys('position', 'pgd')},
+        ),
+        QueryTemplate(
+            'full_report',
+            # reference_alleles: the alleles of every pair of the rsid (the pairs can straddle pages), for matching.
+            f'''p.patient_id, p.patient_name, {PGD_RSID}, pgd.chromosome, pgd.position, pgd.genotype,
+               sp.rsid_genotypes, sp.magnitude, sp.risk, sp.notes, sp.allele1, sp.allele2,
+               (SELECT group_concat(r.allele1 || r.allele2, '') FROM snp_pairs r WHERE r.rsid = sp.rsid) AS reference_alleles''',
+            '''FROM patient_genome_data pgd
+               CROSS JOIN patients p ON p.patient_id = pgd.patient_id
+               CROSS JOIN snp_pairs sp ON pgd.rsid = sp.rsid''',
+            {'patient_id': 'pgd.patient_id', 'rsid': 'pgd.rsid'},
+            genome_data_orders('pgd', ['sp.rsid_genotypes']),
+        ),
+        QueryTemplate(
+            'patient_reference_genotypes',
+            f'p.patient_id, p.patient_name, {PGD_RSID}, pgd.chromosome, pgd.position, pgd.genotype',
+            '''FROM (SELECT DISTINCT rsid FROM snp_pairs) reference
+               JOIN patient_genome_data pgd ON pgd.rsid = reference.rsid
+               JOIN patients p ON p.patient_id = pgd.patient_id''',
+            {'patient_id': 'pgd.patient_id'},
+        ),
+        QueryTemplate(
+            'ready_patient_genotypes',
+            f'p.patient_id, p.patient_name, {PGD_RSID}, pgd.chromosome, pgd.position, pgd.genotype',
+            '''FROM patient_genome_data pgd
+               CROSS JOIN patient_report_summary s ON s.patient_id = pgd.patient_id AND s.status = 'ready'
+               CROSS JOIN patients p ON p.patient_id = pgd.patient_id''',
+            {'rsid': 'pgd.rsid'},
+        ),
+        # The materialized full report: same columns, orders and keys as 'full_report', so a
+        # cursor from either continues in the other.
+        QueryTemplate(
+            'patient_report',
+            f'''pr.patient_id, p.patient_name, {rsid_name_sql("pr.rsid")} AS rsid, pr.chromosome, pr.position, pr.genotype,
+               pr.rsid_genotypes, pr.magnitude, pr.risk, pr.notes, pr.allele1, pr.allele2, pr.genotype_match''',
+            'FROM patient_report pr CROSS JOIN patients p ON p.patient_id = pr.patient_id',
+            {'patient_id': 'pr.patient_id', 'rsid': 'pr.rsid'},
+            genome_data_orders('pr', ['pr.rsid_genotypes']),
+        ),
+        QueryTemplate(
+            'patient_report_summary',
+            'patient_id, status, matched_pairs, no_calls, total_magnitude, max_magnitude, mean_risk, updated_at',
+            'FROM patient_report_summary',
+            {'patient_id': 'patient_id', 'status': 'status'},
+            {'patient_id': ['patient_id']},
+        ),
+    ]
+
+    def _fetch_page(self, name, rsid=None, **kwargs):
+        return self.queries.fetch_page(self.sql_worker, name, rsid=rsid_filter_codes(self.sql_worker, rsid), **kwargs)
+
     def fetch_patients(self, offset=0, **kwargs):
-        columns_query = '''SELECT name FROM pragma_table_info('patients')'''
-        columns = self.sql_worker.execute(columns_query)
-        columns = list(itertools.chain.from_iterable(columns))
-        base_query = '''
-            SELECT *
-            FROM patients
-        ''' 
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
-    
-    def fetch_patient_genome_data(self, offset=0, **kwargs): 
-        columns_query = '''SELECT name FROM pragma_table_info('patient_genome_data')'''
-        columns = self.sql_worker.execute(columns_query)
-        columns = list(itertools.chain.from_iterable(columns))
-        columns.remove("patient_id")
-        base_query = '''
-            SELECT rsid, chromosome, position, genotype
-            FROM patient_genome_data
-        '''
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
-        
-    def fetch_snp_pairs_data_by_genotype(self, offset=0, **kwargs):     
-        columns = ['rsid_genotypes', 'magnitude', 'risk', 'notes', 'rsid', 'allele1', 'allele2']
-        base_query = '''
-            SELECT rsid_genotypes, magnitude, risk, notes, rsid, allele1, allele2
-            FROM snp_pairs
-        ''' 
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
-        
-    def fetch_patient_data_expanded(self, offset=0, **kwargs): 
-        columns = ['patient_id', 'patient_name', 'rsid', 'chromosome', 'position', 'genotype']
-        base_query = '''
-            SELECT p.patient_id, p.patient_name, pgd.rsid, pgd.chromosome, pgd.position, pgd.genotype
-            FROM patients p
-            JOIN patient_genome_data pgd ON p.patient_id = pgd.patient_id
-        '''
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
-    
+        return self.queries.fetch_page(self.sql_worker, 'patients', **kwargs)
+
+    def fetch_patient_genome_data(self, offset=0, **kwargs):
+        return self._fetch_page('patient_genome_data', **kwargs)
+
+    def fetch_snp_pairs_data_by_genotype(self, offset=0, **kwargs):
+        return self._fetch_page('snp_pairs_by_genotype', **kwargs)
+
+    def fetch_patient_data_expanded(self, offset=0, **kwargs):
+        return self._fetch_page('patient_data_expanded', **kwargs)
+
+    def fetch_patient_report_status(self, patient_id):
+        rows = self.sql_worker.execute("SELECT status FROM patient_report_summary WHERE patient_id = ?", (patient_id,))
+        return rows[0][0] if rows else None
+
+    def fetch_patient_report_summary(self, offset=0, **kwargs):
+        return self.queries.fetch_page(self.sql_worker, 'patient_report_summary', **kwargs)
+
+    def fetch_genome_region(self, offset=0, **kwargs):
+        return self.queries.fetch_page(self.sql_worker, 'genome_region', **kwargs)
+
     def fetch_full_report(self, offset=0, **kwargs):
-        columns = ['patient_id', 'patient_name', 'rsid', 'chromosome', 'position', 'genotype',
-               'rsid_genotypes', 'magnitude', 'risk', 'notes', 'allele1', 'allele2', 'genotype_match']
-        base_query = '''
-            SELECT p.patient_id, p.patient_name, pgd.rsid, pgd.chromosome, pgd.position, pgd.genotype,
-                   sp.rsid_genotypes, sp.magnitude, sp.risk, sp.notes, sp.allele1, sp.allele2,
-                   (pgd.genotype = sp.allele1 || sp.allele2 OR pgd.genotype = sp.allele2 || sp.allele1) AS genotype_match
-            FROM patients p
-            JOIN patient_genome_data pgd ON p.patient_id = pgd.patient_id
-            JOIN snp_pairs sp ON pgd.rsid = sp.rsid
-        '''
-        sql_worker_execution_function = self.sql_worker.execute
-        return fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs)
+        """
+            A patient's ready report is read from patient_report; anything else (every patient, or
+            a report still pending) is joined and matched at request time.
+        """
+        patient_id = kwargs.get('patient_id')
+        if isinstance(patient_id, str) and patient_id in self.ready_reports:
+            return self._fetch_page('patient_report', **kwargs)
+        page = self._fetch_page('full_report', **kwargs)
+        genotype, allele1, allele2, reference_alleles = (page.columns.index(column) for column in ['genotype', 'allele1', 'allele2', 'reference_alleles'])
+        matches = match_genotypes([row[genotype] for row in page.rows], [row[allele1] for row in page.rows], [row[allele2] for row in page.rows],
+                                  reference_masks=allele_set_masks([row[reference_alleles] for row in page.rows]))
+        return page._replace(columns=page.columns[:reference_alleles] + ['genotype_match'], rows=[row[:reference_alleles] + (match,) for row, match in zip(page.rows, matches)])
+
+    def fetch_patient_genome_frame(self, patient_id):
+        """
+            The genome rows of a patient at rsids with SNP pairs, with the patient's name, as a
+            DataFrame (for `match_patient`.)
+        """
+        row_set = self.queries.fetch_rows(self.sql_worker, 'patient_reference_genotypes', patient_id=patient_id)
+        return pd.DataFrame(row_set.rows, columns=row_set.columns)
+
+    def fetch_patient_ids(self):
+        return [row[0] for row in self.sql_worker.execute("SELECT patient_id FROM patients ORDER BY patient_id")]
+
+    def fetch_patient_reference_genotypes(self, patient_id):
+        """
+            (rsid codes, genotypes) of the patient's genome rows at rsids with SNP pairs.
+        """
+        rows = self.sql_worker.execute('''
+            SELECT rsid, genotype FROM patient_genome_data
+            WHERE patient_id = ? AND rsid IN (SELECT rsid FROM snp_pairs)
+        ''', (patient_id,))
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def fetch_patient_genome_columns(self, patient_id, chunk_size=PATIENT_GENOME_BATCH_SIZE * 5):
+        """
+            A patient's whole genome encoded column-wise (see genome_cache.py), with the values
+            that do not encode losslessly. Rows are read and encoded a chunk at a time.
+        """
+        def read(connection):
+            cursor = connection.execute(f"SELECT {rsid_name_sql('rsid')}, chromosome, position, genotype FROM patient_genome_data WHERE patient_id = ? ORDER BY patient_genome_data.rsid", (patient_id,))
+            chunks, exceptions, first_row = [], {}, 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                columns, chunk_exceptions = encode_genome_frame(pd.DataFrame(rows, columns=GENOME_FRAME_COLUMNS))
+                chunks.append(columns)
+                for field, values in chunk_exceptions.items():
+                    exceptions.setdefault(field, {}).update((first_row + row, value) for row, value in values.items())
+                first_row += len(rows)
+            return concatenate_columns(chunks), exceptions
+        return self.sql_worker.run_in_transaction(read)
+
+    def fetch_ready_patient_genome_frame(self, rsids):
+        """
+            The genome rows at `rsids` of every patient whose report is ready, as a DataFrame.
+        """
+        row_set = self.queries.fetch_rows(self.sql_worker, 'ready_patient_genotypes', rsid=rsid_filter_codes(self.sql_worker, list(rsids)))
+        return pd.DataFrame(row_set.rows, columns=row_set.columns)
@@ -0,0 +1,112 @@
+import uuid
+from data_layer.query_registry import QueryRegistry, QueryTemplate
+from data_layer.rsid_codes import rsid_filter_codes, rsid_name_sql
+from data_layer.sqlite_worker import GenomeSqlWorker, chunked
+from repositories.patient_genome_repository import BULK_LOAD_PRAGMAS
+
+# Variant annotations (ClinVar, CIViC) are imported per genome build, each into its own table.
+BUILD_TABLES = {'GRCh37': 'variant_annotations_grch37', 'GRCh38': 'variant_annotations_grch38'}
+VARIANT_ANNOTATION_COLUMNS = ['source', 'variant_id', 'rsid', 'chromosome', 'position', 'ref', 'alt',
+                              'gene', 'clinical_significance', 'review_status', 'condition', 'info']
+# The primary key, by position: a region of the table is a range of it.
+POSITION_KEY = ['chromosome', 'position', 'ref', 'alt', 'source', 'variant_id']
+VARIANT_ANNOTATION_BATCH_SIZE = 10000
+
+def annotation_select(alias):
+    return ', '.join(f'{rsid_name_sql(f"{alias}.rsid")} AS rsid' if column == 'rsid' else f'{alias}.{column}'
+                     for column in VARIANT_ANNOTATION_COLUMNS if column != 'info')
+
+def annotation_templates(build, table):
+    return [
+        QueryTemplate(
+            f'variant_annotations_{build}',
+            annotation_select('va'),
+            f'FROM {table} va',
+            {'rsid': 'va.rsid', 'source': 'va.source', 'chromosome': 'va.chromosome', 'start': ('va.position', '>='), 'end': ('va.position', '<=')},
+            {'position': [f'va.{column}' for column in POSITION_KEY]},
+        ),
+        # A patient's variants with their annotations, joined on rsid.
+        QueryTemplate(
+            f'patient_variant_annotations_{build}',
+            f'pgd.patient_id, pgd.genotype, {annotation_select("va")}',
+            f'FROM patient_genome_data pgd CROSS JOIN {table} va ON va.rsid = pgd.rsid',
+            {'patient_id': 'pgd.patient_id', 'rsid': 'pgd.rsid', 'source': 'va.source'},
+            {'rsid': ['pgd.patient_id', 'pgd.rsid'] + [f'va.{column}' for column in POSITION_KEY]},
+        ),
+    ]
+
+class VariantAnnotationRepository:
+    def __init__(self, db_path, sql_worker=None):
+        self.__db_path = db_path
+        self.sql_worker = sql_worker or GenomeSqlWorker(self.__db_path)
+        self.queries = QueryRegistry([template for build, table in BUILD_TABLES.items() for template in annotation_templates(build, table)])
+        self.create_tables()
+
+    def create_tables(self):
+        for table in BUILD_TABLES.values():
+            self.sql_worker.execute(self.table_sql(table))
+
+    @staticmethod
+    def table_sql(table):
+        # rsid is a code (see rsid_codes.py), NULL for a variant without one.
+        return f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                source TEXT NOT NULL,
+                variant_id TEXT NOT NULL,
+                rsid INTEGER,
+                chromosome TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                ref TEXT NOT NULL,
+                alt TEXT NOT NULL,
+                gene TEXT,
+                clinical_significance TEXT,
+                review_status TEXT,
+                condition TEXT,
+                info TEXT,
+                PRIMARY KEY ({', '.join(POSITION_KEY)})
+            ) WITHOUT ROWID
+        '''
+
+    def close_connection(self):
+        self.sql_worker.close()
+
+    # WRITE
+
+    def replace_variant_annotations(self, source, build, annotation_dfs, batch_size=VARIANT_ANNOTATION_BATCH_SIZE):
+        """
+            Replace the annotations of `source` in the table of `build` with `annotation_dfs` (an
+            iterable of DataFrames of VARIANT_ANNOTATION_COLUMNS.) Each frame is staged in its own
+            short transaction, so the writer is not held for the whole import; the staged rows
+            then replace the source's in one transaction. Each import stages into its own TEMP
+            table, so imports of the same source may overlap. Returns the number of rows.
+        """
+        table = BUILD_TABLES[build]
+        staging = f'temp.{table}_staging_{source}_{uuid.uuid4().hex}'
+        columns = ', '.join(VARIANT_ANNOTATION_COLUMNS)
+        insert = f"INSERT OR REPLACE INTO {staging} ({columns}) VALUES ({', '.join('?' * len(VARIANT_ANNOTATION_COLUMNS))})"
+        self.sql_worker.run_in_transaction(lambda connection: connection.execute(self.table_sql(staging)))
+        try:
+            for annotation_df in annotation_dfs:
+                rows = list(annotation_df[VARIANT_ANNOTATION_COLUMNS].itertuples(index=False, name=None))
+                def stage(connection, rows=rows):
+                    for batch in chunked(rows, batch_size):
+                        connection.executemany(insert, batch)
+                self.sql_worker.run_in_transaction(stage, pragmas=BULK_LOAD_PRAGMAS)
+            def swap(connection):
+                connection.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+                connection.execute(f"INSERT OR REPLACE INTO {table} ({columns}) SELECT {columns} FROM {staging}")
+                return connection.execute(f"SELECT COUNT(*) FROM {staging}").fetchone()[0]
+            return self.sql_worker.run_in_transaction(swap)
+        finally:
+            self.sql_worker.run_in_transaction(lambda connection: connection.execute(f"DROP TABLE IF EXISTS {staging}"))
+
+    # READ
+
+    def fetch_variant_annotations(self, build, offset=0, rsid=None, **kwargs):
+        return self.queries.fetch_page(self.sql_worker, f'variant_annotations_{build}', rsid=rsid_filter_codes(self.sql_worker, rsid), **kwargs)
+
+    def fetch_patient_variant_annotations(self, build, offset=0, rsid=None, **kwargs):
+        return self.queries.fetch_page(self.sql_worker, f'patient_variant_annotations_{build}', rsid=rsid_filter_codes(self.sql_worker, rsid), **kwargs)
+
+    def count_variant_annotations(self, build):
+        return dict(self.sql_worker.execute(f"SELECT source, COUNT(*) FROM {BUILD_TABLES[build]} GROUP BY source"))
@@ -0,0 +1,51 @@
+from dotenv import load_dotenv
+from typing import List, Optional
+from fastapi import APIRouter, Depends
+from fastapi.params import Query
+from controllers.genome_controller import GenomeController, get_genome_controller
+from utils import MAX_PAGE_SIZE
+
+load_dotenv()
+
+cohort_router = APIRouter()
+
+# Statistics over every patient's genotypes at the SNP pairs reference rsids
+
+@cohort_router.get("/allele_frequencies")
+def get_cohort_allele_frequencies(rsid: List[str] = Query(...), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Allele and genotype frequencies of the cohort at variants with SNP pairs.
+
+        - **rsid**: Variant IDs (repeat the parameter for several); IDs without SNP pairs are left out.
+
+        Returns:
+        - **JSONResponse**: For each rsid, the number of patients and of those called, and, for each allele, its count,
+          frequency (over the called alleles; a single-allele call counts twice) and number of carriers; and for each
+          genotype seen, its count and frequency among the called patients.
+    """
+    return genome_controller.get_cohort_allele_frequencies(rsid)
+
+@cohort_router.get("/snp_pair_prevalence")
+def get_cohort_snp_pair_prevalence(rsid: Optional[List[str]] = Query(None), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE * 10), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        SNP pairs by their prevalence in the cohort, most prevalent first.
+
+        - **rsid**: Variant IDs to restrict to (repeat the parameter for several); every SNP pair by default.
+        - **limit**: The number of SNP pairs returned.
+
+        Returns:
+        - **JSONResponse**: A list of SNP pairs (rsid, rsid_genotypes, alleles, magnitude and risk) with the number of
+          patients called at the rsid, of carriers of the pair's genotype (in either order, or on the other strand where
+          that is unambiguous, as reports match it), and its prevalence among the called patients.
+    """
+    return genome_controller.get_cohort_snp_pair_prevalence(rsid, limit)
+
+@cohort_router.get("/stats")
+def get_cohort_matrix_stats(genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Statistics of the in-memory cohort genotype matrix.
+
+        Returns:
+        - **JSONResponse**: Containing the number of patients and rsids, and the size in bytes of the matrix and its row capacity.
+    """
+    return genome_controller.get_cohort_matrix_stats()
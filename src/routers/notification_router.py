@@ -2,12 +2,11 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, WebSocketDisconnect 
 from fastapi.websockets import WebSocket
 from fastapi.openapi.utils import get_openapi 
-from controllers.notification_controller import NotificationController
+from controllers.notification_controller import NotificationController, get_notification_controller
 
 load_dotenv()
 
 notification_router = APIRouter()
-notification_controller = NotificationController()
 
 def custom_openapi():
     if notification_router.openapi_schema:
@@ -37,9 +36,11 @@ notification_router.openapi = custom_openapi
 # Notify UI or log the completion of data loading activity
 
 @notification_router.websocket("/notify_patient_file_load_complete")
-async def notify_patient_file_load_complete(websocket: WebSocket): 
+async def notify_patient_file_load_complete(websocket: WebSocket, notification_controller: NotificationController = Depends(get_notification_controller)): 
     """
-        WebSocket endpoint for real-time communication.
+        WebSocket endpoint streaming genome load events (JSON): `genome_load_queued`, `genome_load_running`,
+        `genome_load_progress` (at most every `PROGRESS_EVENT_INTERVAL` seconds per load), and `genome_load_succeeded`,
+        `genome_load_failed` or `genome_load_cancelled`; each with the load's status (as at `/patient_genome/load_patient_genome/{job_id}`.)
 
         - **Websocket**: The WebSocket connection instance.
     """
@@ -1,76 +1,161 @@
 from dotenv import load_dotenv
-from typing import Any, Optional
-from fastapi import APIRouter
+from typing import Any, Literal, Optional
+from fastapi import APIRouter, Depends, Request
 from fastapi.params import Query
 from fastapi.responses import JSONResponse
-import threading  
-from controllers.genome_controller import GenomeController
+from controllers.genome_controller import GenomeController, get_genome_controller
+from utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 load_dotenv()
 
 patient_genome_router = APIRouter() 
-genome_controller = GenomeController() 
 
 # Patient Genome: /patient
 
 @patient_genome_router.post("/load_patient_genome")
-def load_genome(genome_file_name_with_path: Optional[str] = Query(None)): 
+def load_genome(genome_file_name_with_path: Optional[str] = Query(None), genome_controller: GenomeController = Depends(get_genome_controller)): 
     """
-        Load a genome file in the background.
+        Queue a genome file to be loaded in the background.
         
         - **genome_file_name_with_path**: Optional; The path to the genome file to be loaded.
 
         Returns:
-        - **JSONResponse**: Indicating that genome loading has commenced and the path to the genome file.
+        - **JSONResponse** (202): The load's `job_id` and state; its progress is at `/patient_genome/load_patient_genome/{job_id}`.
+        - 429 (with a `Retry-After` header) when the ingest queue is full.
     """
     return genome_controller.load_genome(genome_file_name_with_path)
 
+@patient_genome_router.post("/upload_patient_genome", status_code=201, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}})
+async def upload_genome(request: Request, file_name: Optional[str] = Query(None), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Upload a genome file (the raw request body: 23andMe, AncestryDNA, MyHeritage/FamilyTreeDNA CSV or VCF, possibly gzip compressed)
+        and load it as it is received, without staging it on disk. (Zip archives cannot be read as a stream: unzip them first.)
+
+        - **file_name**: Optional; the name of the file, recorded as the patient name.
+
+        Returns:
+        - **JSONResponse** (201): The finished load (`job_id`, `patient_id`, `imported_rows`, ...), also at `/patient_genome/load_patient_genome/{job_id}`.
+        - 400 for a file in no known format, 413 past `UPLOAD_MAX_BYTES` or `UPLOAD_MAX_ROWS`, 408 if the upload stalls, 429 (with a `Retry-After` header) when `INGEST_UPLOADS` uploads are already running.
+    """
+    return await genome_controller.upload_genome(request, file_name)
+
+@patient_genome_router.get("/load_patient_genome/{job_id}")
+def get_genome_load(job_id: str, genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Retrieve the status of a genome load.
+
+        - **job_id**: The ID returned when the load was queued.
+
+        Returns:
+        - **JSONResponse**: The load's `state` (`queued`, `running`, `succeeded`, `failed` or `cancelled`), the `patient_id`
+          it creates, the `rows_processed` so far, the throughput (`rows_per_second`), the `imported_rows` once done, and the `error` of a failed load.
+    """
+    return genome_controller.get_ingest_job(job_id)
+
 # Fetch Patient Data
 
 @patient_genome_router.get("/patient_profile")
-def get_patient_profiles(patient_id: Optional[str] = None):
+def get_patient_profiles(patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Retrieve profiles data for patients, or a specific patient.
 
         - **patient_id**: An optional string representing the ID of the patient whose data is to be fetched.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
 
         Returns:
         - **JSONResponse**: Containing the patient data in JSON format.
     """
-    return genome_controller.get_patient_profile(patient_id)
+    return genome_controller.get_patient_profile(patient_id, cursor, page_size)
 
 @patient_genome_router.get("/patient_genome_data")
-def get_patient_genome_data(patient_id: Optional[str] = None, rsid: Optional[str] = None):
+def get_patient_genome_data(patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), order_by: Literal['rsid', 'position'] = 'rsid', genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Retrieve genome data for a specific patient and variant.
 
         - **patient_id**: The ID of the patient whose genome data is to be retrieved.
         - **rsid**: The ID of the variant to filter the genome data.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+        - **order_by**: Optional; page through the records by `rsid` (patient, then variant ID; the default), or by `position` (chromosome, then position.)
 
         Returns:
         - **JSONResponse**: Containing the genome data.
     """
-    return genome_controller.get_patient_genome_data(patient_id, rsid)
+    return genome_controller.get_patient_genome_data(patient_id, rsid, cursor, page_size, order_by)
 
 @patient_genome_router.get("/patient_genome_data/expanded")
-def get_patient_genome_data_expanded(patient_id: Optional[str] = None, rsid: Optional[str] = None):
+def get_patient_genome_data_expanded(patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), order_by: Literal['rsid', 'position'] = 'rsid', genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Retrieve expanded genome data for a patient.
 
         - **patient_id**: An optional ID of the patient whose genome data is to be retrieved.
         - **rsid**: An optional ID of the variant to filter the genome data.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+        - **order_by**: Optional; page through the records by `rsid` (patient, then variant ID; the default), or by `position` (chromosome, then position.)
+    """
+    return genome_controller.get_patient_genome_data_expanded(patient_id, rsid, cursor, page_size, order_by)
+
+@patient_genome_router.get("/region")
+def get_genome_region(chromosome: str, start: int = Query(..., ge=0), end: int = Query(..., ge=0), patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
     """
-    return genome_controller.get_patient_genome_data_expanded(patient_id, rsid)
+        Retrieve the variants in a genomic region, e.g. chromosome 6 between 31,000,000 and 33,000,000.
+
+        - **chromosome**: The chromosome, e.g. `6`, `chr6` or `X`.
+        - **start**: The first position of the region.
+        - **end**: The last position of the region (inclusive.)
+        - **patient_id**: Optional; the ID of the patient whose variants are to be retrieved (by default, every patient's.)
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+
+        Records are ordered by position, then patient and variant ID.
+    """
+    return genome_controller.get_genome_region(chromosome, start, end, patient_id, cursor, page_size)
+
+@patient_genome_router.get("/variant_annotations")
+def get_patient_variant_annotations(build: Literal['GRCh37', 'GRCh38'] = 'GRCh38', patient_id: Optional[str] = None, rsid: Optional[str] = None, source: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Retrieve patients' variants with their imported annotations (ClinVar, CIViC), joined on rsid.
+
+        - **build**: Optional; the genome build of the annotations, `GRCh37` or `GRCh38` (the default.)
+        - **patient_id**: Optional; the ID of the patient (by default, every patient.)
+        - **rsid**: Optional; the variant ID.
+        - **source**: Optional; `clinvar` or `civic`.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+
+        Records are ordered by patient, then variant ID.
+    """
+    return genome_controller.get_patient_variant_annotations(build, patient_id, rsid, source, cursor, page_size)
 
 @patient_genome_router.get("/full_report")
-def get_full_report(patient_id: Optional[str] = None, rsid: Optional[str] = None):
+def get_full_report(patient_id: Optional[str] = None, rsid: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), order_by: Literal['rsid', 'position'] = 'rsid', genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Retrieve the full report for a specific patient and variant.
 
         - **patient_id**: Optional; The ID of the patient for whom the report is to be fetched.
         - **rsid**: Optional; The ID of the variant for which the report is to be fetched.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+        - **order_by**: Optional; page through the records by `rsid` (patient, then variant ID; the default), or by `position` (chromosome, then position.)
 
         Returns:
         - **JSONResponse**: Containing the full report data.
     """
-    return genome_controller.get_full_report(patient_id, rsid)
\ No newline at end of file
+    return genome_controller.get_full_report(patient_id, rsid, cursor, page_size, order_by)
+
+@patient_genome_router.get("/risk_scores")
+def get_risk_scores(patient_id: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Retrieve the aggregate risk scores of patient reports: the number of SNP pairs their genotypes match,
+        the total and highest magnitude and the mean risk of those pairs, and the number of no-calls.
+
+        - **patient_id**: Optional; The ID of the patient whose scores are to be fetched.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+
+        A report's `status` is `pending` while it is being built; its scores are those of the last build.
+    """
+    return genome_controller.get_risk_scores(patient_id, cursor, page_size)
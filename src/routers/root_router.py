@@ -2,7 +2,7 @@ from dotenv import load_dotenv
 from typing import Any
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
-from routers import notification_router, patient_genome_router, snp_research_router
+from routers import cohort_router, notification_router, patient_genome_router, snp_research_router
 
 load_dotenv()
 
@@ -26,4 +26,5 @@ def root():
 
 root_router.include_router(snp_research_router.snp_research_router, prefix="/snp_research", tags=["snp_research"])
 root_router.include_router(patient_genome_router.patient_genome_router, prefix="/patient_genome", tags=["patient_genome"])
-root_router.include_router(notification_router.notification_router, prefix="/notification", tags=["notification"])
\ No newline at end of file
+root_router.include_router(notification_router.notification_router, prefix="/notification", tags=["notification"])
+root_router.include_router(cohort_router.cohort_router, prefix="/cohort", tags=["cohort"])
\ No newline at end of file
@@ -1,16 +1,16 @@
 from dotenv import load_dotenv
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional
 import json
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.params import Query
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel  
-from controllers.genome_controller import GenomeController
+from controllers.genome_controller import GenomeController, get_genome_controller
+from utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 load_dotenv()
 
 snp_research_router = APIRouter() 
-genome_controller = GenomeController()
 
 class RsidsPayload(BaseModel):
     rsidsList: List[str]  # Define the expected structure of the payload
@@ -22,7 +22,7 @@ def is_list_of_strings(variable) -> bool:
 
 # Data from published genome research, e.g. SNP Pairs for gene variants
 @snp_research_router.post("/")
-async def get_snp_research(payload: RsidsPayload):
+async def get_snp_research(payload: RsidsPayload, genome_controller: GenomeController = Depends(get_genome_controller)):
     """
     Retrieve SNP research data.
 
@@ -66,42 +66,92 @@ async def get_snp_research(payload: RsidsPayload):
 # E.g Body:
 # ["rs1000113", "rs1000597" ]
 @snp_research_router.get("/by-genotype")
-def get_snp_pairs_data_by_genotype(rsid: Optional[str] = None, allele1: Optional[str] = None, allele2: Optional[str] = None):
+def get_snp_pairs_data_by_genotype(rsid: Optional[str] = None, allele1: Optional[str] = None, allele2: Optional[str] = None, cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Retrieve SNP research data.
 
         - **rsid**: An optional string representing the variant ID.
         - **allele1**: An optional string representing allele1.
         - **allele2**: An optional string representing allele2.
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
 
         Returns:
         - **JSONResponse**: Containing SNP research data.
     """
-    return genome_controller.get_snp_pairs_data_by_genotype(rsid) 
+    return genome_controller.get_snp_pairs_data_by_genotype(rsid, allele1, allele2, cursor, page_size)
+
+@snp_research_router.get("/index_stats")
+def get_snp_pair_index_stats(genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Statistics of the in-memory rsid index serving SNP research lookups.
+
+        Returns:
+        - **JSONResponse**: Containing the number of records and rsids indexed, the approximate size in bytes, and the lookup and rsid hit/miss counts.
+    """
+    return genome_controller.get_snp_pair_index_stats()
+
+@snp_research_router.post("/reload_snp_pairs")
+def reload_snp_pairs(dry_run: bool = False, genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Reload the SNP pairs from the reference file (`SNP_PAIRS_FILE_PATH`), writing only what changed: each row of
+        the file is hashed and compared with the hash stored with its pair.
+
+        - **dry_run**: Optional; report the diff without applying it.
+
+        Returns:
+        - **JSONResponse**: The diff: the pairs (rsid_genotypes) inserted, updated and deleted, the number of rows
+          unchanged, and the rows rejected by validation.
+    """
+    return genome_controller.reload_snp_pairs(dry_run)
+
+# Variant annotations (ClinVar, CIViC), imported with `python src/import_variant_annotations.py`
+@snp_research_router.get("/variant_annotations")
+def get_variant_annotations(build: Literal['GRCh37', 'GRCh38'] = 'GRCh38', rsid: Optional[str] = None, source: Optional[str] = None, chromosome: Optional[str] = None, start: Optional[int] = Query(None, ge=0), end: Optional[int] = Query(None, ge=0), cursor: Optional[str] = None, page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Retrieve imported variant annotations (clinical significance, review status, condition, gene) by rsid or by region.
+
+        - **build**: Optional; the genome build of the annotations, `GRCh37` or `GRCh38` (the default.)
+        - **rsid**: Optional; the variant ID, e.g. `rs80357906`.
+        - **source**: Optional; `clinvar` or `civic`.
+        - **chromosome**, **start**, **end**: Optional; a region, e.g. chromosome 17 between 43,044,295 and 43,125,483 (inclusive.)
+        - **cursor**: Optional; the opaque cursor returned, in the `X-Next-Cursor` response header, with the previous page.
+        - **page_size**: Optional; the number of records per page (default 25, at most 1000.)
+
+        Records are ordered by position.
+    """
+    return genome_controller.get_variant_annotations(build, rsid, source, chromosome, start, end, cursor, page_size)
+
+@snp_research_router.get("/variant_annotations/counts")
+def get_variant_annotation_counts(genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Retrieve the number of variant annotations imported, by genome build and source.
+    """
+    return genome_controller.get_variant_annotation_counts()
 
 # Chromosomes
 @snp_research_router.get("/fetch_chromosomes/ensembl")
-def get_list_of_chromosomes_from_ensembl_api(): 
+async def get_list_of_chromosomes_from_ensembl_api(genome_controller: GenomeController = Depends(get_genome_controller)): 
     """
         Fetch the list of chromosomes from the Ensembl API.
 
         Returns:
         - **JSONResponse**: Containing the list of chromosomes.
     """
-    return genome_controller.get_list_of_chromosomes_from_ensembl_api()
+    return await genome_controller.get_list_of_chromosomes_from_ensembl_api()
 
 @snp_research_router.get("/fetch_chromosomes/gprofiler")
-def get_list_of_chromosomes_from_gprofiler_api(): 
+async def get_list_of_chromosomes_from_gprofiler_api(genome_controller: GenomeController = Depends(get_genome_controller)): 
     """
         Fetch the list of chromosomes from the g:Profiler API.
 
         Returns:
         - **JSONResponse**: Containing the list of chromosomes.
     """
-    return genome_controller.get_list_of_chromosomes_from_gprofiler_api()
+    return await genome_controller.get_list_of_chromosomes_from_gprofiler_api()
 
 @snp_research_router.get("/fetch_gene_by_variant")
-def get_from_gprofiler_api_gene_data_matching_variant_rsid(rsid: Optional[str] = None):
+async def get_from_gprofiler_api_gene_data_matching_variant_rsid(rsid: Optional[str] = None, genome_controller: GenomeController = Depends(get_genome_controller)):
     """
         Fetch gene data matching a variant RSID from the g:Profiler API.
 
@@ -110,4 +160,29 @@ def get_from_gprofiler_api_gene_data_matching_variant_rsid(rsid: Optional[str] =
         Returns:
         - **JSONResponse**: Containing the details of the gene matching the variant RSID.
     """
-    return genome_controller.get_from_gprofiler_api_gene_data_matching_variant_rsid(rsid) 
\ No newline at end of file
+    return await genome_controller.get_from_gprofiler_api_gene_data_matching_variant_rsid(rsid) 
+
+@snp_research_router.post("/fetch_genes_by_variants")
+async def get_genes_by_variants(payload: RsidsPayload, genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Fetch the genes of many variants at once (g:Profiler's g:SNPense), e.g. to annotate a report.
+
+        - **rsidsList**: A list of variant IDs (at most 10,000); duplicates are looked up once.
+
+        Variants looked up in the last day are answered locally, and the rest are requested upstream in batches.
+
+        Returns:
+        - **JSONResponse**: An object from each (lower case) rsid to the names of its genes; `null` for a variant g:Profiler does not know.
+    """
+    return await genome_controller.get_genes_by_variants(payload.rsidsList)
+
+@snp_research_router.get("/external_cache_stats")
+def get_response_cache_stats(genome_controller: GenomeController = Depends(get_genome_controller)):
+    """
+        Statistics of the cache of Ensembl and g:Profiler responses.
+
+        Returns:
+        - **JSONResponse**: Containing the number of entries cached (on disk, and decoded in memory), the hit, miss and eviction counts,
+          and the number of upstream errors, and of those answered with a stale response.
+    """
+    return genome_controller.get_response_cache_stats()
@@ -0,0 +1,62 @@
+import json
+import math
+from collections import namedtuple
+from fastapi.responses import Response, StreamingResponse
+
+# Rows larger than this are streamed, in batches, instead of rendered into one body.
+STREAM_THRESHOLD_ROWS = 5000
+STREAM_BATCH_ROWS = 1000
+
+# Same output as FastAPI's JSONResponse, minus the NaN check (NaN and infinity are written as
+# null, as pandas' to_json did, in `_encode_records_with_nulls`).
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+class RowSet(namedtuple('RowSet', ['columns', 'rows'])):
+    """
+        Query rows (tuples, as returned by the SQL worker) with their column names; serialized
+        straight to JSON, as a list of records, without building a DataFrame.
+    """
+
+    @property
+    def records(self):
+        return rows_to_records(self.columns, self.rows)
+
+def rows_to_records(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+def _null_if_not_finite(value):
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+def _encode_records_with_nulls(columns, rows):
+    return _encoder.encode([dict(zip(columns, map(_null_if_not_finite, row))) for row in rows])
+
+def encode_rows(columns, rows) -> str:
+    """
+        Encode `rows` as a JSON list of records, `[{column: value, ...}, ...]`, with NaN and infinity as null.
+    """
+    try:
+        return _encoder.encode(rows_to_records(columns, rows))
+    except ValueError:
+        # Only NaN / infinity are rejected by the encoder: rare, so checked on this path only.
+        return _encode_records_with_nulls(columns, rows)
+
+def rows_to_json(columns, rows) -> bytes:
+    return encode_rows(columns, rows).encode('utf-8')
+
+def iter_rows_json(columns, rows, batch_rows=STREAM_BATCH_ROWS):
+    """
+        Yield `rows` as the bytes of one JSON list of records, `batch_rows` rows at a time.
+    """
+    yield b'['
+    for start in range(0, len(rows), batch_rows):
+        batch = encode_rows(columns, rows[start:start + batch_rows])[1:-1]
+        yield (',' + batch if start else batch).encode('utf-8')
+    yield b']'
+
+def rows_response(row_set, headers=None):
+    """
+        JSON response for a `RowSet` (or `Page`): rendered into one body, or streamed when large.
+    """
+    if len(row_set.rows) > STREAM_THRESHOLD_ROWS:
+        return StreamingResponse(iter_rows_json(row_set.columns, row_set.rows), media_type='application/json', headers=headers)
+    return Response(content=rows_to_json(row_set.columns, row_set.rows), media_type='application/json', headers=headers)
@@ -0,0 +1,214 @@
+import gzip
+import io
+import itertools
+import os
+import zipfile
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+import numpy as np
+import pandas as pd
+
+GENOME_COLUMNS = ["rsid", "chromosome", "position", "genotype"]
+# Lines read ahead to recognize the format; VCF and 23andMe headers run to a few dozen lines.
+SNIFF_LINES = 500
+GZIP_MAGIC = b"\x1f\x8b"
+ZIP_MAGIC = b"PK\x03\x04"
+MISSING_GENOTYPE = "--"
+
+class GenomeFormat(ABC):
+    """
+        A genome file layout. `parse_batch` parses a batch of its data lines (bytes) into the
+        rows every format is normalized to: GENOME_COLUMNS, as strings, the genotype as
+        23andMe writes it (e.g. "AG", "A" on a haploid chromosome, "--" when not called.)
+        Lines starting with "#", and those `is_header` recognizes, are not data.
+    """
+    name = None
+
+    def is_header(self, line):
+        return False
+
+    @abstractmethod
+    def parse_batch(self, data):
+        pass
+
+class TwentyThreeAndMe(GenomeFormat):
+    # rsid, chromosome, position, genotype; tab-separated, after "#" comments.
+    name = "23andme"
+
+    def parse_batch(self, data):
+        return pd.read_csv(io.BytesIO(data), sep="\t", header=None, names=GENOME_COLUMNS, dtype=str, na_filter=False)
+
+class AncestryDna(GenomeFormat):
+    # rsid, chromosome, position, allele1, allele2; tab-separated, with a header line. Chromosomes
+    # are numbered (23 X, 24 Y, 25 the pseudoautosomal region, 26 MT) and "0" is a no call.
+    name = "ancestrydna"
+    CHROMOSOMES = {"23": "X", "24": "Y", "25": "XY", "26": "MT"}
+
+    def is_header(self, line):
+        return line[:4].lower() == b"rsid"
+
+    def parse_batch(self, data):
+        frame = pd.read_csv(io.BytesIO(data), sep="\t", header=None, names=["rsid", "chromosome", "position", "allele1", "allele2"], dtype=str, na_filter=False)
+        genotype = frame["allele1"] + frame["allele2"]
+        no_call = (frame["allele1"] == "0") | (frame["allele2"] == "0")
+        return pd.DataFrame({
+            "rsid": frame["rsid"],
+            "chromosome": frame["chromosome"].replace(self.CHROMOSOMES),
+            "position": frame["position"],
+            "genotype": genotype.mask(no_call, MISSING_GENOTYPE),
+        })
+
+class MyHeritageCsv(GenomeFormat):
+    # "RSID","CHROMOSOME","POSITION","RESULT"; comma-separated and quoted. MyHeritage and
+    # FamilyTreeDNA both export it (MyHeritage after "#" comments.)
+    name = "myheritage"
+
+    def is_header(self, line):
+        return line.lstrip(b'"')[:4].lower() == b"rsid"
+
+    def parse_batch(self, data):
+        return pd.read_csv(io.BytesIO(data), sep=",", quotechar='"', header=None, names=GENOME_COLUMNS, dtype=str, na_filter=False)
+
+class Vcf(GenomeFormat):
+    # VCF 4.x: CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO, FORMAT, then a column per sample;
+    # the genotype is the GT of the first sample, its allele indices turned into bases.
+    name = "vcf"
+    COLUMNS = ["chromosome", "position", "rsid", "ref", "alt", "qual", "filter", "info", "format", "sample"]
+
+    def parse_batch(self, data):
+        frame = pd.read_csv(io.BytesIO(data), sep="\t", header=None, names=self.COLUMNS, usecols=[0, 1, 2, 3, 4, 8, 9],
+                            dtype=str, na_filter=False, quoting=3)
+        rsid = frame["rsid"]
+        if rsid.str.contains(";", regex=False).any():
+            rsid = rsid.str.partition(";")[0]
+        return pd.DataFrame({
+            "rsid": rsid.mask(rsid == ".", ""),
+            "chromosome": map_distinct(vcf_chromosome, frame["chromosome"]),
+            "position": frame["position"],
+            "genotype": map_distinct(vcf_genotype, frame["ref"], frame["alt"], map_distinct(vcf_gt, frame["format"], frame["sample"])),
+        })
+
+def map_distinct(function, *columns):
+    """
+        `function` applied row by row to `columns`, but called once per distinct combination
+        of values: genome files repeat few chromosomes, alleles and genotype calls.
+    """
+    if len(columns) == 1:
+        codes, uniques = pd.factorize(columns[0])
+        values = [function(value) for value in uniques]
+    else:
+        codes, uniques = pd.MultiIndex.from_arrays(columns).factorize()
+        values = [function(*value) for value in uniques]
+    return pd.Series(np.array(values + [None], dtype=object)[codes], index=columns[0].index)
+
+def vcf_chromosome(chromosome):
+    chromosome = chromosome[3:] if chromosome[:3].lower() == "chr" else chromosome
+    return "MT" if chromosome.upper() == "M" else chromosome
+
+def vcf_gt(format_keys, sample):
+    # The GT value of a sample column; GT comes first in FORMAT in practice (the spec requires it.)
+    if format_keys.startswith("GT"):
+        return sample.partition(":")[0]
+    keys = format_keys.split(":")
+    values = sample.split(":")
+    return values[keys.index("GT")] if "GT" in keys and keys.index("GT") < len(values) else "."
+
+def vcf_genotype(ref, alt, gt):
+    """
+        The genotype of a VCF call: "AG" for a GT of 0/1 with REF A and ALT G, "A" for a
+        haploid call, "--" for a missing call.
+    """
+    alleles = [ref] + alt.split(",")
+    bases = []
+    for index in gt.replace("|", "/").split("/"):
+        if not index.isdigit() or int(index) >= len(alleles) or alleles[int(index)] in (".", ""):
+            return MISSING_GENOTYPE
+        bases.append(alleles[int(index)])
+    return "".join(bases)
+
+GENOME_FORMATS = {genome_format.name: genome_format for genome_format in [TwentyThreeAndMe(), AncestryDna(), MyHeritageCsv(), Vcf()]}
+
+def sniff_genome_format(head_lines):
+    """
+        The format of a genome file from its first lines (bytes), read up to the first that
+        tells; ValueError if it is none of GENOME_FORMATS.
+    """
+    for line in head_lines:
+        if line.startswith(b"##fileformat=VCF") or line.startswith(b"#CHROM"):
+            return GENOME_FORMATS["vcf"]
+        if line.startswith(b"#") or not line.strip():
+            continue
+        header = line.strip().replace(b'"', b"").lower()
+        if header.startswith(b"rsid,chromosome,position,result"):
+            return GENOME_FORMATS["myheritage"]
+        if header.startswith(b"rsid\tchromosome\tposition\tallele1\tallele2"):
+            return GENOME_FORMATS["ancestrydna"]
+        # No header line: told apart by the data.
+        if line.count(b"\t") == 3:
+            return GENOME_FORMATS["23andme"]
+        if line.count(b"\t") == 4:
+            return GENOME_FORMATS["ancestrydna"]
+        if line.count(b",") == 3:
+            return GENOME_FORMATS["myheritage"]
+        raise ValueError("Unrecognized genome file format: expected 23andMe, AncestryDNA, MyHeritage/FamilyTreeDNA CSV or VCF.")
+    # Comments only (e.g. a 23andMe header without data): imported as an empty 23andMe file.
+    return GENOME_FORMATS["23andme"]
+
+def decompressed(source, stack):
+    """
+        `source` (a binary file object) decompressed if it is gzip or zip (its first file);
+        files opened to read it are closed with `stack`.
+    """
+    magic = peek(source, 4)
+    if magic.startswith(GZIP_MAGIC):
+        return stack.enter_context(gzip.GzipFile(fileobj=source))
+    if magic.startswith(ZIP_MAGIC):
+        if not source.seekable():
+            raise ValueError("A zipped genome file can only be read from a seekable file.")
+        archive = stack.enter_context(zipfile.ZipFile(source))
+        members = [member for member in archive.infolist() if not member.is_dir() and not member.filename.startswith("__MACOSX/")]
+        if not members:
+            raise ValueError("The zip archive holds no genome file.")
+        return stack.enter_context(archive.open(members[0]))
+    return source
+
+def peek(source, size):
+    if hasattr(source, "peek"):
+        return source.peek(size)[:size]
+    position = source.tell()
+    data = source.read(size)
+    source.seek(position)
+    return data
+
+def bounded_lines(source, max_line_bytes):
+    # The lines of `source`, refusing one longer than `max_line_bytes` (not a genome file, or
+    # a decompression bomb) before it is all in memory.
+    for line in iter(lambda: source.readline(max_line_bytes + 1), b""):
+        if len(line) > max_line_bytes:
+            raise ValueError(f"A line of the genome file is longer than {max_line_bytes} bytes.")
+        yield line
+
+@contextmanager
+def open_genome_file(source, max_line_bytes=None):
+    """
+        (format, lines) of a genome file: `source` is a path, a binary file object (either
+        possibly gzip or zip compressed) or an iterable of byte lines. The format is sniffed
+        from the first lines, which stay at the head of `lines`. With `max_line_bytes`, the
+        lines of a file are read at most that long.
+    """
+    with ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            source = stack.enter_context(open(source, "rb"))
+        if hasattr(source, "read"):
+            source = decompressed(source, stack)
+            if max_line_bytes:
+                source = bounded_lines(source, max_line_bytes)
+        lines = iter(source)
+        head = []
+        def read_ahead():
+            # Only as far as the sniffing needs: an upload's lines are read as they arrive.
+            for line in itertools.islice(lines, SNIFF_LINES):
+                head.append(line)
+                yield line
+        genome_format = sniff_genome_format(read_ahead())
+        yield genome_format, itertools.chain(head, lines)
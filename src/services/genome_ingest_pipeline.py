@@ -0,0 +1,184 @@
+import itertools
+import re
+import time
+from collections import namedtuple
+import pandas as pd
+from models import ImportSummary, Patient
+from repositories.patient_genome_repository import MAX_REPORTED_REJECTIONS, validate_patient_genome_df
+from services.genome_formats import GENOME_COLUMNS, GENOME_FORMATS, map_distinct, open_genome_file
+
+DEFAULT_CHUNK_ROWS = 50000
+BLANK_LINE = re.compile(rb"\n[ \t\r]*\n")
+
+# A slice of the genome file: the parsed rows, and the size of the source lines they came from.
+GenomeChunk = namedtuple("GenomeChunk", ["frame", "nbytes"])
+
+class GenomeTooLarge(ValueError):
+    pass
+
+def skipped_line(line, genome_format):
+    return line.startswith(b"#") or not line.strip() or genome_format.is_header(line)
+
+def normalized_code(value):
+    return value.strip().upper()
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.chunks = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "chunks": self.chunks,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "rows_per_second": round(self.rows_out / self.seconds) if self.seconds else None,
+        }
+
+class GenomeIngestPipeline:
+    """
+        Streaming genome ingest: parse -> normalize -> validate -> write.
+
+        Each stage is a generator over fixed-size chunks, so only `chunk_rows`
+        rows (per stage) are held in memory whatever the size of the file.
+        Per-stage row, byte and timing counters are kept in `stats`, and `progress`
+        (if given) is called with the number of rows read so far after each chunk is written.
+        A file of more than `max_rows` rows is refused (GenomeTooLarge), as is one with a line
+        longer than `max_line_bytes` (ValueError.) All rejected rows are counted; the first
+        `max_rejections` are kept, to be reported.
+    """
+
+    def __init__(self, genome_db_manager, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, max_rows=None, max_line_bytes=None,
+                 max_rejections=MAX_REPORTED_REJECTIONS):
+        self.genome_db_manager = genome_db_manager
+        self.chunk_rows = chunk_rows
+        self.progress = progress
+        self.max_rows = max_rows
+        self.max_line_bytes = max_line_bytes
+        self.stats = {name: StageStats(name) for name in ["parse", "normalize", "validate", "write"]}
+        self.max_rejections = max_rejections
+        self.rejections = []
+        self.rejected_rows = 0
+        self.genome_format = None
+
+    def run(self, source, patient: Patient) -> ImportSummary:
+        """
+            Ingest `source` (a path, or a binary file object / iterable of byte lines) for `patient`.
+            The file may be any of the genome formats (see `genome_formats`), gzip or zip compressed.
+        """
+        with open_genome_file(source, self.max_line_bytes) as (genome_format, lines):
+            self.genome_format = genome_format
+            chunks = self.validate(self.normalize(self.parse(lines, genome_format)))
+            summary = self.genome_db_manager.ingest_patient_genome(patient, self.write(chunks), validate=False)
+        summary.total_rows = self.stats["parse"].rows_out
+        summary.rejected_rows = self.rejected_rows
+        summary.rejections = self.rejections
+        return summary
+
+    def stats_as_dicts(self):
+        return [stage.as_dict() for stage in self.stats.values()]
+
+    def _timed(self, stage_name, chunks, transform):
+        stats = self.stats[stage_name]
+        for chunk in chunks:
+            started = time.perf_counter()
+            result = transform(chunk)
+            stats.seconds += time.perf_counter() - started
+            stats.chunks += 1
+            stats.rows_in += len(chunk.frame)
+            stats.rows_out += len(result.frame)
+            stats.bytes += chunk.nbytes
+            if self.progress is not None:
+                self.progress(self.stats["parse"].rows_out)
+            yield result
+
+    # Stages
+
+    def parse(self, lines, genome_format=None):
+        genome_format = genome_format or GENOME_FORMATS["23andme"]
+        stats = self.stats["parse"]
+        lines = iter(lines)
+        nbytes = 0
+        started = time.perf_counter()
+        # The comment and header lines, up to the first data line, are skipped line by line; the
+        # data lines are then taken a chunk at a time, and only checked line by line if the
+        # joined chunk holds a comment, a blank line or an unterminated line.
+        batch = []
+        for line in lines:
+            if not skipped_line(line, genome_format):
+                batch = [line]
+                break
+            nbytes += len(line)
+        while True:
+            batch.extend(itertools.islice(lines, self.chunk_rows - len(batch)))
+            if not batch:
+                break
+            if self.max_rows is not None and stats.rows_in + len(batch) > self.max_rows:
+                raise GenomeTooLarge(f"The genome file has more than {self.max_rows} rows.")
+            data = b"".join(batch)
+            nbytes += len(data)
+            if data.count(b"\n") != len(batch) or data.startswith(b"#") or b"\n#" in data or BLANK_LINE.search(data) or not batch[0].strip():
+                batch = [line if line.endswith(b"\n") else line + b"\n" for line in batch if not skipped_line(line, genome_format)]
+                data = b"".join(batch)
+            yield self._parsed_chunk(stats, genome_format, data, len(batch), nbytes, started)
+            batch, nbytes = [], 0
+            started = time.perf_counter()
+        if nbytes:
+            yield self._parsed_chunk(stats, genome_format, b"", 0, nbytes, started)
+
+    def _parsed_chunk(self, stats, genome_format, data, rows, nbytes, started):
+        if data:
+            frame = genome_format.parse_batch(data)
+        else:
+            frame = pd.DataFrame(columns=GENOME_COLUMNS)
+        stats.seconds += time.perf_counter() - started
+        stats.chunks += 1
+        stats.rows_in += rows
+        stats.rows_out += len(frame)
+        stats.bytes += nbytes
+        return GenomeChunk(frame, nbytes)
+
+    def normalize(self, chunks):
+        def normalize_chunk(chunk):
+            frame = chunk.frame
+            frame = pd.DataFrame({
+                "rsid": frame["rsid"].str.strip().str.lower(),
+                "chromosome": map_distinct(normalized_code, frame["chromosome"]),
+                "position": pd.to_numeric(frame["position"].str.strip(), errors="coerce"),
+                "genotype": map_distinct(normalized_code, frame["genotype"]),
+            })
+            return GenomeChunk(frame, chunk.nbytes)
+        return self._timed("normalize", chunks, normalize_chunk)
+
+    def validate(self, chunks):
+        first_row = 0
+        def validate_chunk(chunk):
+            nonlocal first_row
+            valid_df, rejections = validate_patient_genome_df(chunk.frame, first_row=first_row)
+            first_row += len(chunk.frame)
+            self.rejected_rows += len(rejections)
+            self.rejections.extend(rejections[:self.max_rejections - len(self.rejections)])
+            return GenomeChunk(valid_df, chunk.nbytes)
+        return self._timed("validate", chunks, validate_chunk)
+
+    def write(self, chunks):
+        # Pulled by the repository's ingest, which stages each frame in its own transaction;
+        # the timing covers the time spent on each chunk between pulls from the upstream stages.
+        stats = self.stats["write"]
+        for chunk in chunks:
+            started = time.perf_counter()
+            yield chunk.frame
+            stats.seconds += time.perf_counter() - started
+            stats.chunks += 1
+            stats.rows_in += len(chunk.frame)
+            stats.rows_out += len(chunk.frame)
+            stats.bytes += chunk.nbytes
+            if self.progress is not None:
+                self.progress(self.stats["parse"].rows_out)
@@ -1,36 +1,105 @@
 import logging
 import os
+import threading
 from dotenv import load_dotenv
-import asyncio
-import sys
 from typing import Optional
-import requests
 import uuid 
 import pandas as pd
-from gprofiler import GProfiler
-from utils import load_file, check_if_default
+from utils import load_file, check_if_default, file_content_hash
 from data_layer.genome_db_manager import GenomeDatabaseManager
-from services.notification_service import NotificationService
+from data_layer.external_http_client import ExternalHttpClient
+from data_layer.response_cache import ResponseCache, response_cache_path
+from genotype_matching import match_patient
+from models import Patient, SnpPairsDiff
+from repositories.variant_annotation_repository import BUILD_TABLES
+from serialization import RowSet
+from services.genome_ingest_pipeline import GenomeIngestPipeline
+from services.variant_gene_resolver import VariantGeneResolver
 
 load_dotenv()
 
+ENSEMBL_URL = "https://grch37.rest.ensembl.org"
+GPROFILER_URL = "https://biit.cs.ut.ee/gprofiler"
+# The fields of the g:Profiler results kept (as the gprofiler-official client keeps them.)
+GPROFILER_CONVERT_FIELDS = {'incoming', 'converted', 'n_incoming', 'n_converted', 'name', 'description', 'namespaces', 'query'}
+GPROFILER_SNPENSE_FIELDS = {'rs_id', 'chromosome', 'strand', 'start', 'end', 'ensgs', 'gene_names', 'variants'}
+# How long external-source responses are served from the response cache: assemblies and gene
+# lists change with releases (months apart), variant annotations more often.
+CHROMOSOMES_TTL_SECONDS = 7 * 24 * 3600
+GENE_DATA_TTL_SECONDS = 24 * 3600
+MAX_VARIANTS_PER_GENE_LOOKUP = 10000
+# The longest line of an uploaded genome file: VCF lines with long INFO fields stay well below.
+MAX_UPLOAD_LINE_BYTES = 1 << 20
+
 def load_data(filename_with_path, names, straight=False):
     if(filename_with_path is not None):
         return load_file(filename_with_path, names, straight)
     else:
         return pd.DataFrame()
+
+def extract_genotype_info(df):
+    df['RSID'] = df['RSID_Genotypes'].str.extract(r'(Rs\d+)\(')
+    df['Allele1'] = df['RSID_Genotypes'].str.extract(r'\(([^;]+)')
+    df['Allele2'] = df['RSID_Genotypes'].str.extract(r';([^)]+)\)')
+    return df
+
+# The columns of a SNP pairs file; a row's content hash is taken over them, as read.
+SNP_PAIRS_SOURCE_COLUMNS = ['RSID_Genotypes', 'Magnitude', 'Risk', 'Notes']
+
+def snp_pair_row_hashes(source_df):
+    """
+        A 64-bit content hash (in hex) of each row of a SNP pairs file.
+    """
+    return pd.util.hash_pandas_object(source_df[SNP_PAIRS_SOURCE_COLUMNS], index=False).map('{:016x}'.format)
+
+def read_snp_pairs_source(snp_pairs_file_name_with_path):
+    """
+        The SNP pair rows of a reference file as read, before their rsid and alleles are
+        extracted, with the content hash of each row (`row_hash`.)
+    """
+    # Read as text, so a row's hash does not depend on the types inferred for the whole file.
+    snp_df = pd.read_csv(snp_pairs_file_name_with_path, dtype=str, low_memory=False)
+    pattern = 'Rs'
+    mask = snp_df['RSID_Genotypes'].str.startswith(pattern)
+    snp_df = snp_df[mask].copy()
+    snp_df['row_hash'] = snp_pair_row_hashes(snp_df)
+    return snp_df
+
+def snp_pairs_from_source(source_df):
+    index_column_name = 'rsid' 
+    snp_df = extract_genotype_info(source_df[SNP_PAIRS_SOURCE_COLUMNS].copy())
+    new_cols = ['rsid_genotypes', 'magnitude', 'risk', 'notes', 'rsid', 'allele1', 'allele2']
+    snp_df.columns = new_cols
+    snp_df[index_column_name] = snp_df[index_column_name].map(lambda x : x.lower())
+    snp_df['row_hash'] = source_df['row_hash']
+    return snp_df
+
+def read_snp_pairs_file(snp_pairs_file_name_with_path):
+    return snp_pairs_from_source(read_snp_pairs_source(snp_pairs_file_name_with_path))
     
 class GenomeService:
     default_genome_file_name_with_path = None
     genome_db_manager = None
-    snp_pairs_df = pd.DataFrame() | None
-    patient_genome_df = pd.DataFrame() | None
+    snp_pairs_source = 'snp_pairs'
 
-    def __init__(self):
+    def __init__(self, genome_db_manager: Optional[GenomeDatabaseManager] = None):
         self.default_genome_file_name_with_path = os.getenv('GENOME_FILE_PATH')
-        self.genome_db_manager = GenomeDatabaseManager(db_path=os.getenv('SQLITE_DATABASE_PATH')) 
-        snp_pairs_file_name_with_path=os.getenv('SNP_PAIRS_FILE_PATH')
-        self.snp_pairs_df = self.load_snp_pairs_df(snp_pairs_file_name_with_path)
+        self.genome_db_manager = genome_db_manager or GenomeDatabaseManager(db_path=os.getenv('SQLITE_DATABASE_PATH')) 
+        self.ensembl_url = os.getenv('ENSEMBL_URL') or ENSEMBL_URL
+        self.gprofiler_url = os.getenv('GPROFILER_URL') or GPROFILER_URL
+        self.http_client = ExternalHttpClient()
+        self.response_cache = ResponseCache(response_cache_path(os.getenv('SQLITE_DATABASE_PATH')))
+        self.variant_gene_resolver = VariantGeneResolver(self.response_cache, self._request_gprofiler_snpense, GENE_DATA_TTL_SECONDS)
+        self.snp_pairs_file_name_with_path = os.getenv('SNP_PAIRS_FILE_PATH')
+        self._snp_pairs_reload_lock = threading.Lock()
+        self.load_snp_pairs_df(self.snp_pairs_file_name_with_path)
+
+    def close(self):
+        self.genome_db_manager.close_connection()
+        self.response_cache.close()
+
+    async def aclose(self):
+        await self.http_client.aclose()
  
     def _generate_error_message(self, column_name, kwargs):
         error_message = f"No data found for {column_name}."
@@ -51,63 +120,99 @@ class GenomeService:
         else:
             raise TypeError(f"No {key_to_find} data loaded.")
         
-    def load_genome_background(self, genome_file_name_with_path: Optional[str] = None):
-        if genome_file_name_with_path is None: genome_file_name_with_path = "default"
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        future = loop.run_in_executor(None, self.genome_browser.load_genome, genome_file_name_with_path)
-        loop.run_until_complete(future)
-        notification_service = NotificationService()
-        loop.run_until_complete(notification_service.notify_ui(genome_file_name_with_path, self.genome_browser.patient_genome_df.size))
-        loop.close() 
-
     # Genome Data from Published Literature
 
-    def fetch_chromosomes_from_ensembl(self):
-        server = "https://grch37.rest.ensembl.org"
+    async def fetch_chromosomes_from_ensembl(self):
+        return await self.response_cache.get_or_fetch_async(f"ensembl:assembly:{self.ensembl_url}", self._request_ensembl_assembly, CHROMOSOMES_TTL_SECONDS)
+
+    async def _request_ensembl_assembly(self):
         ext = "/info/assembly/homo_sapiens?"
-        r = requests.get(server+ext, headers={ "Content-Type" : "application/json"})
-        if not r.ok:
-            r.raise_for_status()
-            sys.exit()
-        decoded = r.json()
+        decoded = await self.http_client.get_json(self.ensembl_url+ext, headers={ "Content-Type" : "application/json"})
         return repr(decoded)
 
-    def fetch_chromosomes_from_gprofiler(self):
+    async def _request_gprofiler(self, tool, body, fields):
+        decoded = await self.http_client.post_json(f"{self.gprofiler_url}/api/{tool}/{tool}", body)
+        return [{k: v for k, v in result.items() if k in fields} for result in decoded['result']]
+
+    async def _request_gprofiler_snpense(self, rsids):
+        return await self._request_gprofiler('snpense', {'query': rsids, 'output': 'json+'}, GPROFILER_SNPENSE_FIELDS)
+
+    async def fetch_chromosomes_from_gprofiler(self):
         organism = 'hsapiens'
-        gp = GProfiler(return_dataframe=True)
-        data = gp.convert(organism=organism, query='*')
-        return data
+        body = {'organism': organism, 'query': '*', 'target': 'ENSG', 'numeric_ns': 'ENTREZGENE', 'output': 'json'}
+        return await self.response_cache.get_or_fetch_async(f"gprofiler:convert:{organism}:*", lambda: self._request_gprofiler('convert', body, GPROFILER_CONVERT_FIELDS), CHROMOSOMES_TTL_SECONDS)
 
-    def fetch_gene_data_by_variant(self, rsid: Optional[str] = None):
+    async def fetch_gene_data_by_variant(self, rsid: Optional[str] = None):
         if rsid == None: rsid = "rs11734132"
-        gp = GProfiler(return_dataframe=True)
-        data = gp.snpense(query=[rsid])
-        return data['gene_names'] 
+        gene_names = next(iter((await self.variant_gene_resolver.resolve([rsid])).values()), None)
+        return [gene_names] if gene_names is not None else []
+
+    async def fetch_genes_by_variants(self, rsids):
+        """
+            The gene names of each of `rsids` (None for a variant g:SNPense does not know), keyed
+            by the canonical (lower case) rsid; duplicates are looked up once.
+        """
+        if len(rsids) > MAX_VARIANTS_PER_GENE_LOOKUP:
+            raise ValueError(f"Too many rsids: at most {MAX_VARIANTS_PER_GENE_LOOKUP} per request.")
+        return await self.variant_gene_resolver.resolve(rsids)
+
+    def fetch_response_cache_stats(self):
+        return {**self.response_cache.stats(), "variant_genes": self.variant_gene_resolver.stats(), "http": self.http_client.stats()}
     
     def _extract_genotype_info(self, df):
-        df['RSID'] = df['RSID_Genotypes'].str.extract(r'(Rs\d+)\(')
-        df['Allele1'] = df['RSID_Genotypes'].str.extract(r'\(([^;]+)')
-        df['Allele2'] = df['RSID_Genotypes'].str.extract(r';([^)]+)\)')
-        return df
+        return extract_genotype_info(df)
     
     # SNP Pairs data
 
     def load_snp_pairs_df(self, snp_pairs_file_name_with_path):
-        index_column_name = 'rsid' 
-        snp_df = load_data(snp_pairs_file_name_with_path, names=None, straight=True)
-        pattern = 'Rs'
-        mask = snp_df['RSID_Genotypes'].str.startswith(pattern)
-        snp_df = snp_df[mask]
-        snp_df = self._extract_genotype_info(snp_df)
-        new_cols = ['rsid_genotypes', 'magnitude', 'risk', 'notes', 'rsid', 'allele1', 'allele2']
-        snp_df.columns = new_cols
-        snp_df[index_column_name] = snp_df[index_column_name].map(lambda x : x.lower())
-        if snp_df is not None and self.genome_db_manager is not None:
-            self.genome_db_manager.save_snp_pairs_to_db(snp_df) 
-            self.snp_pairs_df = snp_df
-        else:
+        if snp_pairs_file_name_with_path is None or self.genome_db_manager is None:
+            raise TypeError("No SNP data loaded.")
+        # Skip the import when the database already holds this exact reference file.
+        content_hash = file_content_hash(snp_pairs_file_name_with_path)
+        if content_hash == self.genome_db_manager.fetch_reference_hash(self.snp_pairs_source) and self.genome_db_manager.count_snp_pairs() > 0:
+            logging.info(f"SNP pairs unchanged ({content_hash[:12]}); import skipped")
+            return None
+        return self.reload_snp_pairs(snp_pairs_file_name_with_path)
+
+    def reload_snp_pairs(self, snp_pairs_file_name_with_path=None, dry_run=False):
+        """
+            Bring the SNP pairs in line with the reference file (by default, the one loaded at
+            start), writing only the rows whose content hash differs from the stored one, and
+            deleting the pairs no longer in the file. Returns the diff (a SnpPairsDiff); with
+            `dry_run`, only the diff.
+        """
+        snp_pairs_file_name_with_path = snp_pairs_file_name_with_path or self.snp_pairs_file_name_with_path
+        if snp_pairs_file_name_with_path is None or self.genome_db_manager is None:
             raise TypeError("No SNP data loaded.")
+        with self._snp_pairs_reload_lock:
+            content_hash = file_content_hash(snp_pairs_file_name_with_path)
+            source_df = read_snp_pairs_source(snp_pairs_file_name_with_path)
+            total_rows = len(source_df)
+            # A pair listed twice is written once, as its last row (as the upsert would leave it.)
+            source_df = source_df.drop_duplicates('RSID_Genotypes', keep='last')
+            stored_hashes = self.genome_db_manager.fetch_snp_pair_hashes()
+            keys = source_df['RSID_Genotypes']
+            stored = keys.isin(stored_hashes.keys())
+            changed = ~stored | (keys.map(stored_hashes) != source_df['row_hash'])
+            deleted = sorted(stored_hashes.keys() - set(keys))
+            changed_df = source_df[changed]
+            diff = SnpPairsDiff(total_rows=total_rows, inserted=changed_df.loc[~stored[changed], 'RSID_Genotypes'].tolist(),
+                                updated=changed_df.loc[stored[changed], 'RSID_Genotypes'].tolist(), deleted=deleted,
+                                unchanged_rows=int((~changed).sum()), dry_run=dry_run)
+            if dry_run:
+                return diff
+            if len(changed_df):
+                import_summary = self.genome_db_manager.save_snp_pairs_to_db(snp_pairs_from_source(changed_df))
+                rejected = {rejection.key for rejection in import_summary.rejections}
+                diff.inserted = [key for key in diff.inserted if key not in rejected]
+                diff.updated = [key for key in diff.updated if key not in rejected]
+                diff.rejected_rows, diff.rejections = import_summary.rejected_rows, import_summary.rejections
+            if deleted:
+                self.genome_db_manager.delete_snp_pairs(deleted)
+            self.genome_db_manager.save_reference_hash(self.snp_pairs_source, content_hash)
+        logging.info(f"SNP pairs reloaded: {len(diff.inserted)} inserted, {len(diff.updated)} updated, {len(diff.deleted)} deleted, "
+                     f"{diff.unchanged_rows} unchanged ({diff.rejected_rows} rejected)")
+        return diff
     
     def fetch_all_snp_pairs(self, **kwargs):  
         column_name = 'rsid'
@@ -119,6 +224,9 @@ class GenomeService:
         else:
             self._generate_error_message(column_name, kwargs) 
 
+    def fetch_snp_pair_index_stats(self):
+        return self.genome_db_manager.snp_pair_index_stats()
+
     def fetch_snp_pairs_data_by_genotype(self, **kwargs): 
         column_name = 'rsid'  
         if 'offset' not in kwargs: kwargs['offset'] = 0
@@ -133,13 +241,37 @@ class GenomeService:
         
     # Patient Genome: /patient 
 
-    def load_genome(self, genome_file_name_with_path: str):
+    def load_genome(self, genome_file_name_with_path: str, job=None):
+        """
+            Ingest a genome file as a new patient, and materialize their report. `job` (an
+            IngestJob, when run by the ingest scheduler) is given the patient ID and the progress.
+        """
         if(genome_file_name_with_path == "default"):
             genome_file_name_with_path = self.default_genome_file_name_with_path
-        self.patient_genome_df = load_data(genome_file_name_with_path, names=["rsid", "chromosome", "position", "genotype"])
-        if self.patient_genome_df is not None and self.genome_db_manager is not None:
-            self.genome_db_manager.update_patient_and_genome_data(self.patient_genome_df, str(uuid.uuid4()), genome_file_name_with_path)
-        return self.patient_genome_df.size
+        if genome_file_name_with_path is None or self.genome_db_manager is None:
+            raise TypeError("No genome data loaded.")
+        return self._ingest_genome(genome_file_name_with_path, genome_file_name_with_path, job)
+
+    def load_genome_upload(self, stream, file_name: str, job=None, max_rows=None):
+        """
+            `load_genome` for an uploaded genome file, `stream` (a binary file object) read as it
+            arrives; files of more than `max_rows` rows are refused (GenomeTooLarge.)
+        """
+        return self._ingest_genome(stream, file_name, job, max_rows=max_rows, max_line_bytes=MAX_UPLOAD_LINE_BYTES)
+
+    def _ingest_genome(self, source, patient_name, job, **limits):
+        patient = Patient(patient_id=str(uuid.uuid4()), patient_name=patient_name)
+        if job is not None:
+            job.patient_id = patient.patient_id
+        pipeline = GenomeIngestPipeline(self.genome_db_manager, progress=job.report_progress if job is not None else None, **limits)
+        import_summary = pipeline.run(source, patient)
+        logging.info(f"Genome {patient_name} ({pipeline.genome_format.name}) loaded: {import_summary.imported_rows} of {import_summary.total_rows} rows ({import_summary.rejected_rows} rejected); stages: {pipeline.stats_as_dicts()}")
+        report_rows = self.genome_db_manager.materialize_patient_report(patient.patient_id)
+        logging.info(f"Report of patient {patient.patient_id} materialized: {report_rows} rows")
+        return import_summary.imported_rows
+
+    def load_genome_job(self, job):
+        return self.load_genome(job.source or "default", job=job)
 
     # Individual Patient Profiles 
 
@@ -176,6 +308,21 @@ class GenomeService:
         else:
             self._generate_error_message(column_name, kwargs) 
 
+    # Patient Variants in a Genomic Region
+
+    def fetch_genome_region(self, chromosome: str, start: int, end: int, **kwargs):
+        """
+            The variants on `chromosome` (e.g. '6' or 'chr6') between positions `start` and `end`,
+            inclusive, of one patient or of every patient.
+        """
+        if start > end:
+            raise ValueError(f"Invalid region: start {start} is after end {end}.")
+        chromosome = str(chromosome).strip()
+        if chromosome.lower().startswith('chr'):
+            chromosome = chromosome[3:]
+        if 'offset' not in kwargs: kwargs['offset'] = 0
+        return self.genome_db_manager.fetch_genome_region(chromosome=chromosome.upper(), start=start, end=end, **kwargs)
+
     # Patient Data plus SNP Matches
 
     def fetch_full_report(self, **kwargs): 
@@ -187,3 +334,56 @@ class GenomeService:
             return patient_data_as_list
         else:
             self._generate_error_message(column_name, kwargs)
+
+    def fetch_patient_report_summary(self, **kwargs):
+        if 'offset' not in kwargs: kwargs['offset'] = 0
+        return self.genome_db_manager.fetch_patient_report_summary(**kwargs)
+
+    # Cohort analytics
+
+    def fetch_cohort_allele_frequencies(self, rsids):
+        if not rsids:
+            raise ValueError("At least one rsid is required.")
+        return self.genome_db_manager.fetch_cohort_allele_frequencies([check_if_default(rsid) for rsid in rsids])
+
+    def fetch_cohort_snp_pair_prevalence(self, rsids=None, limit=None):
+        """
+            SNP pairs by their prevalence in the cohort, most prevalent first (a RowSet.)
+        """
+        prevalence_df = self.genome_db_manager.fetch_cohort_snp_pair_prevalence([check_if_default(rsid) for rsid in rsids] if rsids else None)
+        if limit is not None:
+            prevalence_df = prevalence_df.head(limit)
+        return RowSet(list(prevalence_df.columns), list(prevalence_df.astype(object).itertuples(index=False, name=None)))
+
+    def fetch_cohort_matrix_stats(self):
+        return self.genome_db_manager.cohort_matrix_stats()
+
+    # Variant annotations (ClinVar, CIViC; see variant_vcf_import.py)
+
+    def fetch_variant_annotations(self, build='GRCh38', chromosome=None, start=None, end=None, **kwargs):
+        """
+            The annotations of the variants imported for `build`, by rsid, or in a region of a
+            chromosome (positions `start` to `end`, inclusive.)
+        """
+        if start is not None and end is not None and start > end:
+            raise ValueError(f"Invalid region: start {start} is after end {end}.")
+        if chromosome is not None:
+            chromosome = str(chromosome).strip()
+            chromosome = (chromosome[3:] if chromosome.lower().startswith('chr') else chromosome).upper()
+        if 'offset' not in kwargs: kwargs['offset'] = 0
+        kwargs['rsid'] = check_if_default(kwargs.get('rsid')) if kwargs.get('rsid') else None
+        return self.genome_db_manager.fetch_variant_annotations(build, chromosome=chromosome, start=start, end=end, **kwargs)
+
+    def fetch_patient_variant_annotations(self, build='GRCh38', **kwargs):
+        if 'offset' not in kwargs: kwargs['offset'] = 0
+        kwargs['rsid'] = check_if_default(kwargs.get('rsid')) if kwargs.get('rsid') else None
+        return self.genome_db_manager.fetch_patient_variant_annotations(build, **kwargs)
+
+    def fetch_variant_annotation_counts(self):
+        return {build: self.genome_db_manager.count_variant_annotations(build) for build in BUILD_TABLES}
+
+    def match_patient_genome(self, patient_id):
+        """
+            The full report of one patient, computed by the vectorised matching engine (a DataFrame.)
+        """
+        return match_patient(self.genome_db_manager.fetch_patient_genome_frame(patient_id), self.genome_db_manager.fetch_snp_pairs_frame())
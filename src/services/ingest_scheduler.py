@@ -0,0 +1,229 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+# Event passed to the scheduler's `notify` with each progress report (the others are the states.)
+PROGRESS = "progress"
+
+# Marker queued to stop a worker thread.
+_STOP = None
+
+def default_ingest_workers():
+    return int(os.getenv('INGEST_WORKERS') or 1)
+
+def default_ingest_queue_size():
+    return int(os.getenv('INGEST_QUEUE_SIZE') or 8)
+
+def default_ingest_uploads():
+    return int(os.getenv('INGEST_UPLOADS') or 2)
+
+class IngestQueueFull(Exception):
+    """
+        Raised by `IngestScheduler.submit` when every worker is busy and the queue is full: the
+        client should retry later.
+    """
+
+class IngestSchedulerClosed(Exception):
+    pass
+
+class IngestJob:
+    """
+        One genome load: its state, and the progress reported by the ingest (`report_progress`)
+        while it runs. Read from other threads through `as_dict`.
+    """
+
+    def __init__(self, source):
+        self.job_id = str(uuid.uuid4())
+        self.source = source
+        self.state = QUEUED
+        self.patient_id = None
+        self.rows_processed = 0
+        self.imported_rows = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.listener = None
+
+    def report_progress(self, rows_processed):
+        self.rows_processed = rows_processed
+        if self.listener is not None:
+            self.listener(self, PROGRESS)
+
+    def elapsed_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def as_dict(self):
+        seconds = self.elapsed_seconds()
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "genome_file_name_with_path": self.source,
+            "patient_id": self.patient_id,
+            "rows_processed": self.rows_processed,
+            "imported_rows": self.imported_rows,
+            "rows_per_second": round(self.rows_processed / seconds) if seconds else None,
+            "seconds": round(seconds, 3),
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class IngestScheduler:
+    """
+        Runs genome loads on a fixed pool of worker threads, fed by a bounded queue. A load
+        that finds the queue full is rejected (`IngestQueueFull`) instead of waiting, so the
+        number of pending loads, and the memory they hold, stays bounded.
+
+        `run(job)` does the work, and returns the number of rows imported. Loads that cannot
+        wait in the queue (uploads, read as they arrive) are `admit`ted instead, at most
+        `uploads` at a time, and run by the caller. The last `retained_jobs` finished jobs stay
+        queryable. `notify(job, event)`, if given, is called
+        on each state change (the event is the new state) and progress report (PROGRESS.)
+    """
+
+    def __init__(self, run, workers=None, queue_size=None, retained_jobs=100, notify=None, uploads=None):
+        self.run = run
+        self.notify = notify
+        self.retained_jobs = retained_jobs
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._queue = queue.Queue(maxsize=max(1, queue_size or default_ingest_queue_size()))
+        self._upload_slots = threading.BoundedSemaphore(max(1, uploads or default_ingest_uploads()))
+        self._workers = [threading.Thread(target=self._work, name=f"ingest-worker-{number}", daemon=True)
+                         for number in range(max(1, workers or default_ingest_workers()))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, source):
+        with self._lock:
+            if self._closed:
+                raise IngestSchedulerClosed("The ingest scheduler is shut down.")
+            job = IngestJob(source)
+            job.listener = self._notify
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise IngestQueueFull(f"{self._queue.maxsize} genome loads are already queued; retry later.")
+            self.jobs[job.job_id] = job
+            self._forget_finished()
+            # Under the lock, so it precedes the running event of the worker that picks the job up.
+            self._notify(job, QUEUED)
+        return job
+
+    def admit(self, source):
+        """
+            A running job for a load the caller runs itself (`run_admitted`); IngestQueueFull if
+            the upload slots are all taken.
+        """
+        if not self._upload_slots.acquire(blocking=False):
+            raise IngestQueueFull("Too many genome uploads in progress; retry later.")
+        with self._lock:
+            if self._closed:
+                self._upload_slots.release()
+                raise IngestSchedulerClosed("The ingest scheduler is shut down.")
+            job = IngestJob(source)
+            job.listener = self._notify
+            job.state = RUNNING
+            job.started_at = time.time()
+            self.jobs[job.job_id] = job
+            self._forget_finished()
+            self._notify(job, RUNNING)
+        return job
+
+    def run_admitted(self, job, run):
+        """
+            Run `run(job)` for an admitted job on the calling thread, tracked (and notified) as
+            a queued load is; its error, if it fails, is raised.
+        """
+        try:
+            error = self._run_job(job, run)
+        finally:
+            self._upload_slots.release()
+        if error is not None:
+            raise error
+        return job.imported_rows
+
+    def job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self.jobs.values()]
+        return {
+            "workers": len(self._workers),
+            "queue_size": self._queue.maxsize,
+            "queued": states.count(QUEUED),
+            "running": states.count(RUNNING),
+        }
+
+    def _notify(self, job, event):
+        if self.notify is None:
+            return
+        try:
+            self.notify(job, event)
+        except Exception:
+            logging.exception(f"Notification of genome load {job.job_id} ({event}) failed")
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.retained_jobs)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            with self._lock:
+                if job.state != QUEUED:
+                    continue
+                job.state = RUNNING
+                job.started_at = time.time()
+            self._notify(job, RUNNING)
+            self._run_job(job)
+
+    def _run_job(self, job, run=None):
+        # The error of a failed load (logged, and recorded in the job), else None.
+        failure = None
+        try:
+            job.imported_rows = (run or self.run)(job)
+            job.state = SUCCEEDED
+        except Exception as error:
+            logging.exception(f"Genome load {job.job_id} ({job.source}) failed")
+            job.error = f"{type(error).__name__}: {error}"
+            job.state = FAILED
+            failure = error
+        finally:
+            job.finished_at = time.time()
+        logging.info(f"Genome load {job.job_id} {job.state}: {job.rows_processed} rows in {job.elapsed_seconds():.1f}s")
+        self._notify(job, job.state)
+        return failure
+
+    def shutdown(self, timeout=None):
+        """
+            Stop accepting loads, cancel the queued ones and wait for the running ones.
+        """
+        with self._lock:
+            self._closed = True
+            cancelled = [job for job in self.jobs.values() if job.state == QUEUED]
+            for job in cancelled:
+                job.state = CANCELLED
+                job.finished_at = time.time()
+        for job in cancelled:
+            self._notify(job, CANCELLED)
+        for _ in self._workers:
+            # A put can only block on queued (now cancelled) jobs, which the workers drain.
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout)
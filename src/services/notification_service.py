@@ -1,18 +1,54 @@
+import asyncio
+import logging
+from typing import Optional
 from fastapi.websockets import WebSocket, WebSocketDisconnect
+from services.ingest_scheduler import PROGRESS
+from services.progress_hub import ProgressHub
 
 class NotificationService:
-    async def notify_patient_file_load_complete(self, websocket: WebSocket): 
+    """
+        Broadcasts genome load events to the connected WebSocket clients, through a ProgressHub:
+        `genome_load_queued`, `genome_load_running`, `genome_load_progress` (throttled), and
+        `genome_load_succeeded`, `genome_load_failed` or `genome_load_cancelled`.
+    """
+
+    def __init__(self, progress_hub: Optional[ProgressHub] = None):
+        self.progress_hub = progress_hub or ProgressHub()
+
+    async def notify_patient_file_load_complete(self, websocket: WebSocket):
         await websocket.accept()
+        subscription = self.progress_hub.subscribe()
+        # Messages from the client are ignored; reading them is how a disconnect is noticed.
+        receiving = asyncio.ensure_future(self._receive_until_closed(websocket))
         try:
             while True:
-                data = await websocket.receive_text()
-                await websocket.send_text(f"Message received: {data}")
+                sending = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait({sending, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                if receiving in done:
+                    sending.cancel()
+                    break
+                await websocket.send_json(sending.result())
         except WebSocketDisconnect:
-            print("WebSocket connection closed")
+            pass
         except Exception as e:
-            print(f"WebSocket connection closed: {e}")
+            logging.warning(f"WebSocket connection closed: {e}")
+        finally:
+            receiving.cancel()
+            self.progress_hub.unsubscribe(subscription)
+
+    async def _receive_until_closed(self, websocket: WebSocket):
+        try:
+            while True:
+                await websocket.receive_text()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
 
-    async def notify_ui(self, genome_file_name_with_path: str, patient_genome_df_size: str):
-        websocket_url = "ws://localhost:8000/ws"
-        async with WebSocket(websocket_url, headers=None, subprotocols=None) as websocket:
-            await websocket.send_json({"event": "genome_loaded", "genome_file_name_with_path": genome_file_name_with_path, "Number of Rows": patient_genome_df_size})
\ No newline at end of file
+    def publish_genome_load(self, job, event):
+        """
+            Publish an ingest job's event (the `notify` of IngestScheduler.) Progress events of
+            a job coalesce in the clients' queues, and are throttled.
+        """
+        message = {"event": f"genome_load_{event}", **job.as_dict()}
+        if event == PROGRESS:
+            return self.progress_hub.publish(message, coalesce_key=job.job_id, throttle=True)
+        return self.progress_hub.publish(message)
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def default_subscriber_queue_size():
+    return int(os.getenv('NOTIFICATION_QUEUE_SIZE') or 64)
+
+def default_progress_interval():
+    return float(os.getenv('PROGRESS_EVENT_INTERVAL') or 0.5)
+
+class Subscription:
+    """
+        One client's bounded queue of pending events. Events sharing a coalescing key replace
+        each other while pending (a slow client gets the latest progress, not every step); when
+        the queue is full the oldest coalescable event is dropped (else the oldest event), and
+        counted in `dropped`.
+
+        Filled from any thread (`offer`), drained by the client's event loop (`get`.)
+    """
+
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.max_pending = max(1, max_pending)
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def offer(self, event, coalesce_key=None):
+        with self._lock:
+            if coalesce_key is not None and ('coalesce', coalesce_key) in self._pending:
+                self._pending[('coalesce', coalesce_key)] = event
+            else:
+                if len(self._pending) >= self.max_pending:
+                    victim = next((key for key in self._pending if key[0] == 'coalesce'), next(iter(self._pending)))
+                    del self._pending[victim]
+                    self.dropped += 1
+                self._sequence += 1
+                self._pending[('coalesce', coalesce_key) if coalesce_key is not None else ('event', self._sequence)] = event
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The client's loop is closed; it no longer reads.
+            pass
+
+    async def get(self):
+        while True:
+            with self._lock:
+                if self._pending:
+                    return self._pending.popitem(last=False)[1]
+                self._ready.clear()
+            await self._ready.wait()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+class ProgressHub:
+    """
+        In-process publish/subscribe: every event published (from any thread) is offered to
+        each subscriber's own bounded queue, so a slow client never holds back the publisher
+        or the other clients.
+
+        Throttled events (progress) are published at most once per `progress_interval` seconds
+        per coalescing key; others (state changes) always are.
+    """
+
+    def __init__(self, subscriber_queue_size=None, progress_interval=None):
+        self.subscriber_queue_size = subscriber_queue_size or default_subscriber_queue_size()
+        self.progress_interval = default_progress_interval() if progress_interval is None else progress_interval
+        self.subscribers = set()
+        self.published = 0
+        self.throttled = 0
+        self._last_published = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """
+            A new subscription, delivering to the running event loop.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.subscriber_queue_size)
+        with self._lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event, coalesce_key=None, throttle=False):
+        now = time.monotonic()
+        with self._lock:
+            if throttle:
+                if now - self._last_published.get(coalesce_key, float('-inf')) < self.progress_interval:
+                    self.throttled += 1
+                    return False
+                self._last_published[coalesce_key] = now
+                if len(self._last_published) > 256:
+                    self._last_published = {key: at for key, at in self._last_published.items() if now - at < self.progress_interval}
+            self.published += 1
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.offer(event, coalesce_key)
+        return True
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "throttled": self.throttled,
+            "dropped": sum(subscription.dropped for subscription in subscribers),
+        }
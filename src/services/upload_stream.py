@@ -0,0 +1,104 @@
+import io
+import os
+import queue
+import time
+from services.genome_ingest_pipeline import GenomeTooLarge
+
+# A request body is read in chunks of ~64 KiB; this many are buffered between the request and
+# the ingest, so an upload holds about 1 MiB in memory whatever its size.
+DEFAULT_UPLOAD_QUEUE_CHUNKS = 16
+# Seconds the ingest waits for the next chunk before giving up on a stalled upload, and for
+# the whole body: an upload holds an ingest slot (see IngestScheduler) until it ends.
+DEFAULT_UPLOAD_IDLE_TIMEOUT = 30
+DEFAULT_UPLOAD_MAX_SECONDS = 600
+_END = None
+
+def default_upload_max_bytes():
+    return int(os.getenv('UPLOAD_MAX_BYTES') or 256 * 1024 * 1024)
+
+def default_upload_max_rows():
+    return int(os.getenv('UPLOAD_MAX_ROWS') or 5000000)
+
+class UploadStalled(TimeoutError):
+    pass
+
+class UploadStream(io.RawIOBase):
+    """
+        A request body as a binary file, read (by the ingest, on its thread) as it arrives:
+        the request side `feed`s the chunks it receives into a bounded queue, so a fast sender
+        waits for the ingest, and then calls `finish` (or `abort` with the error to raise to
+        the reader.) Past `max_bytes`, the body is aborted with GenomeTooLarge; the reader
+        raises UploadStalled when no chunk arrives for `idle_timeout` seconds, or the body is
+        not complete `max_seconds` after the stream was created.
+    """
+
+    def __init__(self, max_bytes=None, queue_chunks=None, idle_timeout=None, max_seconds=None):
+        self.max_bytes = max_bytes or default_upload_max_bytes()
+        self.idle_timeout = idle_timeout or float(os.getenv('UPLOAD_IDLE_TIMEOUT') or DEFAULT_UPLOAD_IDLE_TIMEOUT)
+        self.max_seconds = max_seconds or float(os.getenv('UPLOAD_MAX_SECONDS') or DEFAULT_UPLOAD_MAX_SECONDS)
+        self.deadline = time.monotonic() + self.max_seconds
+        self.received = 0
+        self._chunks = queue.Queue(maxsize=queue_chunks or int(os.getenv('UPLOAD_QUEUE_CHUNKS') or DEFAULT_UPLOAD_QUEUE_CHUNKS))
+        self._pending = memoryview(b"")
+        self._ended = False
+        self._reader_closed = False
+
+    # Request side
+
+    def feed(self, chunk):
+        """
+            Queue `chunk`, waiting while the queue is full; False once the reader has stopped
+            reading (the ingest ended, e.g. failed), when the rest of the body is not needed.
+        """
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            self.abort(GenomeTooLarge(f"The genome file is larger than {self.max_bytes} bytes."))
+            return False
+        return self._put(chunk)
+
+    def finish(self):
+        self._put(_END)
+
+    def abort(self, error):
+        self._put(error)
+
+    def _put(self, item):
+        while not self._reader_closed:
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # Reader side
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._ended:
+                return 0
+            remaining = self.deadline - time.monotonic()
+            try:
+                item = self._chunks.get(timeout=max(0, min(self.idle_timeout, remaining)))
+            except queue.Empty:
+                if time.monotonic() >= self.deadline:
+                    raise UploadStalled(f"The upload was not complete within {self.max_seconds:g}s; it was abandoned.")
+                raise UploadStalled(f"No data received for {self.idle_timeout:g}s; the upload was abandoned.")
+            if item is _END:
+                self._ended = True
+            elif isinstance(item, BaseException):
+                self._ended = True
+                raise item
+            else:
+                self._pending = memoryview(item)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._reader_closed = True
+        super().close()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from data_layer.sqlite_worker import chunked
+
+GENE_KEY_PREFIX = "gprofiler:snpense:genes:"
+# Seconds a request waits for a concurrent request's upstream fetch of the same rsid.
+IN_FLIGHT_TIMEOUT_SECONDS = 120
+
+def default_gprofiler_batch_size():
+    return int(os.getenv('GPROFILER_BATCH_SIZE') or 100)
+
+def canonical_variant_ids(rsids):
+    """
+        `rsids` stripped and in lower case, without duplicates, in their first order.
+    """
+    return list(dict.fromkeys(rsid.strip().lower() for rsid in rsids if rsid and rsid.strip()))
+
+class VariantGeneResolver:
+    """
+        Resolves variant rsids to the names of the genes they fall in (g:SNPense), many at once.
+
+        rsids are deduplicated, and those known (in the response cache, also unknown variants)
+        are served locally; the rest are requested upstream in chunks of `batch_size`, the
+        chunks concurrently (`snpense` is a coroutine function.) A request for rsids already
+        being fetched by a concurrent request waits for that fetch instead of repeating it
+        (single flight.) Used from one event loop.
+    """
+
+    def __init__(self, response_cache, snpense, ttl, batch_size=None):
+        self.response_cache = response_cache
+        self.snpense = snpense
+        self.ttl = ttl
+        self.batch_size = batch_size or default_gprofiler_batch_size()
+        self.upstream_requests = 0
+        self.fetched = 0
+        self.coalesced = 0
+        self._in_flight = {}
+
+    async def resolve(self, rsids):
+        """
+            {rsid: gene names, or None for a variant g:SNPense does not know}, for the canonical
+            (lower case, deduplicated) `rsids`.
+        """
+        keys = [GENE_KEY_PREFIX + rsid for rsid in canonical_variant_ids(rsids)]
+        genes = await self.response_cache.get_or_fetch_many_async(keys, self._fetch, self.ttl)
+        return {key[len(GENE_KEY_PREFIX):]: genes[key] for key in keys}
+
+    async def _fetch(self, keys):
+        rsids = [key[len(GENE_KEY_PREFIX):] for key in keys]
+        claimed, futures = [], {}
+        loop = asyncio.get_running_loop()
+        for rsid in rsids:
+            future = self._in_flight.get(rsid)
+            if future is None:
+                future = self._in_flight[rsid] = loop.create_future()
+                claimed.append(rsid)
+            else:
+                self.coalesced += 1
+            futures[rsid] = future
+        if claimed:
+            # Shielded, so a request going away mid-fetch still settles the rsids others wait for.
+            await asyncio.shield(loop.create_task(self._fetch_claimed(claimed)))
+        genes = {}
+        for rsid in rsids:
+            genes[GENE_KEY_PREFIX + rsid] = await asyncio.wait_for(asyncio.shield(futures[rsid]), IN_FLIGHT_TIMEOUT_SECONDS)
+        return genes
+
+    async def _fetch_claimed(self, claimed):
+        chunks = list(chunked(claimed, self.batch_size))
+        results = await asyncio.gather(*(self._request(chunk) for chunk in chunks), return_exceptions=True)
+        error = None
+        for chunk, genes in zip(chunks, results):
+            if isinstance(genes, BaseException):
+                error = error or genes
+                for rsid in chunk:
+                    future = self._in_flight.pop(rsid)
+                    future.set_exception(genes)
+                    # Marked retrieved: it is raised here, and to the waiters (if any.)
+                    future.exception()
+                continue
+            # Stored per chunk, so one chunk failing does not lose the others.
+            self.response_cache.put_many({GENE_KEY_PREFIX + rsid: names for rsid, names in genes.items()})
+            for rsid in chunk:
+                self._in_flight.pop(rsid).set_result(genes[rsid])
+        if error is not None:
+            raise error
+
+    async def _request(self, rsids):
+        self.upstream_requests += 1
+        genes = dict.fromkeys(rsids)
+        for variant in await self.snpense(rsids):
+            rsid = str(variant.get('rs_id', '')).lower()
+            if rsid in genes:
+                names = genes[rsid] or []
+                genes[rsid] = names + [name for name in variant.get('gene_names') or [] if name not in names]
+        self.fetched += len(rsids)
+        return genes
+
+    def stats(self):
+        return {
+            "batch_size": self.batch_size,
+            "upstream_requests": self.upstream_requests,
+            "fetched_rsids": self.fetched,
+            "coalesced_rsids": self.coalesced,
+            "in_flight_rsids": len(self._in_flight),
+        }
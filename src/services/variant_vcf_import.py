@@ -0,0 +1,318 @@
+import gzip
+import io
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import unquote
+import numpy as np
+import pandas as pd
+from data_layer.rsid_codes import encode_rsids
+from repositories.variant_annotation_repository import BUILD_TABLES, VARIANT_ANNOTATION_COLUMNS
+from services.genome_formats import GZIP_MAGIC, map_distinct, vcf_chromosome
+
+DEFAULT_CHUNK_MB = 32
+# A BGZF block: a gzip member whose extra field holds its size ('BC' subfield), so a file can be
+# split at block boundaries without decompressing it. See the SAM/BAM specification, section 4.1.
+BGZF_HEADER = struct.Struct('<4BI2BH2BHH')
+BGZF_HEADER_SIZE = BGZF_HEADER.size
+BGZF_TRAILER_SIZE = 8
+VCF_COLUMNS = ['chromosome', 'position', 'variant_id', 'ref', 'alt', 'qual', 'filter', 'info']
+RS_ID = re.compile(r'^rs\d+$', re.IGNORECASE)
+
+# The INFO keys decoded into columns, per source; the rest of INFO is kept as it is (`info`.)
+VARIANT_SOURCES = {
+    'clinvar': {'rsid': 'RS', 'gene': 'GENEINFO', 'clinical_significance': 'CLNSIG', 'review_status': 'CLNREVSTAT', 'condition': 'CLNDN'},
+    'civic': {'gene': 'GN'},
+}
+BUILD_NAMES = {'GRCh37': ['grch37', 'hg19', 'b37'], 'GRCh38': ['grch38', 'hg38']}
+
+# A byte range of a VCF file: a chunk owns the lines that start in [start, end); `previous` is the
+# offset of the byte (plain) or non-empty block (BGZF) before `start`, None for the first chunk.
+VcfChunk = namedtuple('VcfChunk', ['path', 'bgzf', 'start', 'end', 'previous'])
+
+def default_workers():
+    return int(os.getenv('VCF_IMPORT_WORKERS') or os.cpu_count() or 1)
+
+def default_chunk_bytes():
+    return int(float(os.getenv('VCF_IMPORT_CHUNK_MB') or DEFAULT_CHUNK_MB) * 1024 * 1024)
+
+# Splitting
+
+def bgzf_block_size(header):
+    """
+        The size of the BGZF block starting with `header` (its first BGZF_HEADER_SIZE bytes); None
+        if it is not a BGZF block.
+    """
+    if len(header) < BGZF_HEADER_SIZE:
+        return None
+    id1, id2, method, flags, _, _, _, extra_length, subfield1, subfield2, subfield_length, block_size = BGZF_HEADER.unpack(header)
+    if (id1, id2, method) != (0x1f, 0x8b, 8) or not flags & 4 or (subfield1, subfield2, subfield_length) != (ord('B'), ord('C'), 2):
+        return None
+    return block_size + 1
+
+def is_bgzf(path):
+    with open(path, 'rb') as file:
+        return bgzf_block_size(file.read(BGZF_HEADER_SIZE)) is not None
+
+def is_gzip(path):
+    with open(path, 'rb') as file:
+        return file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+def bgzf_blocks(path):
+    """
+        (offset, uncompressed size) of each block of a BGZF file, read from the block headers
+        and trailers only.
+    """
+    blocks = []
+    with open(path, 'rb') as file:
+        offset = 0
+        while True:
+            file.seek(offset)
+            header = file.read(BGZF_HEADER_SIZE)
+            if not header:
+                return blocks
+            size = bgzf_block_size(header)
+            if size is None:
+                raise ValueError(f"{path} is not a valid BGZF file: no block at offset {offset}.")
+            file.seek(offset + size - 4)
+            blocks.append((offset, struct.unpack('<I', file.read(4))[0]))
+            offset += size
+
+def vcf_chunks(path, chunk_bytes):
+    """
+        Split a plain or BGZF-compressed VCF file into VcfChunks of about `chunk_bytes` (on disk.)
+    """
+    if is_bgzf(path):
+        chunks, start, previous, last_non_empty = [], 0, None, None
+        for offset, uncompressed in bgzf_blocks(path):
+            if offset - start >= chunk_bytes and last_non_empty is not None:
+                chunks.append(VcfChunk(path, True, start, offset, previous))
+                start, previous = offset, last_non_empty
+            if uncompressed:
+                last_non_empty = offset
+        return chunks + [VcfChunk(path, True, start, os.path.getsize(path), previous)]
+    size = os.path.getsize(path)
+    starts = list(range(0, size, chunk_bytes)) or [0]
+    return [VcfChunk(path, False, start, min(start + chunk_bytes, size), start - 1 if start else None) for start in starts]
+
+def write_bgzf(data, path, block_size=0xff00):
+    """
+        Write `data` (bytes) to `path` BGZF-compressed (as bgzip would, in `block_size` pieces.)
+    """
+    with open(path, 'wb') as file:
+        for start in range(0, len(data), block_size):
+            file.write(bgzf_block(data[start:start + block_size]))
+        file.write(bgzf_block(b''))
+
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = BGZF_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, BGZF_HEADER_SIZE + len(deflated) + BGZF_TRAILER_SIZE - 1)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+def decompressed_blocks(file, offset):
+    # (offset, data) of each BGZF block from `offset` on; each block is a raw deflate stream.
+    while True:
+        file.seek(offset)
+        header = file.read(BGZF_HEADER_SIZE)
+        size = bgzf_block_size(header)
+        if size is None:
+            return
+        block = file.read(size - BGZF_HEADER_SIZE)
+        yield offset, zlib.decompress(block[:-BGZF_TRAILER_SIZE], -15)
+        offset += size
+
+def chunk_data(chunk):
+    """
+        The lines `chunk` owns, as bytes: those starting in its range, the last read past its
+        end to its newline.
+    """
+    with open(chunk.path, 'rb') as file:
+        if chunk.bgzf:
+            data = bytearray(next(decompressed_blocks(file, chunk.previous))[1][-1:] if chunk.previous is not None else b'')
+            for offset, block in decompressed_blocks(file, chunk.start):
+                if offset < chunk.end:
+                    data += block
+                    continue
+                if data.endswith(b'\n'):
+                    break
+                newline = block.find(b'\n')
+                data += block if newline < 0 else block[:newline + 1]
+                if newline >= 0:
+                    break
+            data = bytes(data)
+        else:
+            file.seek(chunk.previous if chunk.previous is not None else chunk.start)
+            data = file.read(chunk.end - file.tell())
+            if not data.endswith(b'\n'):
+                data += file.readline()
+    if chunk.previous is None:
+        return data
+    # The first line (or its end) belongs to the chunk before, unless the byte before the range ends a line.
+    newline = data.find(b'\n')
+    return data[newline + 1:] if newline >= 0 else b''
+
+def gzip_pieces(path, chunk_bytes):
+    # A gzip file that is not BGZF cannot be split: it is read here, and its lines sent as bytes.
+    with gzip.open(path, 'rb') as file:
+        while True:
+            data = file.read(chunk_bytes)
+            if not data:
+                return
+            yield data + (b'' if data.endswith(b'\n') else file.readline())
+
+# Parsing
+
+def info_values(info, key):
+    """
+        The value of INFO `key` in each row, None where it is absent; only that key is decoded
+        (and its %-escapes, VCF 4.3, undone.)
+    """
+    # The pattern starts with the key itself, which the regex engine scans for as a literal (4-10x
+    # faster than with a leading `(?:^|;)`); the lookbehind rejects keys ending another key.
+    key = re.escape(key)
+    values = info.str.extract(rf'{key}=(?<![^;]{key}=)([^;]*)', expand=False)
+    escaped = values.str.contains('%', regex=False, na=False)
+    if escaped.any():
+        values[escaped] = map_distinct(unquote, values[escaped])
+    return values.astype(object).where(values.notna(), None)
+
+def gene_symbols(gene_info):
+    # ClinVar GENEINFO: symbol:id pairs, separated by '|'.
+    return '|'.join(gene.partition(':')[0] for gene in gene_info.split('|')) if gene_info else None
+
+def parse_vcf_chunk(chunk, source):
+    """
+        Parse the data lines of `chunk` (a VcfChunk, or bytes) into a DataFrame of
+        VARIANT_ANNOTATION_COLUMNS. Returns (frame, rows skipped); runs in the import's worker
+        processes.
+    """
+    data = chunk_data(chunk) if isinstance(chunk, VcfChunk) else chunk
+    header_end = 0
+    while data.startswith(b'#', header_end):
+        newline = data.find(b'\n', header_end)
+        header_end = len(data) if newline < 0 else newline + 1
+    if header_end == len(data) or not data[header_end:].strip():
+        return pd.DataFrame(columns=VARIANT_ANNOTATION_COLUMNS), 0
+    frame = pd.read_csv(io.BytesIO(data[header_end:] if header_end else data), sep='\t', header=None, usecols=range(len(VCF_COLUMNS)),
+                        dtype=str, na_filter=False, quoting=3, comment=None)
+    frame.columns = VCF_COLUMNS
+    position = pd.to_numeric(frame['position'], errors='coerce')
+    valid = position.notna() & (frame['ref'] != '')
+    frame, position = frame[valid], position[valid].astype('int64')
+    fields = VARIANT_SOURCES[source]
+    columns = {column: info_values(frame['info'], key) for column, key in fields.items()}
+    if 'gene' in columns and fields['gene'] == 'GENEINFO':
+        columns['gene'] = map_distinct(gene_symbols, columns['gene'].fillna(''))
+    chromosome = map_distinct(vcf_chromosome, frame['chromosome'])
+    # The rsid: an rs ID in the ID column, else the source's INFO key (ClinVar: RS=number.)
+    rsid = frame['variant_id'].where(frame['variant_id'].str.match(RS_ID), None)
+    if 'rsid' in columns:
+        from_info = columns.pop('rsid').fillna('')
+        listed = from_info.str.contains('|', regex=False)
+        if listed.any():
+            from_info[listed] = from_info[listed].str.partition('|')[0]
+        from_info = 'rs' + from_info
+        rsid = rsid.fillna(from_info.where(from_info != 'rs', None))
+    rsid_codes = encode_rsids(rsid)
+    variant_id = frame['variant_id'].mask(frame['variant_id'].isin(['', '.']),
+                                          chromosome + ':' + frame['position'] + ':' + frame['ref'] + ':' + frame['alt'])
+    annotation_df = pd.DataFrame({
+        'source': source,
+        'variant_id': variant_id,
+        'rsid': pd.Series(np.where(rsid_codes != 0, rsid_codes.astype(object), None), index=frame.index),
+        'chromosome': chromosome,
+        'position': position,
+        'ref': frame['ref'],
+        'alt': frame['alt'],
+        **{column: columns.get(column) for column in ['gene', 'clinical_significance', 'review_status', 'condition']},
+        'info': frame['info'],
+    }, columns=VARIANT_ANNOTATION_COLUMNS)
+    return annotation_df, int((~valid).sum())
+
+# Import
+
+def read_vcf_header(path):
+    """
+        The header lines (text) of a plain or gzip/BGZF-compressed VCF file.
+    """
+    lines = []
+    with (gzip.open(path, 'rb') if is_gzip(path) else open(path, 'rb')) as file:
+        for line in file:
+            if not line.startswith(b'#'):
+                break
+            lines.append(line.decode('utf-8', 'replace').rstrip('\n'))
+    if not lines or not lines[0].startswith('##fileformat=VCF'):
+        raise ValueError(f"{path} is not a VCF file.")
+    return lines
+
+def sniff_source(header):
+    for line in header:
+        if line.lower().startswith('##source='):
+            for source in VARIANT_SOURCES:
+                if source in line.lower():
+                    return source
+    return None
+
+def sniff_build(header):
+    for line in header:
+        if line.lower().startswith(('##reference=', '##assembly=', '##contig=')):
+            for build, names in BUILD_NAMES.items():
+                if any(name in line.lower() for name in names):
+                    return build
+    return None
+
+def parsed_frames(path, source, workers, chunk_bytes, stats):
+    """
+        The annotation frames of a VCF file, in file order, parsed by `workers` processes (in
+        this one for a single worker), with at most two chunks per worker in flight.
+    """
+    pieces = gzip_pieces(path, chunk_bytes) if is_gzip(path) and not is_bgzf(path) else vcf_chunks(path, chunk_bytes)
+    def record(result):
+        annotation_df, skipped = result
+        stats['chunks'] += 1
+        stats['skipped_rows'] += skipped
+        return annotation_df
+    if workers <= 1:
+        for piece in pieces:
+            yield record(parse_vcf_chunk(piece, source))
+        return
+    # Spawned, not forked: the parent runs the SQL worker's threads.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        pending = []
+        for piece in pieces:
+            pending.append(pool.submit(parse_vcf_chunk, piece, source))
+            if len(pending) >= 2 * workers:
+                yield record(pending.pop(0).result())
+        for future in pending:
+            yield record(future.result())
+
+def import_variant_vcf(genome_db_manager, path, source=None, build=None, workers=None, chunk_bytes=None):
+    """
+        Import a ClinVar or CIViC VCF release (plain, gzip or BGZF) into the annotation table of
+        its genome build, replacing the source's previous import. The source and build are read
+        from the header (##source, ##reference) unless given. Returns a VariantImportSummary.
+    """
+    from models import VariantImportSummary
+    started = time.perf_counter()
+    header = read_vcf_header(path)
+    source = (source or sniff_source(header) or '').lower()
+    if source not in VARIANT_SOURCES:
+        raise ValueError(f"Unknown variant source {source or '(none in the header)'}: expected one of {', '.join(VARIANT_SOURCES)}.")
+    build = build or sniff_build(header)
+    build = next((name for name in BUILD_TABLES if build and name.lower() == build.lower()), None)
+    if build is None:
+        raise ValueError(f"Unknown genome build: expected one of {', '.join(BUILD_TABLES)}.")
+    workers = workers or default_workers()
+    stats = {'chunks': 0, 'skipped_rows': 0}
+    rows = genome_db_manager.replace_variant_annotations(source, build, parsed_frames(path, source, workers, chunk_bytes or default_chunk_bytes(), stats))
+    summary = VariantImportSummary(source=source, build=build, imported_rows=rows, skipped_rows=stats['skipped_rows'], chunks=stats['chunks'],
+                                   workers=workers, seconds=time.perf_counter() - started)
+    logging.info(f"{source} {build}: {rows} variants imported from {stats['chunks']} chunks in {summary.seconds:.1f}s ({stats['skipped_rows']} skipped)")
+    return summary
@@ -1,7 +1,11 @@
+import base64
+import hashlib
 import json
+from collections import namedtuple
 from venv import logger
 import pandas as pd
 import logging
+from serialization import rows_to_records
 
 logging.basicConfig(level=logging.INFO)
 
@@ -11,49 +15,42 @@ def load_file(file_name_with_path, names=None, straight: bool = False):
     params = {k: v for k, v in params_list.items() if straight is False} 
     return pd.read_csv(file_name_with_path, low_memory=False, **params) 
 
+def file_content_hash(file_name_with_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_name_with_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def check_if_default(rsid):
     if rsid == "default":
         rsid = "rs10516809"
     return rsid
 
-def fetch_data_with_conditions(base_query, columns, offset, sql_worker_execution_function, **kwargs):
-    conditions = []
-    params = []
-    # Determine if the query has a join by checking for the presence of 'JOIN' keyword
-    has_join = 'JOIN' in base_query.upper()        
-    # Adjust the column prefix based on whether a join is present
-    patient_id_column = 'pgd.patient_id' if has_join else 'patient_id'
-    rsid_column = 'pgd.rsid' if has_join else 'rsid'
-    allele1_column = 'pgd.allele1' if has_join else 'allele1'
-    allele2_column = 'pgd.allele2' if has_join else 'allele2'
-    if 'patient_id' in kwargs and kwargs['patient_id'] is not None:
-        conditions.append(f'{patient_id_column} = ?')
-        params.append(kwargs['patient_id'])
-    if 'allele1' in kwargs and kwargs['allele1'] is not None:
-        conditions.append(f'{allele1_column} = ?')
-        params.append(kwargs['allele1'])
-    if 'allele2' in kwargs and kwargs['allele2'] is not None:
-        conditions.append(f'{allele2_column} = ?')
-        params.append(kwargs['allele2']) 
-    if 'rsid' in kwargs and kwargs['rsid'] is not None:
-        if(type(kwargs['rsid'] == list)):
-            print('list')
-            rsids = "('"+"','".join(kwargs['rsid'])+"')"
-            base_query += f' WHERE rsid IN {rsids} ' 
-            # base_query += f' LIMIT 25 OFFSET {offset}' 
-        else:
-            print('not list')
-            conditions.append(f'{rsid_column} = ?')
-        params.append(kwargs['rsid'])
-    if conditions:
-        base_query += ' WHERE ' + ' AND '.join(conditions)
-        base_query += ' LIMIT 25 OFFSET ?'
-        params.append(offset)
-        results_list = sql_worker_execution_function(base_query, tuple(params))
-    else:
-        print('no conditions, base_query', base_query)
-        results_list = sql_worker_execution_function(base_query) 
-        print('results_list', results_list)
-    results_list = pd.DataFrame(results_list, columns=columns)
-    json_str = results_list.to_json(orient='records', date_format='iso')
-    return json.loads(json_str) 
\ No newline at end of file
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 1000
+
+class Page(namedtuple('Page', ['columns', 'rows', 'next_cursor'])):
+    """
+        One page of a keyset-paginated listing: the rows (with their column names) and the
+        cursor of the following page, None on the last page.
+    """
+
+    @property
+    def records(self):
+        return rows_to_records(self.columns, self.rows)
+
+def encode_cursor(order_by, key_values):
+    payload = json.dumps({'o': order_by, 'k': list(key_values)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order_by, key_count):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        key_values = payload['k']
+        valid = payload['o'] == order_by and isinstance(key_values, list) and len(key_values) == key_count
+    except (ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid cursor.")
+    return key_values
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from fastapi.testclient import TestClient
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import GenomeService
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+@pytest.fixture
+def environment(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('GENOME_FILE_PATH', os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'))
+    return snp_pairs_file
+
+def test_lifespan_creates_one_shared_service(environment):
+    from main import app
+    with patch.object(GenomeService, '__init__', autospec=True, side_effect=GenomeService.__init__) as service_init:
+        with TestClient(app) as client:
+            assert client.get("/patient_genome/patient_profile").status_code == 200
+            assert client.post("/snp_research/", json={"rsidsList": ["rs1000113"]}).status_code == 200
+            controller = app.state.genome_controller
+        assert service_init.call_count == 1
+    assert not controller.genome_service.genome_db_manager.sql_worker.is_alive()
+
+def test_snp_pairs_import_skipped_when_reference_unchanged(environment):
+    service = GenomeService()
+    imported_rows = service.genome_db_manager.count_snp_pairs()
+    assert imported_rows > 0
+    with patch.object(GenomeDatabaseManager, 'save_snp_pairs_to_db') as save_snp_pairs:
+        assert service.load_snp_pairs_df(str(environment)) is None
+        save_snp_pairs.assert_not_called()
+    service.close()
+
+def test_snp_pairs_import_reruns_when_reference_changes(environment):
+    GenomeService().close()
+    with open(environment, 'a') as snp_pairs_file:
+        snp_pairs_file.write('Rs99999999(A;A),1,2,"new"\n')
+    service = GenomeService()
+    assert service.genome_db_manager.sql_worker.execute("SELECT notes FROM snp_pairs WHERE rsid = 99999999") == [("new",)]
+    service.close()
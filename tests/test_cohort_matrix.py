@@ -0,0 +1,111 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.cohort_matrix import CohortGenotypeMatrix
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from genotype_matching import encode_genotypes, reference_allele_masks
+from models import SnpPair
+from services.genome_service import read_snp_pairs_file
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+SNP_PAIRS = '''RSID_Genotypes,Magnitude,Risk,Notes
+Rs1(A;G),2,2,carrier
+Rs1(G;G),3,2,affected
+Rs2(C;C),0,1,normal
+Rs3(A;A),1,1,rare
+'''
+
+def genome(genotypes):
+    return pd.DataFrame({'rsid': list(genotypes), 'chromosome': '1', 'position': range(1, len(genotypes) + 1), 'genotype': list(genotypes.values())})
+
+def test_counts_alleles_and_carriers():
+    matrix = CohortGenotypeMatrix([3, 1, 2], capacity=1)
+    matrix.set_patient("p1", [1, 2, 404], encode_genotypes(["AG", "CC", "TT"]))
+    matrix.set_patient("p2", [1, 3], encode_genotypes(["GA", "--"]))
+    matrix.set_patient("p3", [1, 2], encode_genotypes(["G", "CT"]))
+    assert len(matrix) == 3 and matrix.stats()["capacity"] == 4
+    called, counts, alleles, carriers = matrix.allele_statistics(matrix.columns_of([1, 2, 3]))
+    assert called.tolist() == [3, 2, 0]
+    # rs1: AG, AG and a single G (counted twice.)
+    assert (alleles[0, 1], alleles[0, 3], carriers[0, 1], carriers[0, 3]) == (2, 4, 2, 3)
+    assert counts[0, encode_genotypes(["AG"])[0]] == 2 and counts[2, 0] == 3
+    # Replacing a patient keeps their row.
+    matrix.set_patient("p1", [1], encode_genotypes(["AA"]))
+    called, _, alleles, _ = matrix.allele_statistics(matrix.columns_of([1, 2]))
+    assert len(matrix) == 3 and called.tolist() == [3, 1] and alleles[0, 1] == 3
+    assert matrix.columns_of([2, 404]).tolist() == [1, -1]
+
+def test_pair_carriers_match_either_order_and_strand():
+    matrix = CohortGenotypeMatrix([1])
+    for patient, genotype in enumerate(["AG", "GA", "TC", "GG", "--"]):
+        matrix.set_patient(patient, [1], encode_genotypes([genotype]))
+    carriers, called = matrix.pair_carriers(np.array([0, 0]), encode_genotypes(["AG", "CC"]))
+    assert carriers.tolist() == [3, 1] and called.tolist() == [4, 4]
+
+def test_pair_carriers_do_not_flip_palindromic_rsids():
+    matrix = CohortGenotypeMatrix([1])
+    for patient, genotype in enumerate(["AA", "AA", "TT"]):
+        matrix.set_patient(patient, [1], encode_genotypes([genotype]))
+    # (A;A) and (T;T) pairs of one rsid: each patient carries one of them.
+    pair_codes = encode_genotypes(["AA", "TT"])
+    carriers, _ = matrix.pair_carriers(np.array([0, 0]), pair_codes, reference_allele_masks(['rs1', 'rs1'], pair_codes))
+    assert carriers.tolist() == [2, 1]
+
+def test_counts_follow_the_rows():
+    rng = np.random.default_rng(0)
+    matrix = CohortGenotypeMatrix(np.arange(1, 101), capacity=8)
+    for patient in list(range(50)) + list(range(0, 50, 3)):
+        matrix.set_patient(patient, np.arange(1, 101), rng.choice(encode_genotypes(["AA", "AG", "GG", "--"]), 100))
+    rows = matrix.genotypes[:len(matrix)]
+    recounted = np.stack([np.bincount(column, minlength=49) for column in rows.T.astype(np.int64)])
+    assert len(matrix) == 50 and (matrix.genotype_counts() == recounted).all()
+
+@pytest.fixture
+def genome_db(tmp_path):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    snp_pairs_file.write_text(SNP_PAIRS)
+    db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(read_snp_pairs_file(str(snp_pairs_file)))
+    yield db
+    db.close_connection()
+
+def test_matrix_follows_ingests_and_the_reference(genome_db):
+    genome_db.update_patient_and_genome_data(genome({'rs1': 'AG', 'rs2': 'CC', 'rs9': 'TT'}), "p1", "One")
+    genome_db.update_patient_and_genome_data(genome({'rs1': 'TC', 'rs2': 'CT'}), "p2", "Two")
+    # Loaded from the database as from the cache.
+    genome_db.genome_cache.invalidate("p2")
+    assert genome_db.cohort_matrix_stats()["patients"] == 2
+    prevalence = genome_db.fetch_cohort_snp_pair_prevalence()
+    assert prevalence[['rsid', 'rsid_genotypes', 'called', 'carriers', 'prevalence']].values.tolist() == [
+        ['rs1', 'Rs1(A;G)', 2, 2, 1.0], ['rs2', 'Rs2(C;C)', 2, 1, 0.5], ['rs1', 'Rs1(G;G)', 2, 0, 0.0], ['rs3', 'Rs3(A;A)', 0, 0, 0.0]]
+    # Updated in place on ingest.
+    genome_db.update_patient_and_genome_data(genome({'rs1': 'GG', 'rs3': 'AA'}), "p3", "Three")
+    [rs1, rs3] = genome_db.fetch_cohort_allele_frequencies(['rs1', 'rs404', 'rs3'])
+    assert rs1['patients'] == 3 and rs1['called'] == 3
+    assert rs1['alleles'] == {'A': {'count': 1, 'frequency': 1 / 6, 'carriers': 1}, 'C': {'count': 1, 'frequency': 1 / 6, 'carriers': 1},
+                              'G': {'count': 3, 'frequency': 0.5, 'carriers': 2}, 'T': {'count': 1, 'frequency': 1 / 6, 'carriers': 1}}
+    assert rs1['genotypes'] == {'AG': {'count': 1, 'frequency': 1 / 3}, 'CT': {'count': 1, 'frequency': 1 / 3}, 'GG': {'count': 1, 'frequency': 1 / 3}}
+    assert rs3['called'] == 1
+    # A new SNP pair rsid: the matrix is rebuilt with its column.
+    genome_db.update_or_insert_snp_pair(SnpPair(rsid_genotypes="Rs9(A;T)", magnitude=1, risk=1, notes="", rsid="rs9", allele1="A", allele2="T"))
+    assert genome_db.fetch_cohort_allele_frequencies(['rs9'])[0]['alleles'] == {'T': {'count': 2, 'frequency': 1.0, 'carriers': 1}}
+
+def test_cohort_endpoints(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    snp_pairs_file.write_text(SNP_PAIRS)
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    from main import app
+    with TestClient(app) as client:
+        genome_db = app.state.genome_controller.genome_service.genome_db_manager
+        genome_db.update_patient_and_genome_data(genome({'rs1': 'AG', 'rs2': 'CC'}), "p1", "One")
+        response = client.get("/cohort/allele_frequencies", params={"rsid": ["rs2"]})
+        assert response.status_code == 200 and response.json()[0]['genotypes'] == {'CC': {'count': 1, 'frequency': 1.0}}
+        assert client.get("/cohort/allele_frequencies").status_code == 422
+        response = client.get("/cohort/snp_pair_prevalence", params={"limit": 2})
+        assert [(pair['rsid_genotypes'], pair['carriers']) for pair in response.json()] == [('Rs1(A;G)', 1), ('Rs2(C;C)', 1)]
+        assert client.get("/cohort/stats").json()["patients"] == 1
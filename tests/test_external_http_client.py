@@ -0,0 +1,136 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.external_http_client import ExternalHttpClient, ExternalSourceError, retry_after_seconds
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+class StubHandler(BaseHTTPRequestHandler):
+    # External source stand-in, keeping connections alive; `server` records the requests by
+    # path, the client ports (connections) and the most requests handled at once.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        with server.lock:
+            server.requests[path] += 1
+            server.ports.add(self.client_address[1])
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            count = server.requests[path]
+        try:
+            if path == "/slow":
+                time.sleep(0.05)
+                self._respond(200, {"ok": True})
+            elif path == "/hang":
+                time.sleep(1)
+                self._respond(200, {"ok": True})
+            elif path == "/flaky":
+                self._respond(503 if count <= 2 else 200, {"count": count})
+            elif path == "/throttled":
+                self._respond(429 if count == 1 else 200, {"count": count}, {"Retry-After": "0"})
+            else:
+                self._respond(404, {"message": "unknown species"})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _respond(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = Counter()
+    server.ports = set()
+    server.active = server.max_active = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def run_with_client(scenario, **kwargs):
+    async def run():
+        client = ExternalHttpClient(backoff=0.01, **kwargs)
+        try:
+            return await scenario(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+def test_concurrent_requests_share_a_bounded_pool(upstream):
+    async def scenario(client):
+        return await asyncio.gather(*(client.get_json(f"{upstream.url}/slow") for _ in range(40)))
+    results = run_with_client(scenario, max_per_host=4)
+    assert results == [{"ok": True}] * 40
+    # At most 4 at a time, over at most 4 kept-alive connections.
+    assert upstream.requests["/slow"] == 40
+    assert 1 < upstream.max_active <= 4 and len(upstream.ports) <= 4
+
+def test_failures_are_retried_with_backoff(upstream):
+    async def scenario(client):
+        return await client.get_json(f"{upstream.url}/flaky"), await client.get_json(f"{upstream.url}/throttled"), client.stats()
+    flaky, throttled, stats = run_with_client(scenario, retries=3)
+    assert (flaky, throttled) == ({"count": 3}, {"count": 2})
+    assert (stats["requests"], stats["retried"], stats["failures"]) == (5, 3, 0)
+
+def test_client_errors_are_not_retried(upstream):
+    async def scenario(client):
+        with pytest.raises(ExternalSourceError) as error:
+            await client.get_json(f"{upstream.url}/info/assembly/unknown")
+        return error.value
+    error = run_with_client(scenario, retries=3)
+    assert error.status_code == 404 and "unknown species" in str(error)
+    assert upstream.requests["/info/assembly/unknown"] == 1
+
+def test_retries_give_up_on_timeouts(upstream):
+    async def scenario(client):
+        started = time.time()
+        with pytest.raises(ExternalSourceError) as error:
+            await client.get_json(f"{upstream.url}/hang")
+        return error.value, time.time() - started
+    error, seconds = run_with_client(scenario, timeout=0.1, retries=1)
+    assert error.status_code is None and "ReadTimeout" in str(error)
+    assert upstream.requests["/hang"] == 2 and seconds < 0.9
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("3") == 3.0
+    assert retry_after_seconds(None) is None and retry_after_seconds("soon") is None
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+def test_failing_source_is_bad_gateway(upstream, tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('ENSEMBL_URL', upstream.url)
+    monkeypatch.delenv('RESPONSE_CACHE_PATH', raising=False)
+    from main import app
+    with TestClient(app) as client:
+        response = client.get("/snp_research/fetch_chromosomes/ensembl")
+        assert response.status_code == 502 and "404" in response.json()["detail"]
+        assert client.get("/snp_research/external_cache_stats").json()["http"]["failures"] == 1
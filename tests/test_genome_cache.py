@@ -0,0 +1,99 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+import pytest
+from data_layer.genome_cache import GenomeColumnarCache, cache_directory, encode_genome_frame
+from data_layer.rsid_codes import encode_rsid
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import GenomeService, read_snp_pairs_file
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+GENOME = pd.DataFrame({
+    'rsid': ['rs3', 'i700', 'VG01S1234', 'RS5', 'rs1'],
+    'chromosome': ['1', 'X', 'MT', '0', '22'],
+    'position': [10, 20, 30, 40, 4294967295],
+    'genotype': ['AG', '--', 'A', '00', 'DI'],
+})
+
+def test_rsid_codes():
+    assert encode_rsid('rs123') == 123
+    assert encode_rsid('i5000') == -5000
+    assert encode_rsid('VG01S1234') == encode_rsid(None) == 0
+
+def test_columns_are_compact():
+    columns, _ = encode_genome_frame(GENOME)
+    assert [column.dtype for column in columns] == [np.int64, np.uint8, np.uint32, np.uint8]
+    assert columns.rsid.tolist() == [3, -700, 0, 5, 1]
+
+def test_round_trip_is_lossless(tmp_path):
+    cache = GenomeColumnarCache(str(tmp_path))
+    cache.write("patient/1", *encode_genome_frame(GENOME))
+    columns = cache.load("patient/1")
+    assert all(isinstance(column, np.memmap) for column in columns)
+    pd.testing.assert_frame_equal(cache.frame("patient/1").sort_values('position', ignore_index=True), GENOME)
+    selected = cache.frame("patient/1", rsids=['rs1', 'VG01S1234', 'rs5', 'rs404'])
+    assert selected['rsid'].tolist() == ['VG01S1234', 'rs1']
+
+def test_positions_outside_uint32_round_trip(tmp_path):
+    cache = GenomeColumnarCache(str(tmp_path))
+    genome = GENOME.assign(position=[10, -5, 30, 2 ** 32 + 7, 4294967295])
+    cache.write("patient1", *encode_genome_frame(genome))
+    assert sorted(cache.frame("patient1")['position'].tolist()) == sorted(genome['position'].tolist())
+
+def test_missing_and_invalidated_entries(tmp_path):
+    cache = GenomeColumnarCache(str(tmp_path))
+    assert cache.load("patient1") is None and cache.frame("patient1") is None
+    cache.write("patient1", *encode_genome_frame(GENOME))
+    cache.write("patient1", *encode_genome_frame(GENOME.head(2)))
+    assert len(cache.frame("patient1")) == 2
+    assert os.listdir(tmp_path) == ["patient1"]
+    cache.invalidate("patient1")
+    assert cache.load("patient1") is None
+
+def test_failed_write_leaves_no_staging(tmp_path, monkeypatch):
+    cache = GenomeColumnarCache(str(tmp_path))
+    cache.write("patient1", *encode_genome_frame(GENOME))
+    rename = os.rename
+    def concurrent_write(source, destination):
+        # Another write of the patient swaps its entry in first.
+        if destination == cache.path("patient1"):
+            os.makedirs(destination)
+            open(os.path.join(destination, "other"), "w").close()
+        rename(source, destination)
+    monkeypatch.setattr(os, "rename", concurrent_write)
+    with pytest.raises(OSError):
+        cache.write("patient1", *encode_genome_frame(GENOME.head(2)))
+    assert os.listdir(tmp_path) == ["patient1"]
+
+def test_no_cache_for_in_memory_databases():
+    assert cache_directory(':memory:') is None
+    assert cache_directory('/data/genome.db') == '/data/genome.db.cache'
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    db.snp_df = read_snp_pairs_file(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv'))
+    db.save_snp_pairs_to_db(db.snp_df)
+    yield db
+    db.close_connection()
+
+def test_ingest_caches_the_genome(genome_db):
+    # The demo genome, plus reference rsids with genotypes drawn from their pairs.
+    demo_df = pd.read_csv(os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'), sep='\t', comment='#', names=['rsid', 'chromosome', 'position', 'genotype'], dtype=str)
+    pairs = genome_db.snp_df.drop_duplicates('rsid').head(500)
+    reference_df = pd.DataFrame({'rsid': pairs['rsid'], 'chromosome': '2', 'position': range(len(pairs)),
+                                 'genotype': [(a1 + a2, a2 + a1, '--')[i % 3] for i, (a1, a2) in enumerate(zip(pairs['allele1'], pairs['allele2']))]})
+    genome_df = pd.concat([demo_df, reference_df], ignore_index=True)
+    genome_db.update_patient_and_genome_data(genome_df, "demo", "Demo")
+    assert len(genome_db.load_patient_genome_columns("demo").rsid) == len(genome_df)
+    cached = genome_db.fetch_patient_genome_frame("demo")
+    from_sql = genome_db.patient_genome_repository.fetch_patient_genome_frame("demo")
+    assert len(cached) == 500
+    pd.testing.assert_frame_equal(cached.sort_values('rsid', ignore_index=True), from_sql.sort_values('rsid', ignore_index=True))
+    service = GenomeService.__new__(GenomeService)
+    service.genome_db_manager = genome_db
+    report = service.match_patient_genome("demo")
+    genome_db.genome_cache.invalidate("demo")
+    pd.testing.assert_frame_equal(report, service.match_patient_genome("demo"))
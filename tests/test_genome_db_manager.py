@@ -36,7 +36,7 @@ def test_create_tables(genome_db):
     
 def test_update_or_insert_snp_pair(genome_db):
     genome_db.update_or_insert_snp_pair("rs1234(A;A)", 1.0, 0.5, "note", "rs1234", "A", "A")
-    result = genome_db.sql_worker.execute("SELECT * FROM snp_pairs WHERE rsid='rs1234';")
+    result = genome_db.sql_worker.execute("SELECT * FROM snp_pairs WHERE rsid=1234;")
     result = fetch_one(result)
     assert result is not None
     assert result[0] == "rs1234(A;A)"
@@ -75,7 +75,7 @@ def test_update_or_insert_patient_genome_data(genome_db):
     genome_db.sql_worker.execute("DELETE FROM patients;DELETE FROM patient_genome_data;")
     genome_db.update_or_insert_patient("patient1", "John Doe")
     genome_db.update_or_insert_patient_genome_data("rs1234", "patient1", "1", 12345, "AA")
-    result = genome_db.sql_worker.execute("SELECT * FROM patient_genome_data WHERE rsid='rs1234';")
+    result = genome_db.sql_worker.execute("SELECT * FROM patient_genome_data WHERE rsid=1234;")
     result = fetch_one(result)
     assert result is not None
     assert result[1] == "rs1234"
@@ -0,0 +1,100 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import gzip
+import io
+import zipfile
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from models import Patient
+from services.genome_formats import GENOME_FORMATS, open_genome_file, sniff_genome_format
+from services.genome_ingest_pipeline import GenomeIngestPipeline
+
+# The same calls in each format: (rsid, chromosome, position, genotype) as 23andMe writes them.
+CALLS = [("rs4477212", "1", "82154", "AA"), ("rs3094315", "1", "752566", "AG"), ("i3000001", "X", "2700157", "T"),
+         ("rs9786140", "Y", "2655180", "--"), ("rs28358280", "MT", "152", "C"), ("rs5939319", "XY", "2700027", "GG")]
+
+def twenty_three_and_me(calls):
+    return "# This data file generated by 23andMe\n# rsid\tchromosome\tposition\tgenotype\n" + "".join("\t".join(call) + "\n" for call in calls)
+
+def ancestry_dna(calls):
+    numbers = {"X": "23", "Y": "24", "XY": "25", "MT": "26"}
+    lines = ["#AncestryDNA raw data download\n", "rsid\tchromosome\tposition\tallele1\tallele2\n"]
+    for rsid, chromosome, position, genotype in calls:
+        alleles = ("0", "0") if genotype == "--" else (genotype[0], genotype[-1])
+        lines.append(f"{rsid}\t{numbers.get(chromosome, chromosome)}\t{position}\t{alleles[0]}\t{alleles[1]}\n")
+    return "".join(lines)
+
+def myheritage(calls, comments=True):
+    lines = ["# MyHeritage DNA raw data.\n"] if comments else []
+    lines.append('RSID,CHROMOSOME,POSITION,RESULT\n')
+    lines.extend(",".join(f'"{value}"' for value in call) + "\n" for call in calls)
+    return "".join(lines)
+
+def vcf(calls):
+    lines = ["##fileformat=VCFv4.1\n", '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n',
+             "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"]
+    for rsid, chromosome, position, genotype in calls:
+        bases = list(dict.fromkeys(genotype.replace("-", "")))
+        ref, alt = (bases + ["."])[:2] if bases else ("N", ".")
+        indices = [str(bases.index(base)) for base in genotype] if bases else [".", "."]
+        lines.append(f"chr{'M' if chromosome == 'MT' else chromosome}\t{position}\t{rsid}\t{ref}\t{alt}\t.\tPASS\t.\tGT:GQ\t{'/'.join(indices)}:99\n")
+    return "".join(lines)
+
+FORMATS = {"23andme": twenty_three_and_me, "ancestrydna": ancestry_dna, "myheritage": myheritage, "vcf": vcf}
+
+def expected_calls(name):
+    # AncestryDNA writes both alleles of a haploid call (X in men, MT), so reads them back doubled.
+    if name == "ancestrydna":
+        return [(rsid, chromosome, position, genotype * 2 if len(genotype) == 1 else genotype) for rsid, chromosome, position, genotype in CALLS]
+    return CALLS
+
+def parsed(source):
+    pipeline = GenomeIngestPipeline(None, chunk_rows=4)
+    with open_genome_file(source) as (genome_format, lines):
+        frames = [chunk.frame for chunk in pipeline.parse(lines, genome_format)]
+    return genome_format.name, [tuple(row) for frame in frames for row in frame.itertuples(index=False)]
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_formats_parse_to_the_same_calls(name):
+    assert parsed(io.BytesIO(FORMATS[name](CALLS).encode())) == (name, expected_calls(name))
+
+def test_familytreedna_csv_without_comments():
+    assert parsed(io.BytesIO(myheritage(CALLS, comments=False).encode())) == ("myheritage", CALLS)
+
+def test_vcf_genotypes():
+    lines = ["##fileformat=VCFv4.2\n",
+             "1\t10\trs1\tA\tG,T\t.\t.\t.\tGT\t1|2\n",
+             "1\t11\trs2;rs22\tC\tT\t.\t.\t.\tGQ:GT\t50:0/1\n",
+             "1\t12\t.\tG\t.\t.\t.\t.\tGT\t./.\n",
+             "1\t13\trs4\tG\tA\t.\t.\t.\tGT\t0/3\n"]
+    _, calls = parsed([line.encode() for line in lines])
+    assert calls == [("rs1", "1", "10", "GT"), ("rs2", "1", "11", "CT"), ("", "1", "12", "--"), ("rs4", "1", "13", "--")]
+
+@pytest.mark.parametrize("compression", ["gzip", "zip"])
+def test_compressed_files(tmp_path, compression):
+    content = ancestry_dna(CALLS).encode()
+    path = tmp_path / f"AncestryDNA.{compression}"
+    if compression == "gzip":
+        path.write_bytes(gzip.compress(content))
+    else:
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("__MACOSX/._AncestryDNA.txt", b"")
+            archive.writestr("AncestryDNA.txt", content)
+    assert parsed(str(path)) == ("ancestrydna", expected_calls("ancestrydna"))
+
+def test_unrecognized_format():
+    with pytest.raises(ValueError, match="Unrecognized genome file format"):
+        sniff_genome_format([b"<html>\n", b"<body>not a genome</body>\n"])
+    assert sniff_genome_format([b"# rsid\tchromosome\tposition\tgenotype\n"]) is GENOME_FORMATS["23andme"]
+
+def test_pipeline_imports_every_format(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    for name, write in FORMATS.items():
+        path = tmp_path / f"{name}.txt.gz"
+        path.write_bytes(gzip.compress(write(CALLS).encode()))
+        summary = GenomeIngestPipeline(db).run(str(path), Patient(patient_id=name, patient_name=name))
+        assert (summary.total_rows, summary.imported_rows, summary.rejected_rows) == (6, 6, 0)
+    rows = db.patient_genome_repository.sql_worker.execute("SELECT patient_id, chromosome, genotype FROM patient_genome_data WHERE rsid = -3000001 ORDER BY patient_id")
+    assert rows == [(name, "X", expected_calls(name)[2][3]) for name in sorted(FORMATS)]
+    db.close_connection()
@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from models import Patient
+from services.genome_ingest_pipeline import GenomeIngestPipeline
+
+DEMO_GENOME_FILE = os.path.join(os.path.dirname(__file__), '../data/genomes/genome_demo_file.txt')
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    yield db
+    db.close_connection()
+
+def genome_lines(rows):
+    yield b"# rsid\tchromosome\tposition\tgenotype\n"
+    for i in range(rows):
+        yield f"rs{i}\t{i % 22 + 1}\t{1000 + i}\t{'ag' if i % 2 else 'CC'}\n".encode()
+
+def test_pipeline_demo_file(genome_db):
+    pipeline = GenomeIngestPipeline(genome_db, chunk_rows=10)
+    summary = pipeline.run(DEMO_GENOME_FILE, Patient(patient_id="patient1", patient_name="demo"))
+    assert summary.total_rows == 29
+    assert summary.imported_rows == 29
+    assert summary.rejected_rows == 0
+    assert pipeline.stats["parse"].chunks == 3
+    assert pipeline.stats["parse"].bytes == os.path.getsize(DEMO_GENOME_FILE)
+    assert pipeline.stats["write"].rows_out == 29
+    rows = genome_db.patient_genome_repository.sql_worker.execute("SELECT rsid, chromosome, position, genotype FROM patient_genome_data WHERE rsid = 2465126")
+    assert rows == [(2465126, "1", 947034, "AA")]
+
+def test_pipeline_chunks_are_bounded(genome_db):
+    pipeline = GenomeIngestPipeline(genome_db, chunk_rows=100)
+    chunks = list(pipeline.parse(genome_lines(1050)))
+    assert [len(chunk.frame) for chunk in chunks] == [100] * 10 + [50]
+    assert sum(chunk.nbytes for chunk in chunks) == sum(len(line) for line in genome_lines(1050))
+
+def test_pipeline_normalizes_and_rejects(genome_db):
+    lines = list(genome_lines(4)) + [b"rs99\t1\tnot-a-position\tAA\n", b"rs100\t2\t5\n"]
+    pipeline = GenomeIngestPipeline(genome_db, chunk_rows=3)
+    summary = pipeline.run(lines, Patient(patient_id="patient1", patient_name="lines"))
+    assert (summary.total_rows, summary.imported_rows, summary.rejected_rows) == (6, 4, 2)
+    assert [(r.row, r.key) for r in summary.rejections] == [(4, "rs99"), (5, "rs100")]
+    assert pipeline.stats["validate"].rows_in == 6
+    assert pipeline.stats["validate"].rows_out == 4
+    rows = genome_db.patient_genome_repository.sql_worker.execute("SELECT genotype FROM patient_genome_data WHERE rsid = 1")
+    assert rows == [("AG",)]
+
+def test_pipeline_counts_all_rejections_and_keeps_the_first(genome_db):
+    lines = list(genome_lines(3)) + [f"rs{i}\t1\tnot-a-position\tAA\n".encode() for i in range(100, 110)]
+    pipeline = GenomeIngestPipeline(genome_db, chunk_rows=4, max_rejections=3)
+    summary = pipeline.run(lines, Patient(patient_id="patient1", patient_name="lines"))
+    assert (summary.total_rows, summary.imported_rows, summary.rejected_rows) == (13, 3, 10)
+    assert [r.key for r in summary.rejections] == ["rs100", "rs101", "rs102"]
@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import GenomeService
+
+@pytest.fixture
+def genome_service(tmp_path):
+    db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    for patient in range(2):
+        db.update_patient_and_genome_data(pd.DataFrame({
+            "rsid": [f"rs{i}" for i in range(100)],
+            "chromosome": ["6" if i % 2 else "X" for i in range(100)],
+            "position": [1000 * i + patient for i in range(100)],
+            "genotype": ["AG"] * 100,
+        }), f"patient{patient}", f"Patient {patient}")
+    service = GenomeService.__new__(GenomeService)
+    service.genome_db_manager = db
+    yield service
+    db.close_connection()
+
+def region_records(genome_service, **kwargs):
+    records, cursor = [], None
+    while True:
+        page = genome_service.fetch_genome_region(cursor=cursor, **kwargs)
+        records.extend(page.records)
+        cursor = page.next_cursor
+        if cursor is None:
+            return records
+
+def test_region_of_every_patient(genome_service):
+    records = region_records(genome_service, chromosome="chr6", start=31000, end=35000, page_size=2)
+    assert [(record["position"], record["patient_id"]) for record in records] == [
+        (31000, "patient0"), (31001, "patient1"), (33000, "patient0"), (33001, "patient1"), (35000, "patient0")]
+    assert {record["chromosome"] for record in records} == {"6"}
+
+def test_region_of_one_patient(genome_service):
+    records = region_records(genome_service, chromosome="x", start=0, end=10000, patient_id="patient1")
+    assert [record["rsid"] for record in records] == ["rs0", "rs2", "rs4", "rs6", "rs8"]
+    assert region_records(genome_service, chromosome="6", start=2, end=999) == []
+
+def test_invalid_region(genome_service):
+    with pytest.raises(ValueError):
+        genome_service.fetch_genome_region(chromosome="6", start=10, end=1)
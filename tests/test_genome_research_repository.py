@@ -1,4 +1,8 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 import pytest
+import pandas as pd
 from unittest.mock import patch, MagicMock
 from repositories.genome_research_repository import GenomeResearchRepository
 
@@ -44,4 +48,42 @@ def test_fetch_snp_pairs_data_negative(genome_repository):
     with patch.object(genome_repository, 'execute_query', side_effect=Exception("DB Error")) as mock_method:
         result = genome_repository.fetch_snp_pairs_data()
         mock_method.assert_called_once()
-        assert result is None
\ No newline at end of file
+        assert result is None
+
+# Bulk import
+
+@pytest.fixture
+def file_repository(tmp_path):
+    repository = GenomeResearchRepository(db_path=str(tmp_path / "genome.db"))
+    yield repository
+    repository.close_connection()
+
+def snp_pairs_df():
+    return pd.DataFrame({
+        "rsid_genotypes": ["Rs1234(A;A)", "Rs1234(A;G)", "Rs5678(G;G)", None, "Rs9999(C;C)"],
+        "magnitude": [1.0, None, 2.0, 1.0, "high"],
+        "risk": [0.5, 1.0, 1.5, 1.0, 1.0],
+        "notes": ["note1", None, "note3", "note4", "note5"],
+        "rsid": ["rs1234", "rs1234", "rs5678", "rs0000", "rs9999"],
+        "allele1": ["A", "A", "G", "A", "C"],
+        "allele2": ["A", "G", "G", "A", "C"]
+    })
+
+def test_save_snp_pairs_to_db_bulk_summary(file_repository):
+    summary = file_repository.save_snp_pairs_to_db(snp_pairs_df(), chunk_size=2)
+    assert summary.total_rows == 5
+    assert summary.imported_rows == 3
+    assert summary.rejected_rows == 2
+    assert [(r.row, r.reason) for r in summary.rejections] == [(3, "missing rsid_genotypes"), (4, "magnitude is not a number")]
+    rows = file_repository.sql_worker.execute("SELECT rsid_genotypes, magnitude, notes FROM snp_pairs ORDER BY rsid_genotypes")
+    assert rows == [("Rs1234(A;A)", 1.0, "note1"), ("Rs1234(A;G)", None, ""), ("Rs5678(G;G)", 2.0, "note3")]
+
+def test_save_snp_pairs_to_db_bulk_upserts(file_repository):
+    file_repository.save_snp_pairs_to_db(snp_pairs_df())
+    updated = snp_pairs_df().iloc[:1].copy()
+    updated["magnitude"] = [3.0]
+    summary = file_repository.save_snp_pairs_to_db(updated)
+    assert summary.imported_rows == 1
+    rows = file_repository.sql_worker.execute("SELECT magnitude FROM snp_pairs WHERE rsid_genotypes = 'Rs1234(A;A)'")
+    assert rows == [(3.0,)]
+    assert file_repository.sql_worker.execute("SELECT COUNT(*) FROM snp_pairs") == [(3,)]
@@ -0,0 +1,126 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import gzip
+import io
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from models import Patient
+from services.genome_ingest_pipeline import GenomeIngestPipeline, GenomeTooLarge
+from services.upload_stream import UploadStalled, UploadStream
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+DEMO_GENOME_FILE = os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt')
+
+def genome_bytes(rows):
+    return b"# rsid\tchromosome\tposition\tgenotype\n" + b"".join(f"rs{i + 1}\t{i % 22 + 1}\t{1000 + i}\tAG\n".encode() for i in range(rows))
+
+def test_stream_reads_chunks_as_they_arrive():
+    stream = UploadStream(max_bytes=100, queue_chunks=2)
+    assert stream.feed(b"rs1\t1\t") and stream.feed(b"10\tAA\n")
+    # The queue is full: the next chunk waits for the reader.
+    feeder = threading.Thread(target=lambda: (stream.feed(b"rs2\t1\t20\tGG\n"), stream.finish()))
+    feeder.start()
+    feeder.join(0.2)
+    assert feeder.is_alive()
+    reader = io.BufferedReader(stream)
+    assert reader.readline() == b"rs1\t1\t10\tAA\n"
+    feeder.join(5)
+    assert reader.read() == b"rs2\t1\t20\tGG\n"
+
+def test_stream_limits():
+    stream = UploadStream(max_bytes=10, queue_chunks=4)
+    assert stream.feed(b"0123456789") and not stream.feed(b"!")
+    assert stream.read(100) == b"0123456789"
+    with pytest.raises(GenomeTooLarge):
+        stream.read(100)
+    stalled = UploadStream(idle_timeout=0.05)
+    with pytest.raises(UploadStalled):
+        stalled.read(100)
+    # A slow sender (a chunk within each idle timeout) is abandoned at the overall deadline.
+    slow = UploadStream(idle_timeout=5, max_seconds=0.2)
+    slow.feed(b"rs1")
+    assert slow.read(100) == b"rs1"
+    with pytest.raises(UploadStalled, match="complete"):
+        slow.read(100)
+    # A closed reader (a failed ingest) releases the sender.
+    stalled.close()
+    assert not stalled.feed(b"more")
+
+def test_rows_are_written_while_the_upload_is_received(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    stream = UploadStream(queue_chunks=2)
+    progress = []
+    pipeline = GenomeIngestPipeline(db, chunk_rows=10, progress=progress.append)
+    summaries = []
+    ingest = threading.Thread(target=lambda: summaries.append(pipeline.run(io.BufferedReader(stream), Patient(patient_id="upload", patient_name="upload"))))
+    ingest.start()
+    data = genome_bytes(30)
+    half = data.index(b"rs21\t")
+    stream.feed(data[:half])
+    deadline = time.time() + 10
+    while pipeline.stats["write"].rows_out < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    # Written before the rest of the file was sent.
+    assert pipeline.stats["write"].rows_out >= 10 and ingest.is_alive()
+    # Staged: the writer is free for other writes meanwhile, and the patient is not visible yet.
+    writer = threading.Thread(target=lambda: db.sql_worker.run_in_transaction(lambda connection: connection.execute("INSERT INTO patients VALUES ('other', 'other')")))
+    writer.start()
+    writer.join(5)
+    assert not writer.is_alive()
+    assert db.sql_worker.execute("SELECT COUNT(*) FROM patient_genome_data WHERE patient_id = 'upload'")[0][0] == 0
+    # Staged in a TEMP table: nothing is left in the database file if the process dies.
+    assert db.sql_worker.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%staging%'")[0][0] == 0
+    stream.feed(data[half:])
+    stream.finish()
+    ingest.join(10)
+    assert summaries[0].imported_rows == 30 and progress[-1] == 30
+    db.close_connection()
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('UPLOAD_MAX_BYTES', str(64 * 1024))
+    monkeypatch.setenv('UPLOAD_MAX_ROWS', "1000")
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+def patient_ids(client):
+    return [patient["patient_id"] for patient in client.get("/patient_genome/patient_profile").json()]
+
+def test_upload_genome(client):
+    with open(DEMO_GENOME_FILE, "rb") as genome_file:
+        response = client.post("/patient_genome/upload_patient_genome", params={"file_name": "genome_demo_file.txt"}, content=genome_file.read())
+    assert response.status_code == 201
+    load = response.json()
+    assert load["state"] == "succeeded" and load["imported_rows"] == 29
+    assert client.get(response.headers["Location"]).json()["patient_id"] == load["patient_id"]
+    assert patient_ids(client) == [load["patient_id"]]
+
+def test_upload_gzip_genome_in_chunks(client):
+    data = gzip.compress(genome_bytes(500))
+    chunks = (data[start:start + 1000] for start in range(0, len(data), 1000))
+    response = client.post("/patient_genome/upload_patient_genome", content=chunks, headers={"Content-Type": "application/gzip"})
+    assert response.status_code == 201 and response.json()["imported_rows"] == 500
+
+def test_upload_limits(client):
+    response = client.post("/patient_genome/upload_patient_genome", content=genome_bytes(1001))
+    assert response.status_code == 413 and "1000 rows" in response.json()["detail"]
+    # Over the size limit: refused from its Content-Length, or (sent chunked) once received.
+    too_large = b"#" * (64 * 1024 + 1)
+    assert client.post("/patient_genome/upload_patient_genome", content=too_large).status_code == 413
+    response = client.post("/patient_genome/upload_patient_genome", content=(too_large[start:start + 4096] for start in range(0, len(too_large), 4096)))
+    assert response.status_code == 413
+    response = client.post("/patient_genome/upload_patient_genome", content=b"<html>not a genome</html>\n")
+    assert response.status_code == 400 and "Unrecognized genome file format" in response.json()["detail"]
+    # Nothing of the refused uploads was kept.
+    assert patient_ids(client) == []
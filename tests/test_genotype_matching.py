@@ -0,0 +1,101 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import numpy as np
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from genotype_matching import FULL_REPORT_COLUMNS, NO_CALL, encode_genotypes, genotype_code, match_genotypes, match_patient
+from services.genome_service import GenomeService, read_snp_pairs_file
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+# The previous SQL computation of genotype_match, the reference the engine is checked against.
+SQL_FULL_REPORT = '''
+    SELECT 'rs' || pgd.rsid, sp.rsid_genotypes, pgd.genotype, sp.allele1, sp.allele2,
+           (pgd.genotype = sp.allele1 || sp.allele2 OR pgd.genotype = sp.allele2 || sp.allele1) AS genotype_match
+    FROM patient_genome_data pgd JOIN snp_pairs sp ON pgd.rsid = sp.rsid
+    WHERE pgd.patient_id = ?
+'''
+
+def test_genotype_codes():
+    assert genotype_code("AG") == genotype_code("GA") == genotype_code("ga")
+    assert genotype_code("AA") != genotype_code("AG")
+    assert genotype_code("A") == genotype_code("AA")
+    for no_call in ["--", "00", "", None, "AN", "AGT"]:
+        assert genotype_code(no_call) == NO_CALL
+    assert encode_genotypes(np.array(["AG", None, "GA", "--"], dtype=object)).tolist() == [genotype_code("AG"), NO_CALL, genotype_code("AG"), NO_CALL]
+
+def test_match_genotypes():
+    genotypes = ["AG", "GA", "TC", "AA", "--", "DI", "CT"]
+    allele1 = ["A", "A", "A", "A", "A", "I", "A"]
+    allele2 = ["G", "G", "G", "G", "G", "D", "A"]
+    # Unordered, strand-flipped (TC is AG on the other strand), mismatched, no-call, indel, mismatched.
+    assert match_genotypes(genotypes, allele1, allele2) == [1, 1, 1, 0, None, 1, 0]
+    assert match_genotypes([], [], []) == []
+
+def test_palindromic_rsids_are_not_strand_flipped():
+    # rs1007371 has (A;A) and (T;T) pairs: AA is only (A;A); on an A/G rsid, TC is AG on the other strand, GG is not CC.
+    assert match_genotypes(['AA', 'AA', 'TT'], ['A', 'T', 'T'], ['A', 'T', 'T'], rsids=['rs1007371'] * 3) == [1, 0, 1]
+    assert match_genotypes(['AT', 'TA'], ['A', 'A'], ['T', 'T'], rsids=['rs2', 'rs2']) == [1, 1]
+    assert match_genotypes(['TC', 'GG', 'GG'], ['A', 'C', 'A'], ['G', 'C', 'G'], rsids=['rs3', 'rs3', 'rs3']) == [1, 0, 0]
+    genome_df = pd.DataFrame({'patient_id': 'p1', 'patient_name': 'One', 'rsid': ['rs1007371', 'rs1012672'], 'chromosome': '1', 'position': [1, 2], 'genotype': ['AA', 'GG']})
+    snp_pairs_df = pd.DataFrame({'rsid': ['rs1007371', 'rs1007371', 'rs1012672', 'rs1012672'], 'rsid_genotypes': ['Rs1007371(A;A)', 'Rs1007371(T;T)', 'Rs1012672(C;C)', 'Rs1012672(G;G)'],
+                                 'magnitude': 1.0, 'risk': 2.0, 'notes': '', 'allele1': ['A', 'T', 'C', 'G'], 'allele2': ['A', 'T', 'C', 'G']})
+    assert match_patient(genome_df, snp_pairs_df)['genotype_match'].tolist() == [1, 0, 0, 1]
+
+@pytest.fixture(scope="module")
+def demo_service(tmp_path_factory):
+    db = GenomeDatabaseManager(db_path=str(tmp_path_factory.mktemp("db") / "genome.db"))
+    snp_df = read_snp_pairs_file(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv'))
+    db.save_snp_pairs_to_db(snp_df)
+    # The demo genome, plus every reference rsid with a genotype drawn from its pairs, flipped or called off.
+    demo_df = pd.read_csv(os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'), sep='\t', comment='#', names=['rsid', 'chromosome', 'position', 'genotype'], dtype=str)
+    flip = str.maketrans("ACGT", "TGCA")
+    rsids = snp_df.drop_duplicates('rsid')
+    variants = [(a2 + a1, (a1 + a2).translate(flip), "--", "AA")[i % 4] for i, (a1, a2) in enumerate(zip(rsids['allele1'], rsids['allele2']))]
+    reference_df = pd.DataFrame({'rsid': rsids['rsid'], 'chromosome': '1', 'position': range(len(rsids)), 'genotype': variants})
+    db.update_patient_and_genome_data(demo_df, "demo", "Demo")
+    db.update_patient_and_genome_data(reference_df, "reference", "Reference")
+    service = GenomeService.__new__(GenomeService)
+    service.genome_db_manager = db
+    yield service
+    db.close_connection()
+
+@pytest.mark.parametrize("patient_id", ["demo", "reference"])
+def test_engine_agrees_with_sql(demo_service, patient_id):
+    db = demo_service.genome_db_manager
+    sql = {(rsid, key): (genotype, allele1, allele2, match) for rsid, key, genotype, allele1, allele2, match in db.sql_worker.execute(SQL_FULL_REPORT, (patient_id,))}
+    report = demo_service.match_patient_genome(patient_id)
+    assert list(report.columns) == FULL_REPORT_COLUMNS
+    assert len(report) == len(sql)
+    flip = str.maketrans("ACGT", "TGCA")
+    reference_alleles = {}
+    for (rsid, _), (_, allele1, allele2, _) in sql.items():
+        reference_alleles.setdefault(rsid, set()).update(allele1 + allele2)
+    for row in report.itertuples(index=False):
+        genotype, allele1, allele2, sql_match = sql[(row.rsid, row.rsid_genotypes)]
+        if genotype_code(genotype) == NO_CALL:
+            assert row.genotype_match is pd.NA
+        elif sql_match:
+            assert row.genotype_match == 1
+        else:
+            # Only strand flips are matched beyond the SQL version: of genotypes with alleles outside
+            # their rsid's, and not on palindromic (A/T, C/G) rsids.
+            alleles = reference_alleles[row.rsid]
+            flippable = not set(genotype) <= alleles and {allele.translate(flip) for allele in alleles} != alleles
+            flipped = genotype.translate(flip) in (allele1 + allele2, allele2 + allele1)
+            assert row.genotype_match == int(flippable and flipped)
+
+def test_paged_full_report_uses_engine(demo_service):
+    page = demo_service.genome_db_manager.fetch_full_report(patient_id="reference", page_size=8)
+    assert page.columns == FULL_REPORT_COLUMNS
+    report = demo_service.match_patient_genome("reference").set_index(['rsid', 'rsid_genotypes'])['genotype_match']
+    expected = [None if report[(record["rsid"], record["rsid_genotypes"])] is pd.NA else report[(record["rsid"], record["rsid_genotypes"])] for record in page.records]
+    assert [record["genotype_match"] for record in page.records] == expected
+    assert {record["genotype_match"] for record in page.records} <= {0, 1, None}
+    # Matched at request time, against every pair of the page's rsids, as in the materialized report.
+    assert "reference" not in demo_service.genome_db_manager.patient_genome_repository.ready_reports
+    demo_service.genome_db_manager.materialize_patient_report("reference")
+    ready_page = demo_service.genome_db_manager.fetch_full_report(patient_id="reference", page_size=8)
+    assert [record["genotype_match"] for record in ready_page.records] == expected
@@ -0,0 +1,123 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from services.ingest_scheduler import CANCELLED, FAILED, IngestQueueFull, IngestScheduler, IngestSchedulerClosed, SUCCEEDED
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+def wait_for(job, states=(SUCCEEDED, FAILED), timeout=10):
+    deadline = time.time() + timeout
+    while job.state not in states and time.time() < deadline:
+        time.sleep(0.01)
+    return job.state
+
+class BlockingLoad:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        job.report_progress(10)
+        self.release.wait(10)
+        if job.source == "bad":
+            raise TypeError("No genome data loaded.")
+        job.report_progress(20)
+        return 20
+
+def test_jobs_report_progress_and_errors():
+    load = BlockingLoad()
+    scheduler = IngestScheduler(load, workers=1, queue_size=2)
+    job = scheduler.submit("genome.txt")
+    failing = scheduler.submit("bad")
+    deadline = time.time() + 10
+    while job.rows_processed < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.as_dict()["state"] == "running" and failing.state == "queued"
+    load.release.set()
+    assert wait_for(job) == SUCCEEDED and wait_for(failing) == FAILED
+    status = job.as_dict()
+    assert (status["rows_processed"], status["imported_rows"]) == (20, 20) and status["rows_per_second"] > 0
+    assert failing.as_dict()["error"] == "TypeError: No genome data loaded."
+    assert scheduler.job(job.job_id) is job and scheduler.job("unknown") is None
+    scheduler.shutdown()
+
+def test_full_queue_rejects_loads():
+    load = BlockingLoad()
+    scheduler = IngestScheduler(load, workers=1, queue_size=1)
+    running = scheduler.submit("genome1.txt")
+    wait_for(running, states=("running",))
+    queued = scheduler.submit("genome2.txt")
+    with pytest.raises(IngestQueueFull):
+        scheduler.submit("genome3.txt")
+    assert scheduler.stats() == {"workers": 1, "queue_size": 1, "queued": 1, "running": 1}
+    load.release.set()
+    assert wait_for(queued) == SUCCEEDED
+    scheduler.submit("genome3.txt")
+    scheduler.shutdown()
+
+def test_shutdown_cancels_queued_loads():
+    load = BlockingLoad()
+    scheduler = IngestScheduler(load, workers=1, queue_size=4)
+    running = scheduler.submit("genome1.txt")
+    queued = scheduler.submit("genome2.txt")
+    wait_for(running, states=("running",))
+    threading.Timer(0.1, load.release.set).start()
+    scheduler.shutdown(timeout=10)
+    assert (running.state, queued.state) == (SUCCEEDED, CANCELLED)
+    with pytest.raises(IngestSchedulerClosed):
+        scheduler.submit("genome3.txt")
+
+def test_finished_jobs_are_bounded():
+    scheduler = IngestScheduler(lambda job: 0, workers=1, queue_size=1, retained_jobs=2)
+    for _ in range(5):
+        wait_for(scheduler.submit("genome.txt"))
+    assert len(scheduler.jobs) <= 3
+    scheduler.shutdown()
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('GENOME_FILE_PATH', os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'))
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+def test_load_patient_genome_job(client):
+    response = client.post("/patient_genome/load_patient_genome")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["Location"] == f"/patient_genome/load_patient_genome/{job_id}"
+    deadline = time.time() + 10
+    while True:
+        status = client.get(f"/patient_genome/load_patient_genome/{job_id}").json()
+        if status["state"] in (SUCCEEDED, FAILED) or time.time() > deadline:
+            break
+        time.sleep(0.02)
+    assert status["state"] == SUCCEEDED and status["error"] is None
+    assert status["imported_rows"] == status["rows_processed"] == 29
+    patients = client.get("/patient_genome/patient_profile").json()
+    assert [patient["patient_id"] for patient in patients] == [status["patient_id"]]
+
+def test_failed_and_unknown_jobs(client):
+    job_id = client.post("/patient_genome/load_patient_genome", params={"genome_file_name_with_path": "/no/such/genome.txt"}).json()["job_id"]
+    job = client.app.state.genome_controller.ingest_scheduler.job(job_id)
+    assert wait_for(job) == FAILED
+    assert client.get(f"/patient_genome/load_patient_genome/{job_id}").json()["error"].startswith("FileNotFoundError")
+    assert client.get("/patient_genome/load_patient_genome/unknown").status_code == 404
+
+def test_full_queue_is_too_many_requests(client, monkeypatch):
+    scheduler = client.app.state.genome_controller.ingest_scheduler
+    def queue_full(source):
+        raise IngestQueueFull("8 genome loads are already queued; retry later.")
+    monkeypatch.setattr(scheduler, "submit", queue_full)
+    response = client.post("/patient_genome/load_patient_genome")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
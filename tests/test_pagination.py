@@ -0,0 +1,112 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.rsid_codes import encode_rsid
+from utils import decode_cursor, encode_cursor
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(pd.DataFrame({
+        "rsid_genotypes": [f"Rs{i}(A;A)" for i in range(0, 60, 2)] + [f"Rs{i}(A;G)" for i in range(0, 60, 2)],
+        "magnitude": [1.0] * 60, "risk": [1.0] * 60, "notes": [""] * 60,
+        "rsid": [f"rs{i}" for i in range(0, 60, 2)] * 2,
+        "allele1": ["A"] * 60, "allele2": ["A"] * 30 + ["G"] * 30
+    }))
+    for patient in range(3):
+        db.update_patient_and_genome_data(pd.DataFrame({
+            "rsid": [f"rs{i}" for i in range(50)],
+            "chromosome": [str(1 + i % 2) for i in range(50)],
+            "position": [1000 - i * 7 for i in range(50)],
+            "genotype": ["AG"] * 50
+        }), f"patient{patient}", f"Patient {patient}")
+    yield db
+    db.close_connection()
+
+def walk_pages(fetch_page, **kwargs):
+    records, cursor, pages = [], None, 0
+    while True:
+        page = fetch_page(cursor=cursor, **kwargs)
+        records.extend(page.records)
+        pages += 1
+        if page.next_cursor is None:
+            return records, pages
+        cursor = page.next_cursor
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('position', ['1', 12345, 'patient1', 'rs1'])
+    assert decode_cursor(cursor, 'position', 4) == ['1', 12345, 'patient1', 'rs1']
+
+@pytest.mark.parametrize("cursor, order_by, key_count", [
+    ("not a cursor", "rsid", 2),
+    (encode_cursor('rsid', ['patient1', 'rs1']), "position", 2),
+    (encode_cursor('rsid', ['patient1', 'rs1']), "rsid", 4),
+])
+def test_invalid_cursor_rejected(cursor, order_by, key_count):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, order_by, key_count)
+
+def test_genome_data_pages_cover_every_row_once(genome_db):
+    records, pages = walk_pages(genome_db.fetch_patient_data_expanded, page_size=7)
+    assert len(records) == 150
+    assert pages == 22
+    # Variant IDs are keyed (and ordered) by their integer codes: rs2 before rs10.
+    keys = [(record["patient_id"], encode_rsid(record["rsid"])) for record in records]
+    assert keys == sorted(set(keys))
+
+def test_genome_data_pages_in_position_order(genome_db):
+    records, _ = walk_pages(genome_db.fetch_patient_genome_data, patient_id="patient1", order_by="position", page_size=10)
+    assert len(records) == 50
+    positions = [(record["chromosome"], record["position"]) for record in records]
+    assert positions == sorted(positions)
+
+def test_full_report_pages_cover_every_match_once(genome_db):
+    records, _ = walk_pages(genome_db.fetch_full_report, patient_id="patient2", page_size=4)
+    # rs0, rs2, ... rs48 each match an (A;A) and an (A;G) pair.
+    assert len(records) == 50
+    assert len({(record["rsid"], record["rsid_genotypes"]) for record in records}) == 50
+
+def test_cursor_from_another_order_rejected(genome_db):
+    page = genome_db.fetch_patient_genome_data(page_size=5)
+    with pytest.raises(ValueError):
+        genome_db.fetch_patient_genome_data(cursor=page.next_cursor, order_by="position")
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('GENOME_FILE_PATH', os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'))
+    from main import app
+    with TestClient(app) as client:
+        app.state.genome_controller.genome_service.load_genome("default")
+        yield client
+
+def test_next_cursor_header(client):
+    response = client.get("/patient_genome/patient_genome_data", params={"page_size": 10})
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    cursor = response.headers["X-Next-Cursor"]
+    records = response.json()
+    while cursor:
+        response = client.get("/patient_genome/patient_genome_data", params={"page_size": 10, "cursor": cursor})
+        records.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    assert len(records) == 29
+
+def test_invalid_cursor_is_bad_request(client):
+    response = client.get("/patient_genome/patient_genome_data", params={"cursor": "bogus"})
+    assert response.status_code == 400
+
+def test_page_size_capped(client):
+    response = client.get("/patient_genome/patient_genome_data", params={"page_size": 100000})
+    assert response.status_code == 422
@@ -1,5 +1,10 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 import pytest
+import pandas as pd
 from unittest.mock import patch, MagicMock
+from models import Patient
 from repositories.patient_genome_repository import PatientGenomeRepository
 
 @pytest.fixture
@@ -18,4 +23,58 @@ def test_update_or_insert_patient_negative(genome_repository):
     with patch.object(genome_repository, 'execute_query', side_effect=Exception("DB Error")) as mock_method:
         result = genome_repository.update_or_insert_patient(patient)
         mock_method.assert_called_once()
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+# Bulk ingest
+
+@pytest.fixture
+def file_repository(tmp_path):
+    repository = PatientGenomeRepository(db_path=str(tmp_path / "genome.db"))
+    yield repository
+    repository.close_connection()
+
+def genome_df(first=0, rows=5):
+    return pd.DataFrame({
+        "rsid": [f"rs{i}" for i in range(first, first + rows)],
+        "chromosome": ["1"] * rows,
+        "position": list(range(first + 100, first + 100 + rows)),
+        "genotype": ["AG"] * rows
+    })
+
+def count_rows(repository, table):
+    return repository.sql_worker.execute(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+def test_update_patient_and_genome_data_bulk(file_repository):
+    df = genome_df(rows=7).astype(object)
+    df.loc[2, "position"] = "unknown"
+    df.loc[4, "genotype"] = None
+    summary = file_repository.update_patient_and_genome_data(df, "patient1", "John Doe", batch_size=2)
+    assert (summary.total_rows, summary.imported_rows, summary.rejected_rows) == (7, 5, 2)
+    assert [(r.row, r.key, r.reason) for r in summary.rejections] == [(2, "rs2", "position is not an integer"), (4, "rs4", "missing genotype")]
+    assert count_rows(file_repository, "patients") == 1
+    assert file_repository.sql_worker.execute("SELECT rsid, patient_id, chromosome, position, genotype FROM patient_genome_data WHERE rsid = 6") == [(6, "patient1", "1", 106, "AG")]
+
+def test_ingest_patient_genome_batches(file_repository):
+    summary = file_repository.ingest_patient_genome(Patient(patient_id="patient1", patient_name="John Doe"), [genome_df(0, 3), genome_df(3, 4)], batch_size=2)
+    assert (summary.total_rows, summary.imported_rows) == (7, 7)
+    assert count_rows(file_repository, "patient_genome_data") == 7
+
+def test_ingest_patient_genome_is_atomic(file_repository):
+    def failing_genome():
+        yield genome_df(0, 3)
+        raise IOError("read failed")
+    with pytest.raises(IOError):
+        file_repository.ingest_patient_genome(Patient(patient_id="patient1", patient_name="John Doe"), failing_genome())
+    assert count_rows(file_repository, "patients") == 0
+    assert count_rows(file_repository, "patient_genome_data") == 0
+    # The staged rows are dropped.
+    staged = file_repository.sql_worker.run_in_transaction(lambda connection: connection.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'").fetchall())
+    assert staged == []
+
+def test_ingest_patient_genome_restores_pragmas(file_repository):
+    # Pragmas are per connection: read the writer's, not a pooled reader's.
+    def writer_synchronous():
+        return file_repository.sql_worker.run_in_transaction(lambda conn: conn.execute("PRAGMA synchronous").fetchone())
+    synchronous = writer_synchronous()
+    file_repository.ingest_patient_genome(Patient(patient_id="patient1", patient_name="John Doe"), [genome_df()])
+    assert writer_synchronous() == synchronous
@@ -0,0 +1,81 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from models import SnpPair
+
+SNP_PAIRS = pd.DataFrame({
+    'rsid_genotypes': ['Rs1(A;G)', 'Rs1(G;G)', 'Rs2(C;C)', 'Rs3(T;T)'],
+    'magnitude': [2.0, 0.5, 3.0, 1.0],
+    'risk': [2.0, 1.0, 3.0, None],
+    'notes': ['a', 'b', 'c', 'd'],
+    'rsid': ['rs1', 'rs1', 'rs2', 'rs3'],
+    'allele1': ['A', 'G', 'C', 'T'],
+    'allele2': ['G', 'G', 'C', 'T'],
+})
+GENOME = pd.DataFrame({
+    'rsid': ['rs1', 'rs2', 'rs3', 'rs4'],
+    'chromosome': ['2', '1', '1', '1'],
+    'position': [10, 30, 20, 40],
+    'genotype': ['GA', 'CT', '--', 'AA'],
+})
+
+@pytest.fixture
+def db(tmp_path):
+    db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(SNP_PAIRS)
+    db.update_patient_and_genome_data(GENOME, "patient1", "Patient 1")
+    yield db
+    db.close_connection()
+
+def live_report(db, **kwargs):
+    db.patient_genome_repository.mark_patient_report_pending(kwargs['patient_id'])
+    return db.fetch_full_report(**kwargs)
+
+def test_report_pending_until_materialized(db):
+    assert db.patient_genome_repository.fetch_patient_report_status("patient1") == "pending"
+    assert db.materialize_patient_report("patient1") == 4
+    assert db.patient_genome_repository.fetch_patient_report_status("patient1") == "ready"
+
+@pytest.mark.parametrize("order_by", ["rsid", "position"])
+def test_materialized_report_matches_live_report(db, order_by):
+    expected = live_report(db, patient_id="patient1", order_by=order_by, page_size=100)
+    db.materialize_patient_report("patient1")
+    materialized = db.fetch_full_report(patient_id="patient1", order_by=order_by, page_size=100)
+    assert materialized.columns == expected.columns
+    assert materialized.rows == expected.rows
+    assert {record["rsid_genotypes"]: record["genotype_match"] for record in materialized.records} == {'Rs1(A;G)': 1, 'Rs1(G;G)': 0, 'Rs2(C;C)': 0, 'Rs3(T;T)': None}
+
+def test_cursors_carry_over_between_live_and_materialized_reports(db):
+    first = live_report(db, patient_id="patient1", page_size=2)
+    db.materialize_patient_report("patient1")
+    second = db.fetch_full_report(patient_id="patient1", page_size=2, cursor=first.next_cursor)
+    assert [record["rsid_genotypes"] for record in first.records + second.records] == ['Rs1(A;G)', 'Rs1(G;G)', 'Rs2(C;C)', 'Rs3(T;T)']
+
+def test_risk_scores(db):
+    db.materialize_patient_report("patient1")
+    summary = db.fetch_patient_report_summary(patient_id="patient1").records[0]
+    assert summary["status"] == "ready"
+    assert (summary["matched_pairs"], summary["no_calls"], summary["total_magnitude"], summary["max_magnitude"], summary["mean_risk"]) == (1, 1, 2.0, 2.0, 2.0)
+
+def test_snp_pair_changes_refresh_ready_reports(db):
+    db.materialize_patient_report("patient1")
+    db.update_or_insert_snp_pair(SnpPair(rsid_genotypes='Rs2(C;T)', magnitude=4.0, risk=1.0, notes='e', rsid='rs2', allele1='C', allele2='T'))
+    report = db.fetch_full_report(patient_id="patient1", rsid="rs2")
+    assert [(record["rsid_genotypes"], record["genotype_match"]) for record in report.records] == [('Rs2(C;C)', 0), ('Rs2(C;T)', 1)]
+    changed = SNP_PAIRS.assign(magnitude=[5.0, 0.5, 3.0, 1.0])
+    db.save_snp_pairs_to_db(changed)
+    summary = db.fetch_patient_report_summary(patient_id="patient1").records[0]
+    assert (summary["matched_pairs"], summary["total_magnitude"], summary["max_magnitude"]) == (2, 9.0, 5.0)
+    expected = live_report(db, patient_id="patient1", page_size=100)
+    db.materialize_patient_report("patient1")
+    assert db.fetch_full_report(patient_id="patient1", page_size=100).rows == expected.rows
+
+def test_genome_reload_falls_back_to_live_report(db):
+    db.materialize_patient_report("patient1")
+    db.update_patient_and_genome_data(GENOME.assign(genotype=['GG', 'CC', 'TT', 'AA']), "patient1", "Patient 1")
+    assert db.patient_genome_repository.fetch_patient_report_status("patient1") == "pending"
+    report = db.fetch_full_report(patient_id="patient1", page_size=100)
+    assert [record["genotype_match"] for record in report.records] == [0, 1, 1, 1]
@@ -0,0 +1,117 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from services.ingest_scheduler import IngestJob
+from services.notification_service import NotificationService
+from services.progress_hub import ProgressHub
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+async def drain(subscription):
+    events = []
+    while subscription.pending():
+        events.append(await subscription.get())
+    return events
+
+def test_every_subscriber_receives_events():
+    async def scenario():
+        hub = ProgressHub(progress_interval=0)
+        first, second = hub.subscribe(), hub.subscribe()
+        hub.publish({"event": "one"})
+        hub.unsubscribe(second)
+        hub.publish({"event": "two"})
+        return await drain(first), await drain(second)
+    first, second = asyncio.run(scenario())
+    assert first == [{"event": "one"}, {"event": "two"}]
+    assert second == [{"event": "one"}]
+
+def test_slow_subscriber_gets_coalesced_progress_and_bounded_queue():
+    async def scenario():
+        hub = ProgressHub(subscriber_queue_size=3, progress_interval=0)
+        subscription = hub.subscribe()
+        for rows in range(1000):
+            hub.publish({"job": "a", "rows": rows}, coalesce_key="a", throttle=True)
+        hub.publish({"job": "a", "state": "succeeded"})
+        for number in range(3):
+            hub.publish({"state": number})
+        return await drain(subscription), subscription.dropped, hub.stats()
+    events, dropped, stats = asyncio.run(scenario())
+    # Progress of "a" coalesced to its latest; the queue then dropped the progress, and the oldest state.
+    assert events == [{"state": 0}, {"state": 1}, {"state": 2}]
+    assert dropped == 2
+    assert stats["published"] == 1004 and stats["dropped"] == 2
+
+def test_progress_is_throttled_per_key():
+    async def scenario():
+        hub = ProgressHub(progress_interval=60)
+        subscription = hub.subscribe()
+        for rows in range(100):
+            hub.publish({"job": "a", "rows": rows}, coalesce_key="a", throttle=True)
+            hub.publish({"job": "b", "rows": rows}, coalesce_key="b", throttle=True)
+        hub.publish({"job": "a", "state": "succeeded"})
+        return await drain(subscription), hub.throttled
+    events, throttled = asyncio.run(scenario())
+    assert events == [{"job": "a", "rows": 0}, {"job": "b", "rows": 0}, {"job": "a", "state": "succeeded"}]
+    assert throttled == 198
+
+def test_events_published_from_other_threads_wake_the_subscriber():
+    async def scenario():
+        hub = ProgressHub()
+        subscription = hub.subscribe()
+        threading.Timer(0.05, hub.publish, args=({"event": "from_worker"},)).start()
+        return await asyncio.wait_for(subscription.get(), timeout=5)
+    assert asyncio.run(scenario()) == {"event": "from_worker"}
+
+def test_genome_load_events():
+    async def scenario():
+        service = NotificationService(ProgressHub(progress_interval=60))
+        subscription = service.progress_hub.subscribe()
+        job = IngestJob("genome.txt")
+        job.listener = service.publish_genome_load
+        service.publish_genome_load(job, "running")
+        for rows in (50000, 100000, 150000):
+            job.report_progress(rows)
+        job.state = "succeeded"
+        service.publish_genome_load(job, "succeeded")
+        return await drain(subscription)
+    events = asyncio.run(scenario())
+    assert [(event["event"], event["rows_processed"]) for event in events] == [
+        ("genome_load_running", 0), ("genome_load_progress", 50000), ("genome_load_succeeded", 150000)]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('GENOME_FILE_PATH', os.path.join(DATA_DIR, 'genomes/genome_demo_file.txt'))
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+def test_connected_clients_receive_genome_load_events(client):
+    with client.websocket_connect("/notification/notify_patient_file_load_complete") as first, \
+         client.websocket_connect("/notification/notify_patient_file_load_complete") as second:
+        hub = client.app.state.notification_controller.notification_service.progress_hub
+        while hub.stats()["subscribers"] < 2:
+            time.sleep(0.01)
+        job_id = client.post("/patient_genome/load_patient_genome").json()["job_id"]
+        for websocket in (first, second):
+            events = []
+            while not events or events[-1]["event"] not in ("genome_load_succeeded", "genome_load_failed"):
+                events.append(websocket.receive_json())
+            assert {event["job_id"] for event in events} == {job_id}
+            assert events[0]["event"] == "genome_load_queued"
+            assert events[-1]["event"] == "genome_load_succeeded" and events[-1]["imported_rows"] == 29
+    # The server notices the disconnects, and unsubscribes, asynchronously.
+    deadline = time.time() + 5
+    while hub.stats()["subscribers"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert hub.stats()["subscribers"] == 0
@@ -0,0 +1,132 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import re
+import sqlite3
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.migrations import MIGRATIONS, schema_version
+
+PATIENTS_PK = "sqlite_autoindex_patients_1"
+PATIENT_RSID_UNIQUE = "sqlite_autoindex_patient_genome_data_1"
+PGD_RSID = "idx_patient_genome_data_rsid"
+SNP_PAIRS_RSID = "idx_snp_pairs_rsid"
+REPORT_SUMMARY_PK = "sqlite_autoindex_patient_report_summary_1"
+REPORT_POSITION = "idx_patient_report_position"
+PGD_POSITION = "idx_patient_genome_data_chromosome_position"
+PGD_PATIENT_POSITION = "idx_patient_genome_data_patient_position"
+
+# Every repository read, with the filters the API passes, the indexes its plan must use, and
+# the number of full table scans allowed. Scans are only allowed for unfiltered queries, and for the
+# (materialized, distinct) reference rsids the genotype matcher probes a patient's rows with;
+# scanning json_each (the bound list of an IN filter) is not a table scan.
+REPOSITORY_QUERIES = [
+    ("patient_genome_repository", "fetch_patients", {"patient_id": "patient1"}, [PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_patients", {}, [], 1),
+    ("patient_genome_repository", "fetch_patient_genome_data", {"patient_id": "patient1"}, [PATIENT_RSID_UNIQUE], 0),
+    ("patient_genome_repository", "fetch_patient_genome_data", {"rsid": "rs1"}, [PGD_RSID], 0),
+    ("patient_genome_repository", "fetch_patient_genome_data", {"patient_id": "patient1", "rsid": "rs1"}, [PATIENT_RSID_UNIQUE], 0),
+    ("patient_genome_repository", "fetch_patient_data_expanded", {"patient_id": "patient1"}, [PATIENTS_PK, PATIENT_RSID_UNIQUE], 0),
+    ("patient_genome_repository", "fetch_patient_data_expanded", {"rsid": "rs1"}, [PATIENTS_PK, PGD_RSID], 0),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient1"}, [PATIENTS_PK, PATIENT_RSID_UNIQUE, SNP_PAIRS_RSID], 0),
+    ("patient_genome_repository", "fetch_full_report", {"rsid": "rs1"}, [PATIENTS_PK, PGD_RSID, SNP_PAIRS_RSID], 0),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient1", "rsid": "rs1"}, [PATIENTS_PK, PATIENT_RSID_UNIQUE, SNP_PAIRS_RSID], 0),
+    ("patient_genome_repository", "fetch_full_report", {}, [PATIENTS_PK, SNP_PAIRS_RSID], 0),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient2"}, [PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient2", "order_by": "position"}, [REPORT_POSITION, PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient2", "rsid": "rs3"}, [PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_patient_report_summary", {"patient_id": "patient2"}, [REPORT_SUMMARY_PK], 0),
+    ("patient_genome_repository", "fetch_ready_patient_genome_frame", {"rsids": ["rs3", "rs6"]}, [PGD_RSID, REPORT_SUMMARY_PK, PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_genome_region", {"chromosome": "1", "start": 100, "end": 120}, [PGD_POSITION, PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_genome_region", {"chromosome": "1", "start": 100, "end": 120, "patient_id": "patient1"}, [PGD_PATIENT_POSITION, PATIENTS_PK], 0),
+    ("patient_genome_repository", "fetch_snp_pairs_data_by_genotype", {"rsid": "rs1"}, [SNP_PAIRS_RSID], 0),
+    ("patient_genome_repository", "fetch_patient_genome_frame", {"patient_id": "patient1"}, [SNP_PAIRS_RSID, PATIENT_RSID_UNIQUE, PATIENTS_PK], 1),
+    ("genome_research_repository", "fetch_snp_pairs_data", {"rsid": ["rs1", "rs2"], "use_index": False}, [SNP_PAIRS_RSID], 0),
+]
+
+# Paginated reads whose page size, not the size of the result, must bound the cost of a page:
+# rows have to come out of an index already in key order, with at most the tail of the key
+# ("RIGHT PART") sorted. Reads filtered by rsid are bounded by the number of patients.
+KEYSET_ORDERED_QUERIES = [
+    ("patient_genome_repository", "fetch_patients", {}),
+    ("patient_genome_repository", "fetch_patient_genome_data", {"patient_id": "patient1"}),
+    ("patient_genome_repository", "fetch_patient_genome_data", {"patient_id": "patient1", "order_by": "position"}),
+    ("patient_genome_repository", "fetch_patient_data_expanded", {"patient_id": "patient1"}),
+    ("patient_genome_repository", "fetch_patient_data_expanded", {"order_by": "position"}),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient1"}),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient1", "order_by": "position"}),
+    ("patient_genome_repository", "fetch_full_report", {}),
+    ("patient_genome_repository", "fetch_genome_region", {"chromosome": "1", "start": 100, "end": 120}),
+    ("patient_genome_repository", "fetch_genome_region", {"chromosome": "1", "start": 100, "end": 120, "patient_id": "patient1"}),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient2"}),
+    ("patient_genome_repository", "fetch_full_report", {"patient_id": "patient2", "order_by": "position"}),
+]
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db_path = str(tmp_path / "genome.db")
+    db = GenomeDatabaseManager(db_path=db_path)
+    db.save_snp_pairs_to_db(pd.DataFrame({
+        "rsid_genotypes": [f"Rs{i}(A;G)" for i in range(200)],
+        "magnitude": [1.0] * 200, "risk": [1.0] * 200, "notes": [""] * 200,
+        "rsid": [f"rs{i}" for i in range(200)], "allele1": ["A"] * 200, "allele2": ["G"] * 200
+    }))
+    for patient in range(3):
+        db.update_patient_and_genome_data(pd.DataFrame({
+            "rsid": [f"rs{i}" for i in range(0, 2000, 3)],
+            "chromosome": ["1"] * 667, "position": list(range(667)), "genotype": ["AG"] * 667
+        }), f"patient{patient}", f"Patient {patient}")
+    # patient2's report is materialized; the others are read through the live join.
+    db.materialize_patient_report("patient2")
+    db.sql_worker.execute("ANALYZE")
+    db.db_path = db_path
+    yield db
+    db.close_connection()
+
+def captured_queries(genome_db, repository_name, method_name, kwargs):
+    repository = getattr(genome_db, repository_name)
+    captured = []
+    execute = repository.sql_worker.execute
+    def spy(query, values=None):
+        captured.append((query, values))
+        return execute(query, values)
+    repository.sql_worker.execute = spy
+    try:
+        getattr(repository, method_name)(**kwargs)
+    finally:
+        repository.sql_worker.execute = execute
+    return [(query, values) for query, values in captured if 'pragma_table_info' not in query]
+
+def query_plan(db_path, query, values):
+    with sqlite3.connect(db_path) as connection:
+        return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", values or [])]
+
+def test_migrations_applied(genome_db):
+    assert schema_version(genome_db.sql_worker) == MIGRATIONS[-1][0]
+    indexes = {row[0] for row in genome_db.sql_worker.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_snp_pairs_rsid", "idx_patient_genome_data_rsid", "idx_patient_genome_data_chromosome_position"} <= indexes
+
+def test_migrations_are_idempotent(tmp_path):
+    db_path = str(tmp_path / "genome.db")
+    GenomeDatabaseManager(db_path=db_path).close_connection()
+    db = GenomeDatabaseManager(db_path=db_path)
+    assert schema_version(db.sql_worker) == MIGRATIONS[-1][0]
+    db.close_connection()
+
+@pytest.mark.parametrize("repository_name, method_name, kwargs, indexes, scans", REPOSITORY_QUERIES)
+def test_repository_queries_use_indexes(genome_db, repository_name, method_name, kwargs, indexes, scans):
+    queries = captured_queries(genome_db, repository_name, method_name, kwargs)
+    assert queries
+    for query, values in queries:
+        plan = query_plan(genome_db.db_path, query, values)
+        full_scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step and "VIRTUAL TABLE" not in step]
+        assert len(full_scans) <= scans, f"{method_name}{kwargs}: {plan}"
+        for index in indexes:
+            assert any(re.search(rf"INDEX {index}\b", step) for step in plan), f"{method_name}{kwargs}: {plan}"
+
+@pytest.mark.parametrize("repository_name, method_name, kwargs", KEYSET_ORDERED_QUERIES)
+def test_paginated_queries_read_in_key_order(genome_db, repository_name, method_name, kwargs):
+    for query, values in captured_queries(genome_db, repository_name, method_name, kwargs):
+        plan = query_plan(genome_db.db_path, query, values)
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, f"{method_name}{kwargs}: {plan}"
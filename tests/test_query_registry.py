@@ -0,0 +1,72 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.query_registry import QueryRegistry, QueryTemplate
+
+TEMPLATES = [
+    QueryTemplate('items', 'id, name', 'FROM items', {'name': 'name', 'id': 'id'}, {'id': ['id']}),
+]
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(pd.DataFrame({
+        "rsid_genotypes": [f"Rs{i}(A;G)" for i in range(20)],
+        "magnitude": [1.0] * 20, "risk": [1.0] * 20, "notes": [""] * 20,
+        "rsid": [f"rs{i}" for i in range(20)], "allele1": ["A"] * 20, "allele2": ["G"] * 20
+    }))
+    yield db
+    db.close_connection()
+
+def spy_queries(sql_worker):
+    queries = []
+    execute = sql_worker.execute
+    def spy(query, values=None):
+        queries.append((query, values))
+        return execute(query, values)
+    sql_worker.execute = spy
+    return queries
+
+def test_compiled_sql_depends_on_shape_only():
+    registry = QueryRegistry(TEMPLATES)
+    assert registry.compile('items', (('name', False),)) is registry.compile('items', (('name', False),))
+    assert registry.compile('items', (('name', True),), 'id', True) == (
+        "SELECT id, name, id FROM items WHERE name IN (SELECT value FROM json_each(?)) AND (id) > (?) ORDER BY id LIMIT ?"
+    )
+
+def test_lists_bind_as_one_parameter(genome_db):
+    queries = spy_queries(genome_db.sql_worker)
+    genome_db.fetch_snp_pairs_data(rsid=["rs1", "rs2"], use_index=False)
+    genome_db.fetch_snp_pairs_data(rsid=[f"rs{i}" for i in range(1, 16)], use_index=False)
+    (first_query, first_values), (second_query, second_values) = queries
+    assert first_query == second_query
+    assert "rs1" not in first_query
+    # rsids bind as their integer codes (see rsid_codes.py.)
+    assert first_values == ('[1, 2]',)
+
+def test_list_values_are_not_injectable(genome_db):
+    row_set = genome_db.fetch_snp_pairs_data(rsid=["rs1", "rs2') OR ('1'='1"], use_index=False)
+    assert [row[4] for row in row_set.rows] == ["rs1"]
+
+def test_columns_resolved_once_at_startup(genome_db):
+    assert genome_db.patient_genome_repository.queries.columns['patients'] == ['patient_id', 'patient_name']
+    queries = spy_queries(genome_db.sql_worker)
+    for _ in range(3):
+        row_set = genome_db.fetch_snp_pairs_data(rsid=["rs1"], use_index=False)
+        genome_db.fetch_patients()
+    assert row_set.columns == ['rsid_genotypes', 'magnitude', 'risk', 'notes', 'rsid', 'allele1', 'allele2']
+    assert len(queries) == 6
+    assert not any('pragma_table_info' in query for query, _ in queries)
+
+def test_columns_resolved_on_first_use(tmp_path):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    registry = QueryRegistry(db.patient_genome_repository.QUERY_TEMPLATES)
+    assert registry.fetch_page(db.sql_worker, 'patients').columns == ['patient_id', 'patient_name']
+    db.close_connection()
+
+def test_invalid_order_rejected(genome_db):
+    with pytest.raises(ValueError):
+        genome_db.fetch_patient_genome_data(order_by="genotype")
@@ -0,0 +1,149 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.response_cache import ResponseCache, response_cache_path
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+class Upstream:
+    """
+        Fetch stand-in: counts its calls, and fails while `failing` is set.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    def __call__(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("upstream down")
+        return {"call": self.calls}
+
+def test_hits_within_ttl_and_refetch_after(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"))
+    upstream = Upstream()
+    assert cache.get_or_fetch("key", upstream, ttl=60) == {"call": 1}
+    assert cache.get_or_fetch("key", upstream, ttl=60) == {"call": 1}
+    assert cache.get_or_fetch("key", upstream, ttl=0) == {"call": 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+
+def test_stale_value_served_when_upstream_fails(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"))
+    upstream = Upstream()
+    cache.get_or_fetch("key", upstream, ttl=60)
+    upstream.failing = True
+    assert cache.get_or_fetch("key", upstream, ttl=0) == {"call": 1}
+    with pytest.raises(ConnectionError):
+        cache.get_or_fetch("other", upstream, ttl=60)
+    assert {name: cache.stats()[name] for name in ["stale_hits", "errors"]} == {"stale_hits": 1, "errors": 2}
+    cache.close()
+
+def test_least_recently_used_entries_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"), max_entries=2, memory_entries=1)
+    for key in ["a", "b"]:
+        cache.get_or_fetch(key, lambda: key, ttl=60)
+    cache.get_or_fetch("a", lambda: "refetched", ttl=60)
+    cache.get_or_fetch("c", lambda: "c", ttl=60)
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+    assert cache.get_or_fetch("a", lambda: "refetched", ttl=60) == "a"
+    assert cache.get_or_fetch("b", lambda: "refetched", ttl=60) == "refetched"
+    cache.close()
+
+def test_cache_persists_across_restarts(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"))
+    cache.get_or_fetch("key", lambda: ["persisted"], ttl=60)
+    cache.close()
+    reopened = ResponseCache(str(tmp_path / "responses"))
+    assert reopened.get_or_fetch("key", Upstream(), ttl=60) == ["persisted"]
+    assert reopened.hits == 1
+    reopened.close()
+
+def test_response_cache_path(monkeypatch):
+    monkeypatch.delenv('RESPONSE_CACHE_PATH', raising=False)
+    # One request per upstream failure; retries are covered in test_external_http_client.
+    monkeypatch.setenv('HTTP_RETRIES', "0")
+    assert response_cache_path(':memory:') is None
+    assert response_cache_path('/data/genome.db') == '/data/genome.db.responses'
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Ensembl and g:Profiler stand-in; `server.requests` counts requests by path.
+    def do_GET(self):
+        self._respond({"top_level_region": [{"name": "1", "length": 249250621}]})
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+        if self.path == "/api/convert/convert":
+            result = [{"incoming": "*", "converted": "ENSG00000000003", "n_incoming": 1, "n_converted": 1, "name": "TSPAN6",
+                       "description": "tetraspanin 6", "namespaces": "ENSG", "query": "query_1"}]
+        else:
+            result = [{"rs_id": rsid, "chromosome": "4", "strand": "+", "start": 1, "end": 1, "ensgs": ["ENSG1"],
+                       "gene_names": ["GENE1"], "variants": {}} for rsid in query]
+        self._respond({"meta": {}, "result": result})
+
+    def _respond(self, body):
+        self.server.requests[self.path.split("?")[0]] += 1
+        if self.server.failing:
+            self.send_response(503)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = Counter()
+    server.failing = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def environment(tmp_path, monkeypatch, upstream):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    url = f"http://127.0.0.1:{upstream.server_address[1]}"
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('ENSEMBL_URL', url)
+    monkeypatch.setenv('GPROFILER_URL', url)
+    monkeypatch.delenv('RESPONSE_CACHE_PATH', raising=False)
+    # One request per upstream failure; retries are covered in test_external_http_client.
+    monkeypatch.setenv('HTTP_RETRIES', "0")
+
+def test_external_sources_are_cached(environment, upstream):
+    from main import app
+    with TestClient(app) as client:
+        for _ in range(3):
+            assert client.get("/snp_research/fetch_chromosomes/ensembl").status_code == 200
+            assert client.get("/snp_research/fetch_chromosomes/gprofiler").json()[0]["name"] == "TSPAN6"
+            assert client.get("/snp_research/fetch_gene_by_variant", params={"rsid": "rs123"}).json() == [["GENE1"]]
+        assert upstream.requests == {"/info/assembly/homo_sapiens": 1, "/api/convert/convert": 1, "/api/snpense/snpense": 1}
+        stats = client.get("/snp_research/external_cache_stats").json()
+        assert (stats["hits"], stats["misses"], stats["persistent"]) == (6, 3, True)
+    # A restart is served from the file; with the entries expired, a failing upstream gets the stale responses.
+    upstream.failing = True
+    with TestClient(app) as client:
+        assert client.get("/snp_research/fetch_gene_by_variant", params={"rsid": "rs123"}).json() == [["GENE1"]]
+        assert client.app.state.genome_controller.genome_service.response_cache.hits == 1
+        client.app.state.genome_controller.genome_service.variant_gene_resolver.ttl = 0
+        assert client.get("/snp_research/fetch_gene_by_variant", params={"rsid": "rs123"}).json() == [["GENE1"]]
+        assert client.get("/snp_research/external_cache_stats").json()["stale_hits"] == 1
+    assert upstream.requests["/api/snpense/snpense"] == 2
@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import sqlite3
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.migrations import MIGRATIONS, schema_version
+from data_layer.rsid_codes import OTHER_ID_BASE, canonical_rsids, encode_rsid, encode_rsids
+
+def test_rsid_codes():
+    assert encode_rsid("rs4477212") == encode_rsid("RS4477212") == 4477212
+    assert encode_rsid("i4000307") == encode_rsid("I4000307") == -4000307
+    for other in ["VG01S1234", "rs0", "rs01", "rs", "", None]:
+        assert encode_rsid(other) == 0
+    assert encode_rsids(["rs1", None, "i2", "rs1"]).tolist() == [1, 0, -2, 1]
+    assert canonical_rsids(["RS1", "I2", "VG01S1234"]) == ["rs1", "i2", "VG01S1234"]
+
+@pytest.fixture
+def genome_db(tmp_path):
+    db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(pd.DataFrame({
+        "rsid_genotypes": ["Rs7(A;G)", "I4000307(A;A)"], "magnitude": [1.0, 2.0], "risk": [1.0, 2.0], "notes": ["", ""],
+        "rsid": ["rs7", "i4000307"], "allele1": ["A", "A"], "allele2": ["G", "A"],
+    }))
+    db.update_patient_and_genome_data(pd.DataFrame({
+        "rsid": ["rs7", "i4000307", "VG01S1234", "rs10"], "chromosome": ["1", "1", "MT", "2"],
+        "position": [1, 2, 3, 4], "genotype": ["AG", "AA", "G", "CC"],
+    }), "patient1", "Patient 1")
+    yield db
+    db.close_connection()
+
+def test_rsids_are_stored_as_integers(genome_db):
+    stored = genome_db.sql_worker.execute("SELECT rsid, typeof(rsid) FROM patient_genome_data ORDER BY position")
+    assert [row[0] for row in stored[:2]] == [7, -4000307]
+    assert stored[2][0] < -OTHER_ID_BASE
+    assert {row[1] for row in stored} == {"integer"}
+
+def test_api_reads_and_filters_by_the_string_form(genome_db):
+    page = genome_db.fetch_patient_genome_data(patient_id="patient1")
+    assert [record["rsid"] for record in page.records] == ["VG01S1234", "i4000307", "rs7", "rs10"]
+    for rsid in ["rs7", "i4000307", "VG01S1234"]:
+        assert [record["rsid"] for record in genome_db.fetch_patient_genome_data(rsid=rsid).records] == [rsid]
+    assert genome_db.fetch_patient_genome_data(rsid="VG404").rows == []
+    report = genome_db.fetch_full_report(patient_id="patient1")
+    assert [(record["rsid"], record["genotype_match"]) for record in report.records] == [("i4000307", 1), ("rs7", 1)]
+    assert [row[4] for row in genome_db.fetch_snp_pairs_data(rsid=["i4000307"], use_index=False).rows] == ["i4000307"]
+
+# The schema before rsids were integers.
+TEXT_RSID_SCHEMA = [
+    "CREATE TABLE snp_pairs (rsid_genotypes TEXT NOT NULL, magnitude REAL, risk REAL, notes TEXT, rsid TEXT NOT NULL, allele1 TEXT NOT NULL, allele2 TEXT NOT NULL, PRIMARY KEY (rsid_genotypes) UNIQUE (rsid_genotypes))",
+    "CREATE TABLE patients (patient_id TEXT PRIMARY KEY, patient_name TEXT)",
+    "CREATE TABLE patient_genome_data (rsid TEXT NOT NULL, patient_id TEXT NOT NULL, chromosome TEXT NOT NULL, position INTEGER NOT NULL, genotype TEXT NOT NULL, FOREIGN KEY(patient_id) REFERENCES patients(patient_id), UNIQUE (patient_id, rsid))",
+    "CREATE INDEX idx_snp_pairs_rsid ON snp_pairs (rsid, rsid_genotypes)",
+    "CREATE INDEX idx_patient_genome_data_rsid ON patient_genome_data (rsid)",
+    "INSERT INTO snp_pairs VALUES ('Rs7(A;G)', 1.0, 1.0, '', 'rs7', 'A', 'G')",
+    "INSERT INTO patients VALUES ('patient1', 'Patient 1')",
+    "INSERT INTO patient_genome_data VALUES ('rs7', 'patient1', '1', 1, 'GA'), ('VG01S1234', 'patient1', 'MT', 3, 'G')",
+    "PRAGMA user_version = 4",
+]
+
+def test_migration_rebuilds_text_rsid_tables(tmp_path):
+    db_path = str(tmp_path / "genome.db")
+    with sqlite3.connect(db_path) as connection:
+        for statement in TEXT_RSID_SCHEMA:
+            connection.execute(statement)
+    db = GenomeDatabaseManager(db_path)
+    assert schema_version(db.sql_worker) == MIGRATIONS[-1][0]
+    assert db.sql_worker.execute("SELECT type FROM pragma_table_info('patient_genome_data') WHERE name = 'rsid'") == [("INTEGER",)]
+    indexes = {row[0] for row in db.sql_worker.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_snp_pairs_rsid", "idx_patient_genome_data_rsid", "sqlite_autoindex_patient_genome_data_1"} <= indexes
+    assert [record["rsid"] for record in db.fetch_patient_genome_data(patient_id="patient1").records] == ["VG01S1234", "rs7"]
+    assert [record["genotype_match"] for record in db.fetch_full_report(rsid="rs7").records] == [1]
+    db.close_connection()
+
+def test_upgrade_reloads_the_snp_pair_index(tmp_path):
+    db_path = str(tmp_path / "genome.db")
+    with sqlite3.connect(db_path) as connection:
+        for statement in TEXT_RSID_SCHEMA:
+            connection.execute(statement)
+    db = GenomeDatabaseManager(db_path)
+    # The index was first read from the TEXT rsids; it is rebuilt from the migrated codes.
+    assert [row[4] for row in db.fetch_snp_pairs_data(rsid=["rs7"]).rows] == ["rs7"]
+    assert db.snp_pair_index_stats()["rsids"] == 1
+    db.close_connection()
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import json
+import pandas as pd
+import pytest
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from serialization import RowSet, iter_rows_json, rows_response, rows_to_json, STREAM_THRESHOLD_ROWS
+from services.genome_service import read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+COLUMNS = ['rsid', 'position', 'magnitude', 'notes']
+ROWS = [
+    ('rs1', 100, 1.5, 'plain'),
+    ('rs2', 200, None, 'quote " and backslash \\ and / and é'),
+    ('rs3', 300, float('nan'), ''),
+]
+
+def via_dataframe(columns, rows):
+    # The previous serialization path, kept as the reference for the JSON shape.
+    return json.loads(pd.DataFrame(rows, columns=columns).to_json(orient='records', date_format='iso'))
+
+def test_rows_to_json_matches_dataframe_path():
+    assert json.loads(rows_to_json(COLUMNS, ROWS)) == via_dataframe(COLUMNS, ROWS)
+
+def test_nan_serialized_as_null():
+    assert json.loads(rows_to_json(COLUMNS, ROWS))[2]['magnitude'] is None
+
+def test_infinity_serialized_as_null():
+    assert rows_response(RowSet(['a'], [(float('inf'),), (float('-inf'),), (1.0,)])).body == b'[{"a":null},{"a":null},{"a":1.0}]'
+
+def test_streamed_json_equals_rendered_json():
+    rows = ROWS * 7
+    assert b''.join(iter_rows_json(COLUMNS, rows, batch_rows=4)) == rows_to_json(COLUMNS, rows)
+    assert b''.join(iter_rows_json(COLUMNS, [])) == b'[]'
+
+def test_large_row_sets_are_streamed():
+    small = rows_response(RowSet(COLUMNS, ROWS))
+    large = rows_response(RowSet(COLUMNS, ROWS * STREAM_THRESHOLD_ROWS))
+    assert small.body == rows_to_json(COLUMNS, ROWS)
+    assert not hasattr(large, 'body')
+    assert large.media_type == 'application/json'
+
+@pytest.fixture(scope="module")
+def genome_db(tmp_path_factory):
+    db = GenomeDatabaseManager(db_path=str(tmp_path_factory.mktemp("db") / "genome.db"))
+    db.save_snp_pairs_to_db(read_snp_pairs_file(SNP_PAIRS_FILE))
+    yield db
+    db.close_connection()
+
+def test_snp_pairs_json_matches_dataframe_path(genome_db):
+    rsids = [row[0] for row in genome_db.sql_worker.execute("SELECT DISTINCT 'rs' || rsid FROM snp_pairs LIMIT 500")]
+    row_set = genome_db.fetch_snp_pairs_data(rsid=rsids)
+    assert len(row_set.rows) >= 500
+    assert json.loads(rows_to_json(row_set.columns, row_set.rows)) == via_dataframe(row_set.columns, row_set.rows)
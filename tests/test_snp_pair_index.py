@@ -0,0 +1,61 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from models import SnpPair
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from data_layer.snp_pair_index import SnpPairIndex
+from services.genome_service import read_snp_pairs_file
+
+SNP_PAIRS_FILE = os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv')
+
+@pytest.fixture(scope="module")
+def snp_pairs_df():
+    return read_snp_pairs_file(SNP_PAIRS_FILE)
+
+@pytest.fixture
+def genome_db(tmp_path, snp_pairs_df):
+    db = GenomeDatabaseManager(db_path=str(tmp_path / "genome.db"))
+    db.save_snp_pairs_to_db(snp_pairs_df)
+    yield db
+    db.close_connection()
+
+def test_upsert_and_lookup():
+    index = SnpPairIndex()
+    index.upsert([("Rs1(A;G)", 1.5, None, "x", "rs1", "A", "G"), ("Rs1(A;A)", None, 2.0, "", "rs1", "A", "A")])
+    assert index.lookup(["rs1", "rs2", "rs1"]) == [("Rs1(A;A)", None, 2.0, "", "rs1", "A", "A"), ("Rs1(A;G)", 1.5, None, "x", "rs1", "A", "G")]
+    index.upsert([("Rs1(A;G)", 3.0, 1.0, "moved", "rs9", "A", "G")])
+    assert index.lookup(["rs9"]) == [("Rs1(A;G)", 3.0, 1.0, "moved", "rs9", "A", "G")]
+    assert len(index.lookup(["rs1"])) == 1
+    stats = index.stats()
+    assert (stats["records"], stats["rsids"], stats["lookups"], stats["rsid_hits"], stats["rsid_misses"]) == (2, 2, 3, 3, 1)
+    assert stats["hit_rate"] == 0.75
+
+def test_index_matches_database(genome_db, snp_pairs_df):
+    rsids = list(snp_pairs_df["rsid"].unique()[::7]) + ["rs0", "rs999999999"]
+    from_index = genome_db.fetch_snp_pairs_data(rsid=rsids)
+    from_db = genome_db.fetch_snp_pairs_data(rsid=rsids, use_index=False)
+    assert from_index.columns == from_db.columns
+    assert sorted(from_index.rows) == sorted(from_db.rows)
+
+def test_lookups_do_not_touch_database(genome_db):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(genome_db.sql_worker, "execute", lambda *args: pytest.fail("database queried"))
+        assert genome_db.fetch_snp_pairs_data(rsid=["rs1000113"]).rows
+
+def test_index_follows_upserts(genome_db):
+    repository = genome_db.genome_research_repository
+    repository.update_or_insert_snp_pair(SnpPair(rsid_genotypes="Rs1000113(C;C)", magnitude=4.0, risk=2.0, notes="updated", rsid="rs1000113", allele1="C", allele2="C"))
+    repository.update_or_insert_snp_pair(SnpPair(rsid_genotypes="Rs77(G;G)", magnitude=1.0, risk=1.0, notes="new", rsid="rs77", allele1="G", allele2="G"))
+    rsids = ["rs1000113", "rs77"]
+    assert sorted(genome_db.fetch_snp_pairs_data(rsid=rsids).rows) == sorted(genome_db.fetch_snp_pairs_data(rsid=rsids, use_index=False).rows)
+    assert ("Rs77(G;G)", 1.0, 1.0, "new", "rs77", "G", "G") in genome_db.fetch_snp_pairs_data(rsid=["rs77"]).rows
+
+def test_index_loaded_at_startup(tmp_path, snp_pairs_df):
+    db_path = str(tmp_path / "genome.db")
+    db = GenomeDatabaseManager(db_path=db_path)
+    db.save_snp_pairs_to_db(snp_pairs_df)
+    db.close_connection()
+    db = GenomeDatabaseManager(db_path=db_path)
+    assert db.snp_pair_index_stats()["records"] == db.count_snp_pairs()
+    db.close_connection()
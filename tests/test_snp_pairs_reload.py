@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from services.genome_service import GenomeService, read_snp_pairs_source
+
+SNP_PAIRS = '''RSID_Genotypes,Magnitude,Risk,Notes
+Rs1(A;G),2,2,carrier
+Rs1(G;G),3,2,affected
+Rs2(C;C),0,1,normal
+Rs3(A;A),1,1,rare
+'''
+CHANGED_SNP_PAIRS = '''RSID_Genotypes,Magnitude,Risk,Notes
+Rs1(A;G),2,2,carrier
+Rs1(G;G),4,2,"affected, severe"
+Rs3(A;A),1,1,rare
+Rs4(T;T),1,2,new
+Rs5(A;A),not a number,1,bad
+'''
+
+@pytest.fixture
+def environment(tmp_path, monkeypatch):
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    snp_pairs_file.write_text(SNP_PAIRS)
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    return snp_pairs_file
+
+def snp_pairs(service):
+    return service.genome_db_manager.sql_worker.execute("SELECT rsid_genotypes, magnitude, notes FROM snp_pairs ORDER BY rsid_genotypes")
+
+def test_row_hashes_follow_row_content(environment):
+    hashes = read_snp_pairs_source(str(environment)).set_index('RSID_Genotypes')['row_hash']
+    environment.write_text(CHANGED_SNP_PAIRS)
+    changed = read_snp_pairs_source(str(environment)).set_index('RSID_Genotypes')['row_hash']
+    assert changed['Rs1(A;G)'] == hashes['Rs1(A;G)'] and changed['Rs3(A;A)'] == hashes['Rs3(A;A)']
+    assert changed['Rs1(G;G)'] != hashes['Rs1(G;G)']
+
+def test_reload_writes_only_the_changes(environment):
+    service = GenomeService()
+    assert service.reload_snp_pairs().unchanged_rows == 4
+    environment.write_text(CHANGED_SNP_PAIRS)
+    diff = service.reload_snp_pairs(dry_run=True)
+    assert (diff.inserted, diff.updated, diff.deleted, diff.unchanged_rows) == (['Rs4(T;T)', 'Rs5(A;A)'], ['Rs1(G;G)'], ['Rs2(C;C)'], 2)
+    assert len(snp_pairs(service)) == 4
+    with patch.object(GenomeDatabaseManager, 'save_snp_pairs_to_db', side_effect=service.genome_db_manager.save_snp_pairs_to_db) as save_snp_pairs:
+        diff = service.reload_snp_pairs()
+    # Only the changed rows were parsed and written.
+    assert save_snp_pairs.call_args[0][0]['rsid_genotypes'].tolist() == ['Rs1(G;G)', 'Rs4(T;T)', 'Rs5(A;A)']
+    assert (diff.inserted, diff.updated, diff.deleted, diff.rejected_rows) == (['Rs4(T;T)'], ['Rs1(G;G)'], ['Rs2(C;C)'], 1)
+    assert snp_pairs(service) == [("Rs1(A;G)", 2.0, "carrier"), ("Rs1(G;G)", 4.0, "affected, severe"), ("Rs3(A;A)", 1.0, "rare"), ("Rs4(T;T)", 1.0, "new")]
+    assert service.fetch_snp_pair_index_stats()["rsids"] == 3 and service.fetch_all_snp_pairs(rsid=["rs2"]).rows == []
+    # The file is now the one loaded: the next start skips it.
+    assert service.load_snp_pairs_df(str(environment)) is None
+    service.close()
+
+def test_reload_refreshes_reports_and_rewrites_unhashed_pairs(environment):
+    service = GenomeService()
+    genome_db = service.genome_db_manager
+    genome_df = pd.DataFrame({'rsid': ['rs1', 'rs2'], 'chromosome': '1', 'position': [1, 2], 'genotype': ['AG', 'CC']})
+    genome_db.update_patient_and_genome_data(genome_df, "p1", "One")
+    genome_db.materialize_patient_report("p1")
+    genome_db.sql_worker.execute("UPDATE snp_pairs SET row_hash = NULL WHERE rsid_genotypes = 'Rs3(A;A)'")
+    environment.write_text(SNP_PAIRS.replace("Rs2(C;C),0,1,normal\n", ""))
+    diff = service.reload_snp_pairs()
+    assert (diff.updated, diff.deleted) == (['Rs3(A;A)'], ['Rs2(C;C)'])
+    assert [record['rsid_genotypes'] for record in genome_db.fetch_full_report(patient_id="p1").records] == ['Rs1(A;G)', 'Rs1(G;G)']
+    service.close()
+
+def test_reload_endpoint(environment):
+    from main import app
+    with TestClient(app) as client:
+        environment.write_text(CHANGED_SNP_PAIRS)
+        response = client.post("/snp_research/reload_snp_pairs", params={"dry_run": True})
+        assert response.status_code == 200 and response.json()["dry_run"] and response.json()["deleted"] == ['Rs2(C;C)']
+        diff = client.post("/snp_research/reload_snp_pairs").json()
+        assert (diff["updated"], diff["rejected_rows"]) == (['Rs1(G;G)'], 1)
+        assert client.post("/snp_research/reload_snp_pairs").json()["unchanged_rows"] == 4
@@ -0,0 +1,90 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import threading
+import pytest
+from data_layer.sqlite_worker import GenomeSqlWorker, chunked
+
+@pytest.fixture
+def sql_worker(tmp_path):
+    worker = GenomeSqlWorker(str(tmp_path / "worker.db"))
+    worker.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    yield worker
+    worker.close()
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+def test_run_in_transaction_returns_result(sql_worker):
+    result = sql_worker.run_in_transaction(lambda conn: conn.execute("INSERT INTO items (name) VALUES ('a')").rowcount)
+    assert result == 1
+    assert sql_worker.execute("SELECT name FROM items") == [("a",)]
+
+def test_run_in_transaction_rolls_back_on_error(sql_worker):
+    def work(conn):
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+        raise ValueError("boom")
+    with pytest.raises(ValueError):
+        sql_worker.run_in_transaction(work)
+    assert sql_worker.execute("SELECT COUNT(*) FROM items") == [(0,)]
+
+def test_run_in_transaction_keeps_queued_writes(sql_worker):
+    sql_worker.execute("INSERT INTO items (name) VALUES ('queued')")
+    with pytest.raises(ValueError):
+        sql_worker.run_in_transaction(lambda conn: (_ for _ in ()).throw(ValueError("boom")))
+    assert sql_worker.execute("SELECT name FROM items") == [("queued",)]
+
+def test_execute_many(sql_worker):
+    written = sql_worker.execute_many("INSERT INTO items (name) VALUES (?)", ((str(i),) for i in range(7)), chunk_size=3)
+    assert written == 7
+    assert sql_worker.execute("SELECT COUNT(*) FROM items") == [(7,)]
+
+# WAL mode and the read pool
+
+def test_file_database_uses_wal_and_read_pool(sql_worker):
+    assert sql_worker.run_in_transaction(lambda conn: conn.execute("PRAGMA journal_mode").fetchone()) == ("wal",)
+    assert sql_worker.read_pool is not None
+
+def test_memory_database_reads_through_writer():
+    worker = GenomeSqlWorker(":memory:")
+    worker.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    assert worker.read_pool is None
+    assert worker.execute("SELECT COUNT(*) FROM items") == [(0,)]
+    worker.close()
+
+def test_reads_not_blocked_by_open_transaction(sql_worker):
+    sql_worker.execute("INSERT INTO items (name) VALUES ('committed')")
+    assert sql_worker.execute("SELECT COUNT(*) FROM items") == [(1,)]
+    inserted, release = threading.Event(), threading.Event()
+    def long_ingest(conn):
+        conn.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+        inserted.set()
+        release.wait(5)
+    writer = threading.Thread(target=sql_worker.run_in_transaction, args=(long_ingest,))
+    writer.start()
+    try:
+        assert inserted.wait(5)
+        # Served by the pool while the writer holds its transaction open; sees committed rows only.
+        assert sql_worker.execute("SELECT name FROM items") == [("committed",)]
+    finally:
+        release.set()
+        writer.join()
+    assert sql_worker.execute("SELECT COUNT(*) FROM items") == [(2,)]
+
+def test_thread_reads_its_own_queued_writes(sql_worker):
+    for i in range(50):
+        sql_worker.execute("INSERT INTO items (name) VALUES (?)", (str(i),))
+        assert sql_worker.execute("SELECT COUNT(*) FROM items") == [(i + 1,)]
+
+def test_concurrent_reads(sql_worker):
+    sql_worker.execute_many("INSERT INTO items (name) VALUES (?)", ((str(i),) for i in range(1000)))
+    results = []
+    def read():
+        results.append(sql_worker.execute("SELECT COUNT(*) FROM items"))
+    readers = [threading.Thread(target=read) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    assert results == [[(1000,)]] * 8
@@ -0,0 +1,151 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.response_cache import ResponseCache
+from services.variant_gene_resolver import VariantGeneResolver, canonical_variant_ids
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+class Snpense:
+    """
+        g:SNPense stand-in: records each query; rsids starting rs404 are unknown. While `gate`
+        is set, queries wait for it to be opened.
+    """
+    def __init__(self):
+        self.queries = []
+        self.gate = None
+        self.error = None
+
+    async def __call__(self, rsids):
+        self.queries.append(list(rsids))
+        if self.gate is not None:
+            await asyncio.wait_for(self.gate.wait(), 10)
+        if self.error is not None:
+            raise self.error
+        return [{"rs_id": rsid, "gene_names": [f"GENE{rsid[2:]}"]} for rsid in rsids if not rsid.startswith("rs404")]
+
+async def until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+@pytest.fixture
+def resolver():
+    cache = ResponseCache()
+    yield VariantGeneResolver(cache, Snpense(), ttl=60, batch_size=2)
+    cache.close()
+
+def test_canonical_variant_ids():
+    assert canonical_variant_ids(["RS1", " rs2 ", "rs1", "", "rs2"]) == ["rs1", "rs2"]
+
+def test_duplicates_and_known_rsids_are_not_requested_again(resolver):
+    async def scenario():
+        genes = await resolver.resolve(["rs1", "RS1", "rs2", "rs4041", "rs3"])
+        assert genes == {"rs1": ["GENE1"], "rs2": ["GENE2"], "rs4041": None, "rs3": ["GENE3"]}
+        assert resolver.snpense.queries == [["rs1", "rs2"], ["rs4041", "rs3"]]
+        assert await resolver.resolve(["rs3", "rs4041", "rs5"]) == {"rs3": ["GENE3"], "rs4041": None, "rs5": ["GENE5"]}
+        assert resolver.snpense.queries[2:] == [["rs5"]]
+        assert resolver.stats()["upstream_requests"] == 3
+    asyncio.run(scenario())
+
+def test_concurrent_requests_share_one_upstream_fetch(resolver):
+    resolver.batch_size = 100
+    async def scenario():
+        resolver.snpense.gate = asyncio.Event()
+        first = asyncio.create_task(resolver.resolve(["rs1", "rs2"]))
+        await until(lambda: resolver.snpense.queries)
+        second = asyncio.create_task(resolver.resolve(["rs2", "rs1", "rs3"]))
+        await until(lambda: resolver.stats()["coalesced_rsids"] >= 2)
+        resolver.snpense.gate.set()
+        await first
+        assert resolver.snpense.queries == [["rs1", "rs2"], ["rs3"]]
+        assert await second == {"rs2": ["GENE2"], "rs1": ["GENE1"], "rs3": ["GENE3"]}
+        assert resolver.stats()["in_flight_rsids"] == 0
+    asyncio.run(scenario())
+
+def test_upstream_failure_reaches_waiting_requests(resolver):
+    async def scenario():
+        resolver.snpense.gate = asyncio.Event()
+        resolver.snpense.error = ConnectionError("upstream down")
+        first = asyncio.create_task(resolver.resolve(["rs1"]))
+        await until(lambda: resolver.snpense.queries)
+        second = asyncio.create_task(resolver.resolve(["rs1"]))
+        await until(lambda: resolver.stats()["coalesced_rsids"] >= 1)
+        resolver.snpense.gate.set()
+        errors = await asyncio.gather(first, second, return_exceptions=True)
+        assert all(isinstance(error, ConnectionError) for error in errors) and len(resolver.snpense.queries) == 1
+        resolver.snpense.error = None
+        assert await resolver.resolve(["rs1"]) == {"rs1": ["GENE1"]}
+    asyncio.run(scenario())
+
+def test_requester_going_away_does_not_strand_waiters(resolver):
+    async def scenario():
+        resolver.snpense.gate = asyncio.Event()
+        first = asyncio.create_task(resolver.resolve(["rs1"]))
+        await until(lambda: resolver.snpense.queries)
+        second = asyncio.create_task(resolver.resolve(["rs1"]))
+        await until(lambda: resolver.stats()["coalesced_rsids"] >= 1)
+        first.cancel()
+        resolver.snpense.gate.set()
+        assert await second == {"rs1": ["GENE1"]}
+        assert len(resolver.snpense.queries) == 1 and resolver.stats()["in_flight_rsids"] == 0
+    asyncio.run(scenario())
+
+class StubHandler(BaseHTTPRequestHandler):
+    # g:Profiler stand-in; `server.batches` records the size of each g:SNPense query.
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+        self.server.batches.append(len(query))
+        payload = json.dumps({"meta": {}, "result": [
+            {"rs_id": rsid, "chromosome": "1", "strand": "+", "start": 1, "end": 1, "ensgs": [], "gene_names": [f"GENE{rsid[2:]}"], "variants": {}}
+            for rsid in query if not rsid.startswith("rs404")]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.batches = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    snp_pairs_file = tmp_path / "snp_data.csv"
+    with open(os.path.join(DATA_DIR, 'snp_pairs/snp_data.csv')) as source:
+        lines = source.readlines()
+    snp_pairs_file.write_text("".join(lines[:1] + [line for line in lines if line.startswith("Rs")][:200]))
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', str(snp_pairs_file))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    monkeypatch.setenv('GPROFILER_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv('GPROFILER_BATCH_SIZE', "100")
+    from main import app
+    with TestClient(app) as client:
+        client.upstream = server
+        yield client
+    server.shutdown()
+    server.server_close()
+
+def test_batch_endpoint(client):
+    rsids = [f"rs{number}" for number in range(250)] + ["RS1", "rs4040"] + [f"rs{number}" for number in range(50)]
+    response = client.post("/snp_research/fetch_genes_by_variants", json={"rsidsList": rsids})
+    assert response.status_code == 200
+    genes = response.json()
+    assert len(genes) == 251 and genes["rs1"] == ["GENE1"] and genes["rs4040"] is None
+    # The batches are requested concurrently, so they may arrive in any order.
+    assert sorted(client.upstream.batches) == [51, 100, 100]
+    response = client.post("/snp_research/fetch_genes_by_variants", json={"rsidsList": ["rs7", "rs300"]})
+    assert response.json() == {"rs7": ["GENE7"], "rs300": ["GENE300"]}
+    assert client.upstream.batches[3:] == [1]
+
+def test_batch_endpoint_rejects_too_many_rsids(client):
+    response = client.post("/snp_research/fetch_genes_by_variants", json={"rsidsList": [f"rs{number}" for number in range(10001)]})
+    assert response.status_code == 400
+    assert client.upstream.batches == []
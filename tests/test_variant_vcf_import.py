@@ -0,0 +1,151 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import gzip
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from data_layer.genome_db_manager import GenomeDatabaseManager
+from repositories.variant_annotation_repository import VariantAnnotationRepository
+from services.variant_vcf_import import (chunk_data, import_variant_vcf, is_bgzf, parse_vcf_chunk, read_vcf_header,
+                                         sniff_build, sniff_source, vcf_chunks, write_bgzf)
+
+CLINVAR_HEADER = '''##fileformat=VCFv4.1
+##fileDate=2024-05-01
+##source=ClinVar
+##reference=GRCh38
+##ID=<Description="ClinVar Variation ID">
+##INFO=<ID=CLNSIG,Number=.,Type=String,Description="Aggregate germline classification for this single variant">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+'''
+CLINVAR_ROWS = [
+    '17\t43045712\t55601\tT\tC\t.\t.\tALLELEID=70663;CLNDN=Hereditary_breast_ovarian_cancer_syndrome;CLNREVSTAT=reviewed_by_expert_panel;CLNSIG=Pathogenic;GENEINFO=BRCA1:672;RS=80357906',
+    '17\t43124027\t17662\tACT\tA\t.\t.\tALLELEID=32701;CLNDN=Breast-ovarian_cancer%2C_familial_1;CLNREVSTAT=criteria_provided,_single_submitter;CLNSIG=Likely_pathogenic;GENEINFO=BRCA1:672|NBR2:10230',
+    '19\t44908684\t17864\tT\tC\t.\t.\tALLELEID=32903;CLNDN=Alzheimer_disease;CLNSIG=risk_factor;GENEINFO=APOE:348;RS=429358',
+    'chrMT\t8993\t9645\tT\tG\t.\t.\tCLNSIG=Pathogenic;RS=199476133',
+    'X\tnot_a_position\t1\tA\tG\t.\t.\tCLNSIG=Benign',
+]
+CIVIC_VCF = '''##fileformat=VCFv4.2
+##source=CIViC
+##reference=ftp://ftp.ncbi.nlm.nih.gov/genomes/all/GCF/GCF_000001405.25_GRCh37.p13
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+7\t140453136\t12\tA\tT\t.\t.\tGN=BRAF;VT=V600E
+17\t41245466\trs80357906\tT\tC\t.\t.\tGN=BRCA1
+'''
+
+def clinvar_vcf(rows=CLINVAR_ROWS):
+    return CLINVAR_HEADER + '\n'.join(rows) + '\n'
+
+def many_rows(count):
+    return [f'{1 + index % 22}\t{1000 + index}\t{index}\tA\tG\t.\t.\tCLNSIG=Benign;RS={index}' for index in range(count)]
+
+@pytest.fixture
+def genome_db(tmp_path):
+    genome_db = GenomeDatabaseManager(str(tmp_path / "genome.db"))
+    yield genome_db
+    genome_db.close_connection()
+
+def test_header_sniffing(tmp_path):
+    (tmp_path / "civic.vcf").write_text(CIVIC_VCF)
+    header = read_vcf_header(str(tmp_path / "civic.vcf"))
+    assert (sniff_source(header), sniff_build(header)) == ('civic', 'GRCh37')
+    with gzip.open(tmp_path / "clinvar.vcf.gz", 'wt') as file:
+        file.write(clinvar_vcf())
+    header = read_vcf_header(str(tmp_path / "clinvar.vcf.gz"))
+    assert (sniff_source(header), sniff_build(header)) == ('clinvar', 'GRCh38')
+
+def test_parse_decodes_info_and_rsids(tmp_path):
+    annotation_df, skipped = parse_vcf_chunk(clinvar_vcf().encode(), 'clinvar')
+    assert skipped == 1
+    assert annotation_df['rsid'].tolist() == [80357906, None, 429358, 199476133]
+    assert annotation_df['chromosome'].tolist() == ['17', '17', '19', 'MT']
+    assert annotation_df['gene'].tolist() == ['BRCA1', 'BRCA1|NBR2', 'APOE', None]
+    assert annotation_df['condition'].tolist()[:2] == ['Hereditary_breast_ovarian_cancer_syndrome', 'Breast-ovarian_cancer,_familial_1']
+    assert annotation_df['review_status'].tolist()[2:] == [None, None]
+    assert annotation_df['info'].iloc[3] == 'CLNSIG=Pathogenic;RS=199476133'
+
+@pytest.mark.parametrize('compression', ['plain', 'bgzf'])
+def test_chunks_own_each_line_once(tmp_path, compression):
+    data = clinvar_vcf(many_rows(600)).encode()
+    path = str(tmp_path / "clinvar.vcf")
+    if compression == 'bgzf':
+        # Blocks of 997 bytes: boundaries fall mid-line, and in the header.
+        write_bgzf(data, path, block_size=997)
+        assert is_bgzf(path)
+    else:
+        with open(path, 'wb') as file:
+            file.write(data)
+    whole, _ = parse_vcf_chunk(vcf_chunks(path, 1 << 30)[0], 'clinvar')
+    for chunk_bytes in (37, 1000, 3001):
+        chunks = vcf_chunks(path, chunk_bytes)
+        assert len(chunks) > 1
+        assert b''.join(chunk_data(chunk) for chunk in chunks) == data
+        frames = [parse_vcf_chunk(chunk, 'clinvar')[0] for chunk in chunks]
+        parsed = pd.concat([frame for frame in frames if len(frame)], ignore_index=True)
+        pd.testing.assert_frame_equal(parsed, whole)
+    assert len(whole) == 600
+
+def test_import_replaces_the_source_rows(tmp_path, genome_db):
+    path = str(tmp_path / "clinvar.vcf.bgz")
+    write_bgzf(clinvar_vcf(CLINVAR_ROWS + many_rows(500)).encode(), path, block_size=4096)
+    summary = import_variant_vcf(genome_db, path, workers=2, chunk_bytes=1024)
+    assert (summary.source, summary.build, summary.imported_rows, summary.skipped_rows) == ('clinvar', 'GRCh38', 504, 1)
+    assert summary.chunks > 2
+    (tmp_path / "civic.vcf").write_text(CIVIC_VCF)
+    import_variant_vcf(genome_db, str(tmp_path / "civic.vcf"), workers=1)
+    assert genome_db.count_variant_annotations('GRCh38') == {'clinvar': 504}
+    assert genome_db.count_variant_annotations('GRCh37') == {'civic': 2}
+    (tmp_path / "clinvar.vcf").write_text(clinvar_vcf())
+    assert import_variant_vcf(genome_db, str(tmp_path / "clinvar.vcf"), workers=1).imported_rows == 4
+    page = genome_db.fetch_variant_annotations('GRCh38', rsid=['rs80357906'])
+    assert [(record['rsid'], record['clinical_significance'], record['gene']) for record in page.records] == [('rs80357906', 'Pathogenic', 'BRCA1')]
+    page = genome_db.fetch_variant_annotations('GRCh38', chromosome='17', start=43000000, end=43200000)
+    assert [(record['variant_id'], record['rsid']) for record in page.records] == [('55601', 'rs80357906'), ('17662', None)]
+    # A variant without an rsid matches no rsid filter.
+    assert genome_db.fetch_variant_annotations('GRCh38', rsid=['VG01S1234']).records == []
+    with pytest.raises(ValueError):
+        import_variant_vcf(genome_db, str(tmp_path / "clinvar.vcf"), build='hg18', workers=1)
+
+def test_overlapping_imports_of_a_source(genome_db):
+    parsed = lambda rows: parse_vcf_chunk(clinvar_vcf(rows).encode(), 'clinvar')[0]
+    def frames():
+        yield parsed(many_rows(3))
+        # A second import of the source runs to completion meanwhile.
+        assert genome_db.variant_annotation_repository.replace_variant_annotations('clinvar', 'GRCh38', [parsed(many_rows(5))]) == 5
+        yield parsed(CLINVAR_ROWS)
+    assert genome_db.variant_annotation_repository.replace_variant_annotations('clinvar', 'GRCh38', frames()) == 7
+    assert genome_db.count_variant_annotations('GRCh38') == {'clinvar': 7}
+
+def test_annotation_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setenv('SNP_PAIRS_FILE_PATH', os.path.join(os.path.dirname(__file__), '../data/snp_pairs/snp_data.csv'))
+    monkeypatch.setenv('SQLITE_DATABASE_PATH', str(tmp_path / "genome.db"))
+    (tmp_path / "clinvar.vcf").write_text(clinvar_vcf())
+    from main import app
+    with TestClient(app) as client:
+        genome_db = app.state.genome_controller.genome_service.genome_db_manager
+        import_variant_vcf(genome_db, str(tmp_path / "clinvar.vcf"), workers=1)
+        genome_df = pd.DataFrame({'rsid': ['rs429358', 'rs7412'], 'chromosome': '19', 'position': [44908684, 44908822], 'genotype': ['TC', 'CC']})
+        genome_db.update_patient_and_genome_data(genome_df, "p1", "One")
+        response = client.get("/snp_research/variant_annotations", params={"chromosome": "chr17", "start": 43000000, "end": 43200000, "page_size": 1})
+        assert response.status_code == 200 and [record['variant_id'] for record in response.json()] == ['55601']
+        response = client.get("/snp_research/variant_annotations", params={"chromosome": "17", "start": 43000000, "end": 43200000, "cursor": response.headers["X-Next-Cursor"]})
+        assert [record['variant_id'] for record in response.json()] == ['17662']
+        response = client.get("/patient_genome/variant_annotations", params={"patient_id": "p1"})
+        assert [(record['rsid'], record['genotype'], record['clinical_significance']) for record in response.json()] == [('rs429358', 'TC', 'risk_factor')]
+        assert client.get("/snp_research/variant_annotations/counts").json() == {'GRCh37': {}, 'GRCh38': {'clinvar': 4}}
+        assert client.get("/snp_research/variant_annotations", params={"start": 2, "end": 1}).status_code == 400
+
+def test_migration_stores_null_for_missing_rsids(tmp_path):
+    db_path = str(tmp_path / "genome.db")
+    genome_db = GenomeDatabaseManager(db_path)
+    table = 'variant_annotations_grch38'
+    genome_db.sql_worker.run_in_transaction(lambda connection: (
+        connection.execute(f"DROP TABLE {table}"),
+        connection.execute(VariantAnnotationRepository.table_sql(table).replace('rsid INTEGER,', 'rsid INTEGER NOT NULL,')),
+        connection.execute(f"INSERT INTO {table} (source, variant_id, rsid, chromosome, position, ref, alt) VALUES ('clinvar', '1', 0, '1', 5, 'A', 'G'), ('clinvar', '2', 7, '1', 6, 'A', 'G')"),
+        connection.execute("PRAGMA user_version = 7")))
+    genome_db.close_connection()
+    genome_db = GenomeDatabaseManager(db_path)
+    assert [record['rsid'] for record in genome_db.fetch_variant_annotations('GRCh38').records] == [None, 'rs7']
+    assert [row[1] for row in genome_db.sql_worker.execute(f"SELECT name, \"notnull\" FROM pragma_table_info('{table}') WHERE name = 'rsid'")] == [0]
+    genome_db.close_connection()